@@ -0,0 +1,97 @@
+'''
+MIT License
+
+Copyright (c) 2020 Rashid Lafraie
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+from pathlib import Path
+import sys
+
+openke_path = Path.cwd().parents[0]
+print(openke_path)
+sys.path.append(str(openke_path))
+
+from openke.config import Parallel_Universe_Config
+from openke.data import TrainDataLoader
+from openke.module.model import TransE, TransH, TransD
+import time
+
+
+# Measures how many parallel universes per second are trained when every universe is trained on its own
+# (fused_universes=1) and when groups of fused_universes universes are trained as one fused model. Both
+# runs start from the same seed, so they train the same universes with the same hyper parameters. The
+# group size can be passed as the first argument, the number of universes as the second.
+if __name__ == '__main__':
+    fused_universes = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    num_universes = int(sys.argv[2]) if len(sys.argv) > 2 else 2 * fused_universes
+    init_random_seed = 4
+
+    train_dataloader = TrainDataLoader(
+        in_path="../benchmarks/WN18/",
+        nbatches=20,
+        threads=8,
+        sampling_mode="normal",
+        bern_flag=0,
+        filter_flag=0,
+        neg_ent=1,
+        neg_rel=0,
+        random_seed=init_random_seed)
+
+    embedding_models = [(TransE, {'dim': 20, 'p_norm': 1, 'norm_flag': 1}),
+                        (TransH, {'dim': 20, 'p_norm': 1, 'norm_flag': 1}),
+                        (TransD, {'dim_e': 20, 'dim_r': 20, 'p_norm': 1, 'norm_flag': 1})]
+
+    results = []
+    for embedding_model, embedding_model_param in embedding_models:
+        for group_size in (1, fused_universes):
+            train_dataloader.lib.setRandomSeed(init_random_seed)
+            train_dataloader.lib.randReset()
+            parallel_universes = Parallel_Universe_Config(
+                training_identifier='benchmark_fused_universes_WN18',
+                train_dataloader=train_dataloader,
+                initial_num_universes=None,
+                min_margin=1,
+                max_margin=4,
+                min_lr=0.001,
+                max_lr=0.1,
+                min_num_epochs=50,
+                max_num_epochs=200,
+                min_triple_constraint=500,
+                max_triple_constraint=2000,
+                min_balance=0.25,
+                max_balance=0.5,
+                embedding_model=embedding_model,
+                embedding_model_param=embedding_model_param,
+                checkpoint_dir=None,
+                valid_steps=num_universes + 1,
+                save_steps=None,
+                training_setting="static",
+                incremental_strategy=None)
+
+            start_time = time.perf_counter()
+            parallel_universes.train_parallel_universes(num_universes, fused_universes=group_size)
+            training_time = time.perf_counter() - start_time
+            results.append((embedding_model.__name__, group_size, training_time))
+
+    print("\n{:<8} {:>16} {:>12} {:>12}".format("model", "fused universes", "time s", "universes/s"))
+    for model_name, group_size, training_time in results:
+        print("{:<8} {:>16} {:>12.2f} {:>12.2f}".format(model_name, group_size, training_time,
+                                                        num_universes / training_time))
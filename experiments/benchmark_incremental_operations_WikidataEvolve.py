@@ -0,0 +1,74 @@
+'''
+MIT License
+
+Copyright (c) 2020 Rashid Lafraie
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+from pathlib import Path
+import sys
+
+openke_path = Path.cwd().parents[0]
+print(openke_path)
+sys.path.append(str(openke_path))
+
+from openke.data import IncrementalTrainDataLoader
+import time
+
+
+# Replays the train-op2id.txt streams of the snapshots and measures how long evolveTrainList takes to
+# apply the operations of a snapshot and to rebuild the training helpers. Another incremental dataset
+# can be passed as the first argument.
+if __name__ == '__main__':
+    dataset_path = sys.argv[1] if len(sys.argv) > 1 else "../benchmarks/Wikidata/WikidataEvolve/"
+    snapshots = sorted(int(path.parent.name) for path in Path(dataset_path).glob("incremental/*/train-op2id.txt"))
+
+    train_dataloader = IncrementalTrainDataLoader(
+        in_path=dataset_path,
+        nbatches=20,
+        threads=1,
+        sampling_mode="normal",
+        bern_flag=0,
+        filter_flag=0,
+        neg_ent=1,
+        neg_rel=0,
+        random_seed=4,
+        incremental_setting=True,
+        num_snapshots=len(snapshots))
+
+    total_operations = 0
+    total_time = 0.0
+    for snapshot in snapshots:
+        operations_file = Path(dataset_path) / "incremental" / str(snapshot) / "train-op2id.txt"
+        with open(operations_file, mode="rt", encoding="utf-8") as f:
+            num_operations = sum(1 for _ in f)
+
+        train_dataloader.lib.initializeTrainingOperations(snapshot)
+        start_time = time.perf_counter()
+        train_dataloader.lib.evolveTrainList()
+        snapshot_time = time.perf_counter() - start_time
+
+        total_operations += num_operations
+        total_time += snapshot_time
+        print("Snapshot {}: {} operations, {} train triples, {:5.3f}s".format(
+            snapshot, num_operations, train_dataloader.lib.getTrainTotal(), snapshot_time))
+
+    print("Replayed {} operations of {} snapshots in {:5.3f}s ({:.0f} operations/s)".format(
+        total_operations, len(snapshots), total_time, total_operations / total_time))
@@ -0,0 +1,92 @@
+'''
+MIT License
+
+Copyright (c) 2020 Rashid Lafraie
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+from pathlib import Path
+import sys
+
+openke_path = Path.cwd().parents[0]
+print(openke_path)
+sys.path.append(str(openke_path))
+
+import os
+import time
+import ctypes
+import argparse
+import subprocess
+
+DEFAULT_DATASETS = ["../benchmarks/FB15K/"] + \
+                   ["../benchmarks/Wikidata/WikidataEvolve/static/{}/".format(snapshot) for snapshot in range(1, 5)]
+REQUIRED_FILES = ["entity2id.txt", "relation2id.txt", "train2id.txt", "test2id.txt", "valid2id.txt"]
+
+
+def measure(in_path, threads):
+    base_file = str(openke_path / "openke" / "release" / "Base.so")
+    lib = ctypes.cdll.LoadLibrary(base_file)
+    lib.setWorkThreads.argtypes = [ctypes.c_int64]
+    lib.getParseThroughput.restype = ctypes.c_float
+
+    lib.setInPath(ctypes.create_string_buffer(in_path.encode(), len(in_path) * 2))
+    lib.setWorkThreads(threads)
+    lib.resetParseStats()
+    start = time.time()
+    lib.importTrainFiles()
+    lib.importTestFiles()
+    import_time = time.time() - start
+    lib.destroySamplerPool()
+    return lib.getParseThroughput(), import_time
+
+
+# Measures the throughput of the text parser in openke/base/TextParser.h when importing the train, test and
+# valid files of the datasets, e.g. python benchmark_text_parser_throughput.py ../benchmarks/WN18/ --threads 1 8
+# Without dataset arguments FB15K and the WikidataEvolve static snapshots are measured.
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument("datasets", nargs="*", default=DEFAULT_DATASETS)
+    parser.add_argument("--threads", nargs="+", type=int, default=[1, os.cpu_count()])
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        # The library keeps the imported dataset in global state, so every measurement runs in a fresh process.
+        throughput, import_time = measure(os.path.join(args.datasets[0], ""), args.threads[0])
+        print("RESULT {} {}".format(throughput, import_time))
+        sys.exit()
+
+    results = []
+    for in_path in args.datasets:
+        in_path = os.path.join(in_path, "")
+        missing = [f for f in REQUIRED_FILES if not os.path.exists(os.path.join(in_path, f))]
+        if missing:
+            print("Skipping {}: missing {}.".format(in_path, ", ".join(missing)))
+            continue
+        size = sum(os.path.getsize(os.path.join(in_path, f)) for f in REQUIRED_FILES[2:]) / 1048576.0
+        for threads in args.threads:
+            output = subprocess.run([sys.executable, __file__, in_path, "--threads", str(threads), "--single"],
+                                    stdout=subprocess.PIPE, universal_newlines=True).stdout
+            throughput, import_time = map(float, output.split("RESULT")[-1].split())
+            results.append((in_path, size, threads, throughput, import_time))
+
+    print("\n{:<60} {:>8} {:>8} {:>10} {:>10}".format("dataset", "MB", "threads", "MB/s", "import s"))
+    for in_path, size, threads, throughput, import_time in results:
+        print("{:<60} {:>8.2f} {:>8} {:>10.1f} {:>10.3f}".format(in_path, size, threads, throughput, import_time))
@@ -0,0 +1,66 @@
+'''
+MIT License
+
+Copyright (c) 2020 Rashid Lafraie
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+from pathlib import Path
+import sys
+
+openke_path = Path.cwd().parents[0]
+print(openke_path)
+sys.path.append(str(openke_path))
+
+from openke.data import TrainDataLoader
+import time
+
+
+# Measures how many parallel universes (training datasets of the Bidirectional Random Walk and their
+# helper arrays) are constructed per second, i.e. the part of universe training spent in C++.
+if __name__ == '__main__':
+    num_universes = 200
+    init_random_seed = 4
+
+    train_dataloader = TrainDataLoader(
+        in_path="../benchmarks/WN18/",
+        nbatches=20,
+        threads=1,
+        sampling_mode="normal",
+        bern_flag=0,
+        filter_flag=0,
+        neg_ent=1,
+        neg_rel=0,
+        random_seed=init_random_seed)
+
+    construction_time = 0.0
+    triple_constraints = [500 + (universe * 97) % 1500 for universe in range(num_universes)]
+    for universe, triple_constraint in enumerate(triple_constraints):
+        train_dataloader.lib.setRandomSeed(init_random_seed + universe)
+        train_dataloader.lib.randReset()
+
+        start_time = time.perf_counter()
+        train_dataloader.compile_universe_dataset(triple_constraint, 0.25 + (universe % 5) * 0.05)
+        construction_time += time.perf_counter() - start_time
+        train_dataloader.reset_universe()
+
+    print("Constructed {} universes in {:5.3f}s ({:.1f} universes/s, mean triple constraint {:.0f})".format(
+        num_universes, construction_time, num_universes / construction_time,
+        sum(triple_constraints) / num_universes))
@@ -1,8 +1,14 @@
 #include "Setting.h"
+#include "SamplerPool.h"
 #include "Triple.h"
 #include "Random.h"
 #include "Reader.h"
+#include "CorruptIndex.h"
+#include "KnownAnswers.h"
+#include "TextParser.h"
+#include "BinaryDataset.h"
 #include "Incremental.h"
+#include "SamplerContext.h"
 #include "Corrupt.h"
 #include "Test.h"
 #include "Valid.h"
@@ -56,6 +62,28 @@ INT getTestTotal();
 extern "C"
 INT getValidTotal();
 
+/*
+===============SamplerPool.h===============
+*/
+
+extern "C"
+void createSamplerPool(INT threads);
+
+extern "C"
+void destroySamplerPool();
+
+extern "C"
+void resetSamplerPoolStats();
+
+extern "C"
+INT getSamplerPoolSize();
+
+extern "C"
+INT getSamplerPoolJobs();
+
+extern "C"
+REAL getSamplerPoolUtilization();
+
 /*
 ===============Random.h===============
 */
@@ -69,6 +97,44 @@ void setRandomSeed(INT seed);
 extern "C"
 INT getRandomSeed();
 
+/*
+===============SamplerContext.h===============
+*/
+
+extern "C"
+void *createSamplerContext(char *path);
+
+extern "C"
+void destroySamplerContext(void *context);
+
+extern "C"
+void setContextBern(void *context, INT con);
+
+extern "C"
+void setContextRandomSeed(void *context, INT seed);
+
+extern "C"
+void setContextCorruptIndex(void *context, bool flag);
+
+extern "C"
+INT getContextEntityTotal(void *context);
+
+extern "C"
+INT getContextRelationTotal(void *context);
+
+extern "C"
+INT getContextTrainTotal(void *context);
+
+/*
+===============Corrupt.h===============
+*/
+
+extern "C"
+void setCorruptIndex(bool flag);
+
+extern "C"
+INT getCorruptIndexMemory();
+
 /*
 ===============Reader.h===============
 */
@@ -95,6 +161,29 @@ void getTrainingTriples(
 extern "C"
 void activateLoadOfAllTriples(bool);
 
+/*
+===============TextParser.h===============
+*/
+
+extern "C"
+void resetParseStats();
+
+extern "C"
+REAL getParseThroughput();
+
+/*
+===============BinaryDataset.h===============
+*/
+
+extern "C"
+void convertToBinaryDataset();
+
+extern "C"
+void importBinaryTrainFiles();
+
+extern "C"
+void importBinaryTestFiles();
+
 /*
 ===============ParallelUniverse.h===============
 */
@@ -168,7 +257,9 @@ void loadSnapshotTriples(int snapshot);
 */
 
 struct Parameter {
+    SamplerContext *ctx;
     INT id;
+    INT threads;
     INT *batch_h;
     INT *batch_t;
     INT *batch_r;
@@ -180,11 +271,16 @@ struct Parameter {
     bool val_loss;
     INT mode;
     bool filter_flag;
+    INT nbatches;
+    bool cross_sampling;
+    INT batchIndex;
 };
 
 void *getBatch(void *con) {
     Parameter *para = (Parameter *) (con);
+    SamplerContext &ctx = *para->ctx;
     INT id = para->id;
+    INT threads = para->threads;
     INT *batch_h = para->batch_h;
     INT *batch_t = para->batch_t;
     INT *batch_r = para->batch_r;
@@ -196,58 +292,66 @@ void *getBatch(void *con) {
     bool val_loss = para->val_loss;
     INT mode = para->mode;
     bool filter_flag = para->filter_flag;
+    INT batchIndex = para->batchIndex;
     INT lef, rig;
-    if (batchSize % workThreads == 0) {
-        lef = id * (batchSize / workThreads);
-        rig = (id + 1) * (batchSize / workThreads);
+    if (batchSize % threads == 0) {
+        lef = id * (batchSize / threads);
+        rig = (id + 1) * (batchSize / threads);
     } else {
-        lef = id * (batchSize / workThreads + 1);
-        rig = (id + 1) * (batchSize / workThreads + 1);
+        lef = id * (batchSize / threads + 1);
+        rig = (id + 1) * (batchSize / threads + 1);
         if (rig > batchSize) rig = batchSize;
     }
     REAL prob = 500;
     if (val_loss == false) {
         for (INT batch = lef; batch < rig; batch++) {
-            INT i = rand_max(id, trainTotal);
-            batch_h[batch] = trainList[i].h;
-            batch_t[batch] = trainList[i].t;
-            batch_r[batch] = trainList[i].r;
+            randSeek(ctx.streams[id], ctx.randomSeed, batchIndex, batch);
+            INT i = rand_max(ctx.streams[id], ctx.trainTotal);
+            batch_h[batch] = ctx.trainList[i].h;
+            batch_t[batch] = ctx.trainList[i].t;
+            batch_r[batch] = ctx.trainList[i].r;
             batch_y[batch] = 1;
             INT last = batchSize;
             for (INT times = 0; times < negRate; times++) {
                 if (mode == 0) {
-                    if (bernFlag)
-                        prob = 1000 * right_mean[trainList[i].r] /
-                               (right_mean[trainList[i].r] + left_mean[trainList[i].r]);
-                    if (randd(id) % 1000 < prob) {
-                        batch_h[batch + last] = trainList[i].h;
-                        batch_t[batch + last] = corrupt_head(id, trainList[i].h, trainList[i].r, filter_flag);
-                        batch_r[batch + last] = trainList[i].r;
+                    if (ctx.bernFlag)
+                        prob = 1000 * ctx.right_mean[ctx.trainList[i].r] /
+                               (ctx.right_mean[ctx.trainList[i].r] + ctx.left_mean[ctx.trainList[i].r]);
+                    if (nextRandom(ctx.streams[id]) % 1000 < prob) {
+                        batch_h[batch + last] = ctx.trainList[i].h;
+                        batch_t[batch + last] = (ctx.corruptIndexOn && filter_flag)
+                                                ? corrupt_head_indexed(ctx, id, i)
+                                                : corrupt_head(ctx, id, ctx.trainList[i].h, ctx.trainList[i].r, filter_flag);
+                        batch_r[batch + last] = ctx.trainList[i].r;
                     } else {
-                        batch_h[batch + last] = corrupt_tail(id, trainList[i].t, trainList[i].r, filter_flag);
-                        batch_t[batch + last] = trainList[i].t;
-                        batch_r[batch + last] = trainList[i].r;
+                        batch_h[batch + last] = (ctx.corruptIndexOn && filter_flag)
+                                                ? corrupt_tail_indexed(ctx, id, i)
+                                                : corrupt_tail(ctx, id, ctx.trainList[i].t, ctx.trainList[i].r, filter_flag);
+                        batch_t[batch + last] = ctx.trainList[i].t;
+                        batch_r[batch + last] = ctx.trainList[i].r;
                     }
                     batch_y[batch + last] = -1;
                     last += batchSize;
                 } else {
                     if (mode == -1) {
-                        batch_h[batch + last] = corrupt_tail(id, trainList[i].t, trainList[i].r);
-                        batch_t[batch + last] = trainList[i].t;
-                        batch_r[batch + last] = trainList[i].r;
+                        batch_h[batch + last] = ctx.corruptIndexOn ? corrupt_tail_indexed(ctx, id, i)
+                                                               : corrupt_tail(ctx, id, ctx.trainList[i].t, ctx.trainList[i].r);
+                        batch_t[batch + last] = ctx.trainList[i].t;
+                        batch_r[batch + last] = ctx.trainList[i].r;
                     } else {
-                        batch_h[batch + last] = trainList[i].h;
-                        batch_t[batch + last] = corrupt_head(id, trainList[i].h, trainList[i].r);
-                        batch_r[batch + last] = trainList[i].r;
+                        batch_h[batch + last] = ctx.trainList[i].h;
+                        batch_t[batch + last] = ctx.corruptIndexOn ? corrupt_head_indexed(ctx, id, i)
+                                                               : corrupt_head(ctx, id, ctx.trainList[i].h, ctx.trainList[i].r);
+                        batch_r[batch + last] = ctx.trainList[i].r;
                     }
                     batch_y[batch + last] = -1;
                     last += batchSize;
                 }
             }
             for (INT times = 0; times < negRelRate; times++) {
-                batch_h[batch + last] = trainList[i].h;
-                batch_t[batch + last] = trainList[i].t;
-                batch_r[batch + last] = corrupt_rel(id, trainList[i].h, trainList[i].t, trainList[i].r, p);
+                batch_h[batch + last] = ctx.trainList[i].h;
+                batch_t[batch + last] = ctx.trainList[i].t;
+                batch_r[batch + last] = corrupt_rel(ctx, id, ctx.trainList[i].h, ctx.trainList[i].t, ctx.trainList[i].r, p);
                 batch_y[batch + last] = -1;
                 last += batchSize;
             }
@@ -260,7 +364,138 @@ void *getBatch(void *con) {
             batch_y[batch] = 1;
         }
     }
-    pthread_exit(NULL);
+    return NULL;
+}
+
+// Parameters handed to the sampler pool, reused across batches.
+Parameter *samplingParameters = NULL;
+INT samplingParametersTotal = 0;
+pthread_mutex_t samplingMutex = PTHREAD_MUTEX_INITIALIZER;
+
+// Samples all nbatches batches of an epoch within a single pool dispatch. Batch b is written to
+// the block starting at b * batchSize * (1 + negRate + negRelRate). In cross sampling mode the
+// corruption side alternates between batches, starting with the given mode.
+void *getEpoch(void *con) {
+    Parameter *para = (Parameter *) (con);
+    INT batchSeqSize = para->batchSize * (1 + para->negRate + para->negRelRate);
+    Parameter batchPara = *para;
+    for (INT b = 0; b < para->nbatches; b++) {
+        INT offset = b * batchSeqSize;
+        batchPara.batch_h = para->batch_h + offset;
+        batchPara.batch_t = para->batch_t + offset;
+        batchPara.batch_r = para->batch_r + offset;
+        batchPara.batch_y = para->batch_y + offset;
+        batchPara.batchIndex = para->batchIndex + b;
+        if (para->cross_sampling)
+            batchPara.mode = (b % 2 == 0) ? para->mode : -para->mode;
+        getBatch((void *) &batchPara);
+    }
+    return NULL;
+}
+
+// Fills the parameters of all pool workers and runs job (getBatch or getEpoch) on the sampler pool.
+// The caller holds the lock of ctx, para and the streams of ctx have room for threads entries.
+void runSampling(
+        SamplerContext *ctx,
+        Parameter *para,
+        INT threads,
+        void *(*job)(void *),
+        INT *batch_h,
+        INT *batch_t,
+        INT *batch_r,
+        REAL *batch_y,
+        INT batchSize,
+        INT nbatches,
+        INT negRate,
+        INT negRelRate,
+        INT mode,
+        bool cross_sampling,
+        bool filter_flag,
+        bool p,
+        bool val_loss
+) {
+    for (INT id = 0; id < threads; id++) {
+        para[id].ctx = ctx;
+        para[id].id = id;
+        para[id].threads = threads;
+        para[id].batch_h = batch_h;
+        para[id].batch_t = batch_t;
+        para[id].batch_r = batch_r;
+        para[id].batch_y = batch_y;
+        para[id].batchSize = batchSize;
+        para[id].negRate = negRate;
+        para[id].negRelRate = negRelRate;
+        para[id].p = p;
+        para[id].val_loss = val_loss;
+        para[id].mode = mode;
+        para[id].filter_flag = filter_flag;
+        para[id].nbatches = nbatches;
+        para[id].cross_sampling = cross_sampling;
+        para[id].batchIndex = ctx->samplingBatch;
+    }
+    ctx->samplingBatch += nbatches;
+    runSamplerPool(job, (void *) para, sizeof(Parameter), threads);
+}
+
+// Samples with the global training data, see SamplerContext.h.
+void runGlobalSampling(
+        void *(*job)(void *),
+        INT *batch_h,
+        INT *batch_t,
+        INT *batch_r,
+        REAL *batch_y,
+        INT batchSize,
+        INT nbatches,
+        INT negRate,
+        INT negRelRate,
+        INT mode,
+        bool cross_sampling,
+        bool filter_flag,
+        bool p,
+        bool val_loss
+) {
+    pthread_mutex_lock(&samplingMutex);
+    ensureCorruptIndex();
+    syncGlobalSamplerContext();
+    INT threads = workThreads;
+    ensureContextStreams(&globalSamplerContext, threads);
+    if (samplingParametersTotal < threads) {
+        samplingParameters = (Parameter *) realloc(samplingParameters, threads * sizeof(Parameter));
+        samplingParametersTotal = threads;
+    }
+    runSampling(&globalSamplerContext, samplingParameters, threads, job, batch_h, batch_t, batch_r, batch_y, batchSize,
+                nbatches, negRate, negRelRate, mode, cross_sampling, filter_flag, p, val_loss);
+    samplingBatch = globalSamplerContext.samplingBatch;
+    pthread_mutex_unlock(&samplingMutex);
+}
+
+// Samples with the training data of a context created by createSamplerContext. Contexts can be
+// sampled from different threads at the same time, their pool dispatches are serialized.
+void runContextSampling(
+        void *context,
+        void *(*job)(void *),
+        INT *batch_h,
+        INT *batch_t,
+        INT *batch_r,
+        REAL *batch_y,
+        INT batchSize,
+        INT nbatches,
+        INT negRate,
+        INT negRelRate,
+        INT mode,
+        bool cross_sampling,
+        bool filter_flag
+) {
+    SamplerContext *ctx = (SamplerContext *) context;
+    pthread_mutex_lock(&ctx->mutex);
+    INT threads = workThreads;
+    ensureContextStreams(ctx, threads);
+    ensureContextCorruptIndex(ctx);
+    Parameter *para = (Parameter *) calloc(threads, sizeof(Parameter));
+    runSampling(ctx, para, threads, job, batch_h, batch_t, batch_r, batch_y, batchSize, nbatches, negRate, negRelRate,
+                mode, cross_sampling, filter_flag, false, false);
+    free(para);
+    pthread_mutex_unlock(&ctx->mutex);
 }
 
 extern "C"
@@ -277,29 +512,9 @@ void sampling(
         bool p = false,
         bool val_loss = false
 ) {
-    pthread_t *pt = (pthread_t *) malloc(workThreads * sizeof(pthread_t));
-    Parameter *para = (Parameter *) malloc(workThreads * sizeof(Parameter));
-    for (INT threads = 0; threads < workThreads; threads++) {
-        para[threads].id = threads;
-        para[threads].batch_h = batch_h;
-        para[threads].batch_t = batch_t;
-        para[threads].batch_r = batch_r;
-        para[threads].batch_y = batch_y;
-        para[threads].batchSize = batchSize;
-        para[threads].negRate = negRate;
-        para[threads].negRelRate = negRelRate;
-        para[threads].p = p;
-        para[threads].val_loss = val_loss;
-        para[threads].mode = mode;
-        para[threads].filter_flag = filter_flag;
-        pthread_create(&pt[threads], NULL, getBatch, (void *) (para + threads));
-    }
-    for (INT threads = 0; threads < workThreads; threads++)
-        pthread_join(pt[threads], NULL);
+    runGlobalSampling(getBatch, batch_h, batch_t, batch_r, batch_y, batchSize, 1, negRate, negRelRate, mode,
+                      false, filter_flag, p, val_loss);
 
-    free(pt);
-    free(para);
-    
     if (checkOn){
         if(swap){
             checkSampling(batch_h, batch_t, batch_r, batch_y, trainListUniverse, trainTotal, batchSize);
@@ -309,6 +524,75 @@ void sampling(
     }
 }
 
+extern "C"
+void samplingEpoch(
+        INT *batch_h,
+        INT *batch_t,
+        INT *batch_r,
+        REAL *batch_y,
+        INT batchSize,
+        INT nbatches,
+        INT negRate = 1,
+        INT negRelRate = 0,
+        INT mode = 0,
+        bool cross_sampling = false,
+        bool filter_flag = true,
+        bool p = false
+) {
+    runGlobalSampling(getEpoch, batch_h, batch_t, batch_r, batch_y, batchSize, nbatches, negRate, negRelRate,
+                      mode, cross_sampling, filter_flag, p, false);
+
+    if (checkOn) {
+        INT batchSeqSize = batchSize * (1 + negRate + negRelRate);
+        for (INT b = 0; b < nbatches; b++) {
+            INT offset = b * batchSeqSize;
+            if (swap) {
+                checkSampling(batch_h + offset, batch_t + offset, batch_r + offset, batch_y + offset,
+                              trainListUniverse, trainTotal, batchSize);
+            } else {
+                checkSampling(batch_h + offset, batch_t + offset, batch_r + offset, batch_y + offset,
+                              trainList, trainTotal, batchSize);
+            }
+        }
+    }
+}
+
+extern "C"
+void contextSampling(
+        void *context,
+        INT *batch_h,
+        INT *batch_t,
+        INT *batch_r,
+        REAL *batch_y,
+        INT batchSize,
+        INT negRate = 1,
+        INT negRelRate = 0,
+        INT mode = 0,
+        bool filter_flag = true
+) {
+    runContextSampling(context, getBatch, batch_h, batch_t, batch_r, batch_y, batchSize, 1, negRate, negRelRate,
+                       mode, false, filter_flag);
+}
+
+extern "C"
+void contextSamplingEpoch(
+        void *context,
+        INT *batch_h,
+        INT *batch_t,
+        INT *batch_r,
+        REAL *batch_y,
+        INT batchSize,
+        INT nbatches,
+        INT negRate = 1,
+        INT negRelRate = 0,
+        INT mode = 0,
+        bool cross_sampling = false,
+        bool filter_flag = true
+) {
+    runContextSampling(context, getEpoch, batch_h, batch_t, batch_r, batch_y, batchSize, nbatches, negRate,
+                       negRelRate, mode, cross_sampling, filter_flag);
+}
+
 extern "C"
 INT getNumOfNegatives(INT entity, INT relation, bool entity_is_tail) {
     
@@ -0,0 +1,303 @@
+/*
+MIT License
+
+Copyright (c) 2020 Rashid Lafraie
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+*/
+
+#ifndef BINARYDATASET_H
+#define BINARYDATASET_H
+
+#include "Setting.h"
+#include "Triple.h"
+#include "Utilities.h"
+#include "Reader.h"
+#include "CorruptIndex.h"
+#include <cstdlib>
+#include <cstring>
+#include <algorithm>
+#include <fcntl.h>
+#include <unistd.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+
+/*
+===================== Binary dataset format =========================
+*/
+
+// dataset.bin holds the header followed by the sections listed below, each aligned to 64 bytes.
+// Triples and index arrays are stored with the in-memory layout of Triple, INT and REAL, so the
+// loaders point the helper arrays directly into the (copy-on-write) mapping of the file and
+// processes loading the same dataset share its pages. All triple lists are sorted and
+// deduplicated by the converter.
+
+#define BINARY_DATASET_MAGIC "OPENKEB"
+#define BINARY_DATASET_VERSION 1
+#define BINARY_DATASET_ALIGNMENT 64
+
+enum BinaryDatasetSection {
+    SECTION_TRAIN_HEAD,     // trainList / trainHead, sorted by cmp_head
+    SECTION_TRAIN_TAIL,
+    SECTION_TRAIN_REL,
+    SECTION_TRAIN_REL2,
+    SECTION_FREQ_REL,
+    SECTION_FREQ_ENT,
+    SECTION_LEF_HEAD,
+    SECTION_RIG_HEAD,
+    SECTION_LEF_TAIL,
+    SECTION_RIG_TAIL,
+    SECTION_LEF_REL,
+    SECTION_RIG_REL,
+    SECTION_LEF_REL2,
+    SECTION_RIG_REL2,
+    SECTION_LEFT_MEAN,
+    SECTION_RIGHT_MEAN,
+    SECTION_TEST_LIST,      // sorted by cmp_rel2
+    SECTION_VALID_LIST,     // sorted by cmp_rel2
+    SECTION_TRIPLE_LIST,    // train, valid and test triples, sorted by cmp_head
+    SECTION_ALL_TRIPLE_LIST,// triple2id.txt if present, sorted by cmp_head
+    SECTION_TEST_LEF,
+    SECTION_TEST_RIG,
+    SECTION_VALID_LEF,
+    SECTION_VALID_RIG,
+    SECTION_TOTAL
+};
+
+struct BinaryDatasetHeader {
+    char magic[8];
+    INT version;
+    INT entityTotal;
+    INT relationTotal;
+    INT trainTotal;
+    INT testTotal;
+    INT validTotal;
+    INT tripleTotal;
+    INT allTripleTotal;
+    INT offset[SECTION_TOTAL];
+    INT size[SECTION_TOTAL];
+};
+
+/*
+===================== Converter =========================
+*/
+
+template<typename Header>
+void writeBinarySection(FILE *fout, Header &header, INT section, const void *data, INT size) {
+    INT position = ftell(fout);
+    INT padding = (BINARY_DATASET_ALIGNMENT - position % BINARY_DATASET_ALIGNMENT) % BINARY_DATASET_ALIGNMENT;
+    for (INT i = 0; i < padding; i++)
+        fputc(0, fout);
+    header.offset[section] = position + padding;
+    header.size[section] = size;
+    if (size > 0)
+        fwrite(data, 1, size, fout);
+}
+
+INT deduplicateTriples(Triple *list, INT total) {
+    if (total == 0)
+        return 0;
+    std::sort(list, list + total, Triple::cmp_head);
+    INT unique = 1;
+    for (INT i = 1; i < total; i++)
+        if (list[i].h != list[unique - 1].h || list[i].r != list[unique - 1].r || list[i].t != list[unique - 1].t)
+            list[unique++] = list[i];
+    return unique;
+}
+
+// Reads the text files in inPath and writes them to inPath + "dataset.bin".
+extern "C"
+void convertToBinaryDataset() {
+    BinaryDatasetHeader header;
+    memset(&header, 0, sizeof(header));
+    strncpy(header.magic, BINARY_DATASET_MAGIC, sizeof(header.magic));
+    header.version = BINARY_DATASET_VERSION;
+
+    FILE *fout = fopen((inPath + "dataset.bin").c_str(), "wb");
+    if (fout == NULL) {
+        printf("Cannot write %sdataset.bin.\n", inPath.c_str());
+        return;
+    }
+    fwrite(&header, sizeof(header), 1, fout);
+
+    importTrainFiles();
+    header.entityTotal = entityTotal;
+    header.relationTotal = relationTotal;
+    header.trainTotal = trainTotal;
+    writeBinarySection(fout, header, SECTION_TRAIN_HEAD, trainHead, trainTotal * sizeof(Triple));
+    writeBinarySection(fout, header, SECTION_TRAIN_TAIL, trainTail, trainTotal * sizeof(Triple));
+    writeBinarySection(fout, header, SECTION_TRAIN_REL, trainRel, trainTotal * sizeof(Triple));
+    writeBinarySection(fout, header, SECTION_TRAIN_REL2, trainRel2, trainTotal * sizeof(Triple));
+    writeBinarySection(fout, header, SECTION_FREQ_REL, freqRel, relationTotal * sizeof(INT));
+    writeBinarySection(fout, header, SECTION_FREQ_ENT, freqEnt, entityTotal * sizeof(INT));
+    writeBinarySection(fout, header, SECTION_LEF_HEAD, lefHead, entityTotal * sizeof(INT));
+    writeBinarySection(fout, header, SECTION_RIG_HEAD, rigHead, entityTotal * sizeof(INT));
+    writeBinarySection(fout, header, SECTION_LEF_TAIL, lefTail, entityTotal * sizeof(INT));
+    writeBinarySection(fout, header, SECTION_RIG_TAIL, rigTail, entityTotal * sizeof(INT));
+    writeBinarySection(fout, header, SECTION_LEF_REL, lefRel, entityTotal * sizeof(INT));
+    writeBinarySection(fout, header, SECTION_RIG_REL, rigRel, entityTotal * sizeof(INT));
+    writeBinarySection(fout, header, SECTION_LEF_REL2, lefRel2, relationTotal * sizeof(INT));
+    writeBinarySection(fout, header, SECTION_RIG_REL2, rigRel2, relationTotal * sizeof(INT));
+    writeBinarySection(fout, header, SECTION_LEFT_MEAN, left_mean, relationTotal * sizeof(REAL));
+    writeBinarySection(fout, header, SECTION_RIGHT_MEAN, right_mean, relationTotal * sizeof(REAL));
+
+    bool loadAllTripleBefore = loadAllTriple;
+    loadAllTriple = false;
+    importTestFiles();
+    header.testTotal = testTotal;
+    header.validTotal = validTotal;
+    header.tripleTotal = deduplicateTriples(tripleList, tripleTotal);
+    writeBinarySection(fout, header, SECTION_TEST_LIST, testList, testTotal * sizeof(Triple));
+    writeBinarySection(fout, header, SECTION_VALID_LIST, validList, validTotal * sizeof(Triple));
+    writeBinarySection(fout, header, SECTION_TRIPLE_LIST, tripleList, header.tripleTotal * sizeof(Triple));
+    writeBinarySection(fout, header, SECTION_TEST_LEF, testLef, relationTotal * sizeof(INT));
+    writeBinarySection(fout, header, SECTION_TEST_RIG, testRig, relationTotal * sizeof(INT));
+    writeBinarySection(fout, header, SECTION_VALID_LEF, validLef, relationTotal * sizeof(INT));
+    writeBinarySection(fout, header, SECTION_VALID_RIG, validRig, relationTotal * sizeof(INT));
+
+    FILE *fall = fopen((inPath + "triple2id.txt").c_str(), "r");
+    if (fall != NULL) {
+        fclose(fall);
+        loadAllTriple = true;
+        importTestFiles();
+        header.allTripleTotal = deduplicateTriples(tripleList, tripleTotal);
+        writeBinarySection(fout, header, SECTION_ALL_TRIPLE_LIST, tripleList, header.allTripleTotal * sizeof(Triple));
+    }
+    loadAllTriple = loadAllTripleBefore;
+    trainTotal = header.trainTotal;
+
+    fseek(fout, 0, SEEK_SET);
+    fwrite(&header, sizeof(header), 1, fout);
+    fclose(fout);
+    printf("Wrote %sdataset.bin.\n", inPath.c_str());
+}
+
+/*
+===================== Loader =========================
+*/
+
+std::string binaryDatasetPath = "";
+BinaryDatasetHeader *binaryDataset = NULL;
+
+// Maps inPath + "dataset.bin" unless it is mapped already. Mappings are kept for the lifetime of
+// the process since helper arrays of earlier imports may still point into them.
+bool mapBinaryDataset() {
+    std::string path = inPath + "dataset.bin";
+    if (binaryDataset != NULL && binaryDatasetPath == path)
+        return true;
+
+    int fd = open(path.c_str(), O_RDONLY);
+    if (fd < 0) {
+        printf("Cannot open %s, convert the dataset first.\n", path.c_str());
+        return false;
+    }
+    struct stat st;
+    fstat(fd, &st);
+    char *data = (char *) mmap(NULL, st.st_size, PROT_READ | PROT_WRITE, MAP_PRIVATE, fd, 0);
+    close(fd);
+    if (data == MAP_FAILED) {
+        printf("Cannot map %s.\n", path.c_str());
+        return false;
+    }
+
+    BinaryDatasetHeader *header = (BinaryDatasetHeader *) data;
+    if (strncmp(header->magic, BINARY_DATASET_MAGIC, sizeof(header->magic)) != 0 ||
+        header->version != BINARY_DATASET_VERSION) {
+        printf("%s is not a binary dataset of version %d.\n", path.c_str(), BINARY_DATASET_VERSION);
+        munmap(data, st.st_size);
+        return false;
+    }
+    mappedDatasets.push_back(std::make_pair(data, (size_t) st.st_size));
+    binaryDataset = header;
+    binaryDatasetPath = path;
+    return true;
+}
+
+template<typename T>
+T *binarySection(INT section) {
+    if (binaryDataset->size[section] == 0)
+        return NULL;
+    return (T *) ((char *) binaryDataset + binaryDataset->offset[section]);
+}
+
+extern "C"
+void importBinaryTrainFiles() {
+    printf("The toolkit is importing datasets.\n");
+    if (!mapBinaryDataset())
+        return;
+
+    relationTotal = binaryDataset->relationTotal;
+    entityTotal = binaryDataset->entityTotal;
+    trainTotal = binaryDataset->trainTotal;
+    printf("The total of relations is %ld.\n", relationTotal);
+    printf("The total of entities is %ld.\n", entityTotal);
+    printf("The total of train triples is %ld.\n", trainTotal);
+
+    trainList = trainHead = binarySection<Triple>(SECTION_TRAIN_HEAD);
+    trainTail = binarySection<Triple>(SECTION_TRAIN_TAIL);
+    trainRel = binarySection<Triple>(SECTION_TRAIN_REL);
+    trainRel2 = binarySection<Triple>(SECTION_TRAIN_REL2);
+    freqRel = binarySection<INT>(SECTION_FREQ_REL);
+    freqEnt = binarySection<INT>(SECTION_FREQ_ENT);
+    lefHead = binarySection<INT>(SECTION_LEF_HEAD);
+    rigHead = binarySection<INT>(SECTION_RIG_HEAD);
+    lefTail = binarySection<INT>(SECTION_LEF_TAIL);
+    rigTail = binarySection<INT>(SECTION_RIG_TAIL);
+    lefRel = binarySection<INT>(SECTION_LEF_REL);
+    rigRel = binarySection<INT>(SECTION_RIG_REL);
+    lefRel2 = binarySection<INT>(SECTION_LEF_REL2);
+    rigRel2 = binarySection<INT>(SECTION_RIG_REL2);
+    left_mean = binarySection<REAL>(SECTION_LEFT_MEAN);
+    right_mean = binarySection<REAL>(SECTION_RIGHT_MEAN);
+    resetCorruptIndex(corruptIndex);
+}
+
+extern "C"
+void importBinaryTestFiles() {
+    if (!mapBinaryDataset())
+        return;
+
+    relationTotal = binaryDataset->relationTotal;
+    entityTotal = binaryDataset->entityTotal;
+    trainTotal = binaryDataset->trainTotal;
+    testTotal = binaryDataset->testTotal;
+    validTotal = binaryDataset->validTotal;
+
+    testList = binarySection<Triple>(SECTION_TEST_LIST);
+    validList = binarySection<Triple>(SECTION_VALID_LIST);
+    if (loadAllTriple && binaryDataset->allTripleTotal > 0) {
+        tripleTotal = binaryDataset->allTripleTotal;
+        tripleList = binarySection<Triple>(SECTION_ALL_TRIPLE_LIST);
+        printf("Captured %ld triples in total.\n", tripleTotal);
+    } else {
+        tripleTotal = binaryDataset->tripleTotal;
+        tripleList = binarySection<Triple>(SECTION_TRIPLE_LIST);
+    }
+    testLef = binarySection<INT>(SECTION_TEST_LEF);
+    testRig = binarySection<INT>(SECTION_TEST_RIG);
+    validLef = binarySection<INT>(SECTION_VALID_LEF);
+    validRig = binarySection<INT>(SECTION_VALID_RIG);
+    buildKnownAnswers(knownAnswers, tripleList, tripleTotal, NULL, 0);
+
+    printf("The total of test triples is %ld.\n", testTotal);
+    printf("The total of valid triples is %ld.\n", validTotal);
+    printf("The total of train triples is %ld.\n", trainTotal);
+}
+
+#endif
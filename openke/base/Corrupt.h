@@ -5,18 +5,55 @@
 #include "Reader.h"
 #include "UniverseSetting.h"
 #include "Incremental.h"
+#include "SamplerContext.h"
 
-INT corrupt_head(INT id, INT h, INT r, bool filter_flag = true) {
+// draw a tail entity which does not occur with the (h,r) group ctx.trainHead[ll..rr].
+INT corrupt_head_range(SamplerContext &ctx, INT id, INT ll, INT rr) {
+	INT lef, rig, mid;
+	INT tmp = rand_max(ctx.streams[id], ctx.entityTotal - (rr - ll + 1));
+
+	if (tmp < ctx.trainHead[ll].t) return tmp;
+	if (tmp > ctx.trainHead[rr].t - rr + ll - 1) return tmp + rr - ll + 1;
+	lef = ll, rig = rr + 1;
+	while (lef + 1 < rig) {
+		mid = (lef + rig) >> 1;
+		if (ctx.trainHead[mid].t - mid + ll - 1 < tmp)
+			lef = mid;
+		else 
+			rig = mid;
+	}
+	return tmp + lef - ll + 1;
+}
+
+// draw a head entity which does not occur with the (r,t) group ctx.trainTail[ll..rr].
+INT corrupt_tail_range(SamplerContext &ctx, INT id, INT ll, INT rr) {
+	INT lef, rig, mid;
+	INT tmp = rand_max(ctx.streams[id], ctx.entityTotal - (rr - ll + 1));
+
+	if (tmp < ctx.trainTail[ll].h) return tmp;
+	if (tmp > ctx.trainTail[rr].h - rr + ll - 1) return tmp + rr - ll + 1;
+	lef = ll, rig = rr + 1;
+	while (lef + 1 < rig) {
+		mid = (lef + rig) >> 1;
+		if (ctx.trainTail[mid].h - mid + ll - 1 < tmp)
+			lef = mid;
+		else 
+			rig = mid;
+	}
+	return tmp + lef - ll + 1;
+}
+
+INT corrupt_head(SamplerContext &ctx, INT id, INT h, INT r, bool filter_flag = true) {
 	INT lef, rig, mid, ll, rr;
 	
-	if (incrementalSetting and not swap){
-			INT rand_index = rand(0, num_currently_contained_entities);
-        	INT rand_entity = currently_contained_entities[rand_index]; 
+	if (ctx.containedEntities != NULL){
+			INT rand_index = rand_max(ctx.streams[id], ctx.containedTotal);
+        	INT rand_entity = ctx.containedEntities[rand_index]; 
 			return rand_entity;	
 	}
 
 	if (not filter_flag) {
-		INT tmp = rand_max(id, entityTotal - 1);
+		INT tmp = rand_max(ctx.streams[id], ctx.entityTotal - 1);
 
 		if (tmp < h)
 			return tmp;
@@ -24,140 +61,161 @@ INT corrupt_head(INT id, INT h, INT r, bool filter_flag = true) {
 			return tmp + 1;
 	}
 	
-	lef = lefHead[h] - 1;
-	rig = rigHead[h];
+	lef = ctx.lefHead[h] - 1;
+	rig = ctx.rigHead[h];
 	while (lef + 1 < rig) {
 		mid = (lef + rig) >> 1;
-		if (trainHead[mid].r >= r) rig = mid; else
+		if (ctx.trainHead[mid].r >= r) rig = mid; else
 		lef = mid;
 	}
 	ll = rig;
-	lef = lefHead[h];
-	rig = rigHead[h] + 1;
+	lef = ctx.lefHead[h];
+	rig = ctx.rigHead[h] + 1;
 	while (lef + 1 < rig) {
 		mid = (lef + rig) >> 1;
-		if (trainHead[mid].r <= r) lef = mid; else
+		if (ctx.trainHead[mid].r <= r) lef = mid; else
 		rig = mid;
 	}
 	rr = lef;
-	
-	INT tmp = rand_max(id, entityTotal - (rr - ll + 1));
-
-	if (tmp < trainHead[ll].t) return tmp;
-	if (tmp > trainHead[rr].t - rr + ll - 1) return tmp + rr - ll + 1;
-	lef = ll, rig = rr + 1;
-	while (lef + 1 < rig) {
-		mid = (lef + rig) >> 1;
-		if (trainHead[mid].t - mid + ll - 1 < tmp)
-			lef = mid;
-		else 
-			rig = mid;
-	}
-	return tmp + lef - ll + 1;
+	return corrupt_head_range(ctx, id, ll, rr);
 }
 
-INT corrupt_tail(INT id, INT t, INT r, bool filter_flag = true) {
+INT corrupt_tail(SamplerContext &ctx, INT id, INT t, INT r, bool filter_flag = true) {
 	INT lef, rig, mid, ll, rr;
 	
-	if (incrementalSetting and not swap){
-			INT rand_index = rand(0, num_currently_contained_entities);
-        	INT rand_entity = currently_contained_entities[rand_index];
+	if (ctx.containedEntities != NULL){
+			INT rand_index = rand_max(ctx.streams[id], ctx.containedTotal);
+        	INT rand_entity = ctx.containedEntities[rand_index];
 			return rand_entity;	
 	}
 	
 	if (not filter_flag) {
-		INT tmp = rand_max(id, entityTotal - 1);
+		INT tmp = rand_max(ctx.streams[id], ctx.entityTotal - 1);
 		if (tmp < t)
 			return tmp;
 		else
 			return tmp + 1;
 	}
-	lef = lefTail[t] - 1;
-	rig = rigTail[t];
+	lef = ctx.lefTail[t] - 1;
+	rig = ctx.rigTail[t];
 	while (lef + 1 < rig) {
 		mid = (lef + rig) >> 1;
-		if (trainTail[mid].r >= r) rig = mid; else
+		if (ctx.trainTail[mid].r >= r) rig = mid; else
 		lef = mid;
 	}
 	ll = rig;
-	lef = lefTail[t];
-	rig = rigTail[t] + 1;
+	lef = ctx.lefTail[t];
+	rig = ctx.rigTail[t] + 1;
 	while (lef + 1 < rig) {
 		mid = (lef + rig) >> 1;
-		if (trainTail[mid].r <= r) lef = mid; else
+		if (ctx.trainTail[mid].r <= r) lef = mid; else
 		rig = mid;
 	}
 	rr = lef;
-	
-	INT tmp = rand_max(id, entityTotal - (rr - ll + 1));
+	return corrupt_tail_range(ctx, id, ll, rr);
+}
 
-	if (tmp < trainTail[ll].h) return tmp;
-	if (tmp > trainTail[rr].h - rr + ll - 1) return tmp + rr - ll + 1;
-	lef = ll, rig = rr + 1;
-	while (lef + 1 < rig) {
-		mid = (lef + rig) >> 1;
-		if (trainTail[mid].h - mid + ll - 1 < tmp)
-			lef = mid;
-		else 
-			rig = mid;
+
+// Filtered corruption of the training triple trainList[i] based on the corrupt index. Draws
+// the same entities as corrupt_head/corrupt_tail without searching for the triple's group.
+INT corrupt_head_indexed(SamplerContext &ctx, INT id, INT i) {
+	if (ctx.containedEntities != NULL){
+		INT rand_index = rand_max(ctx.streams[id], ctx.containedTotal);
+		return ctx.containedEntities[rand_index];
 	}
-	return tmp + lef - ll + 1;
+	INT group = ctx.corruptIndex.headGroup[i];
+	return corrupt_head_range(ctx, id, ctx.corruptIndex.headOffset[group], ctx.corruptIndex.headOffset[group + 1] - 1);
+}
+
+INT corrupt_tail_indexed(SamplerContext &ctx, INT id, INT i) {
+	if (ctx.containedEntities != NULL){
+		INT rand_index = rand_max(ctx.streams[id], ctx.containedTotal);
+		return ctx.containedEntities[rand_index];
+	}
+	INT group = ctx.corruptIndex.tailGroup[i];
+	return corrupt_tail_range(ctx, id, ctx.corruptIndex.tailOffset[group], ctx.corruptIndex.tailOffset[group + 1] - 1);
+}
+
+// Builds the corrupt index for the current training triples if it is enabled and outdated.
+void ensureCorruptIndex() {
+	if (not corruptIndexOn or corruptIndex.valid or trainList == NULL)
+		return;
+	buildCorruptIndex(corruptIndex, trainList, trainTotal);
+	printf("Corrupt index: %ld (h,r) groups, %ld (r,t) groups, %.2f MB.\n", corruptIndex.headGroupTotal,
+		   corruptIndex.tailGroupTotal, getCorruptIndexBytes(corruptIndex, trainTotal) / 1048576.0);
+}
+
+extern "C"
+void setCorruptIndex(bool flag) {
+	corruptIndexOn = flag;
+	if (flag) {
+		ensureCorruptIndex();
+	} else {
+		resetCorruptIndex(corruptIndex);
+		resetCorruptIndex(corruptIndexUniverse);
+	}
+}
+
+// Memory in bytes used by the corrupt index of the current training triples.
+extern "C"
+INT getCorruptIndexMemory() {
+	return getCorruptIndexBytes(corruptIndex, trainTotal);
 }
 
 
-INT corrupt_rel(INT id, INT h, INT t, INT r, bool p = false, bool filter_flag = true) {
+INT corrupt_rel(SamplerContext &ctx, INT id, INT h, INT t, INT r, bool p = false, bool filter_flag = true) {
 	INT lef, rig, mid, ll, rr;
 	if (not filter_flag) {
-		INT tmp = rand_max(id, relationTotal - 1);
+		INT tmp = rand_max(ctx.streams[id], ctx.relationTotal - 1);
 		if (tmp < r)
 			return tmp;
 		else
 			return tmp + 1;
 	}
-	lef = lefRel[h] - 1;
-	rig = rigRel[h];
+	lef = ctx.lefRel[h] - 1;
+	rig = ctx.rigRel[h];
 	while (lef + 1 < rig) {
 		mid = (lef + rig) >> 1;
-		if (trainRel[mid].t >= t) rig = mid; else
+		if (ctx.trainRel[mid].t >= t) rig = mid; else
 		lef = mid;
 	}
 	ll = rig;
-	lef = lefRel[h];
-	rig = rigRel[h] + 1;
+	lef = ctx.lefRel[h];
+	rig = ctx.rigRel[h] + 1;
 	while (lef + 1 < rig) {
 		mid = (lef + rig) >> 1;
-		if (trainRel[mid].t <= t) lef = mid; else
+		if (ctx.trainRel[mid].t <= t) lef = mid; else
 		rig = mid;
 	}
 	rr = lef;
 	INT tmp;
 	if(p == false) {	
-		tmp = rand_max(id, relationTotal - (rr - ll + 1));
+		tmp = rand_max(ctx.streams[id], ctx.relationTotal - (rr - ll + 1));
 	}
 	else {
-		INT start = r * (relationTotal - 1);
+		INT start = r * (ctx.relationTotal - 1);
 		REAL sum = 1;
-		bool *record = (bool *)calloc(relationTotal - 1, sizeof(bool));
+		bool *record = (bool *)calloc(ctx.relationTotal - 1, sizeof(bool));
 		for (INT i = ll; i <= rr; ++i){
-			if (trainRel[i].r > r){
-				sum -= prob[start + trainRel[i].r-1];
-				record[trainRel[i].r-1] = true;
+			if (ctx.trainRel[i].r > r){
+				sum -= prob[start + ctx.trainRel[i].r-1];
+				record[ctx.trainRel[i].r-1] = true;
 			}
-			else if (trainRel[i].r < r){
-				sum -= prob[start + trainRel[i].r];
-				record[trainRel[i].r] = true;
+			else if (ctx.trainRel[i].r < r){
+				sum -= prob[start + ctx.trainRel[i].r];
+				record[ctx.trainRel[i].r] = true;
 			}
 		}		
-		REAL *prob_tmp = (REAL *)calloc(relationTotal-(rr-ll+1), sizeof(REAL));
+		REAL *prob_tmp = (REAL *)calloc(ctx.relationTotal-(rr-ll+1), sizeof(REAL));
 		INT cnt = 0;
 		REAL rec = 0;
-		for (INT i = start; i < start + relationTotal - 1; ++i) {
+		for (INT i = start; i < start + ctx.relationTotal - 1; ++i) {
 			if (record[i-start])
 				continue;
 			rec += prob[i] / sum;
 			prob_tmp[cnt++] = rec;
 		}
-		REAL m = rand_max(id, 10000) / 10000.0;
+		REAL m = rand_max(ctx.streams[id], 10000) / 10000.0;
 		lef = 0;
 		rig = cnt - 1;
 		while (lef < rig) {
@@ -171,12 +229,12 @@ INT corrupt_rel(INT id, INT h, INT t, INT r, bool p = false, bool filter_flag =
 		free(prob_tmp);
 		free(record);
 	}
-	if (tmp < trainRel[ll].r) return tmp;
-	if (tmp > trainRel[rr].r - rr + ll - 1) return tmp + rr - ll + 1;
+	if (tmp < ctx.trainRel[ll].r) return tmp;
+	if (tmp > ctx.trainRel[rr].r - rr + ll - 1) return tmp + rr - ll + 1;
 	lef = ll, rig = rr + 1;
 	while (lef + 1 < rig) {
 		mid = (lef + rig) >> 1;
-		if (trainRel[mid].r - mid + ll - 1 < tmp)
+		if (ctx.trainRel[mid].r - mid + ll - 1 < tmp)
 			lef = mid;
 		else 
 			rig = mid;
@@ -210,7 +268,8 @@ INT corrupt(INT h, INT r){
 		} else {
 			loop ++;
 			if (loop >= 1000) {
-				return corrupt_head(0, h, r);
+				syncGlobalSamplerContext();
+				return corrupt_head(globalSamplerContext, 0, h, r);
 			}
 		} 
 	}
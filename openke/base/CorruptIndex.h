@@ -0,0 +1,122 @@
+/*
+MIT License
+
+Copyright (c) 2020 Rashid Lafraie
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+*/
+
+#ifndef CORRUPTINDEX_H
+#define CORRUPTINDEX_H
+
+#include "Setting.h"
+#include "Triple.h"
+#include "Utilities.h"
+#include <cstdlib>
+#include <algorithm>
+
+/*
+===================== Index for filtered negative sampling =========================
+*/
+
+// For every training triple the index stores the (h,r) group it belongs to in trainHead and
+// the (r,t) group it belongs to in trainTail. Group g covers [offset[g], offset[g + 1]) of the
+// respective array, so the filtered corruption of a training triple does not need to locate the
+// group by binary searching over all triples of its entity.
+
+struct CorruptIndex {
+    INT *headGroup;
+    INT *headOffset;
+    INT *tailGroup;
+    INT *tailOffset;
+    INT headGroupTotal;
+    INT tailGroupTotal;
+    bool valid;
+};
+
+CorruptIndex corruptIndex = {NULL, NULL, NULL, NULL, 0, 0, false};
+
+bool corruptIndexOn = false;
+
+void resetCorruptIndex(CorruptIndex &index) {
+    resetIntHelper(index.headGroup);
+    resetIntHelper(index.headOffset);
+    resetIntHelper(index.tailGroup);
+    resetIntHelper(index.tailOffset);
+    index.headGroupTotal = 0;
+    index.tailGroupTotal = 0;
+    index.valid = false;
+}
+
+// trainingList has to be sorted with cmp_head, i.e. in the order of trainHead.
+void buildCorruptIndex(CorruptIndex &index, Triple *trainingList, INT trainingTotal) {
+    resetCorruptIndex(index);
+    if (trainingTotal == 0)
+        return;
+
+    INT *order = (INT *) calloc(trainingTotal, sizeof(INT));
+    for (INT i = 0; i < trainingTotal; i++)
+        order[i] = i;
+    // order[k] is the position in trainingList of trainTail[k]
+    std::sort(order, order + trainingTotal, [trainingList](INT a, INT b) {
+        return Triple::cmp_tail(trainingList[a], trainingList[b]);
+    });
+
+    index.headGroupTotal = 1;
+    index.tailGroupTotal = 1;
+    for (INT i = 1; i < trainingTotal; i++) {
+        if (trainingList[i].h != trainingList[i - 1].h || trainingList[i].r != trainingList[i - 1].r)
+            index.headGroupTotal++;
+        if (trainingList[order[i]].t != trainingList[order[i - 1]].t ||
+            trainingList[order[i]].r != trainingList[order[i - 1]].r)
+            index.tailGroupTotal++;
+    }
+
+    callocIntArray(index.headGroup, trainingTotal);
+    callocIntArray(index.tailGroup, trainingTotal);
+    callocIntArray(index.headOffset, index.headGroupTotal + 1);
+    callocIntArray(index.tailOffset, index.tailGroupTotal + 1);
+
+    INT headGroup = 0, tailGroup = 0;
+    index.headGroup[0] = 0;
+    index.tailGroup[order[0]] = 0;
+    index.headOffset[0] = index.tailOffset[0] = 0;
+    for (INT i = 1; i < trainingTotal; i++) {
+        if (trainingList[i].h != trainingList[i - 1].h || trainingList[i].r != trainingList[i - 1].r)
+            index.headOffset[++headGroup] = i;
+        index.headGroup[i] = headGroup;
+
+        if (trainingList[order[i]].t != trainingList[order[i - 1]].t ||
+            trainingList[order[i]].r != trainingList[order[i - 1]].r)
+            index.tailOffset[++tailGroup] = i;
+        index.tailGroup[order[i]] = tailGroup;
+    }
+    index.headOffset[index.headGroupTotal] = trainingTotal;
+    index.tailOffset[index.tailGroupTotal] = trainingTotal;
+    index.valid = true;
+    free(order);
+}
+
+INT getCorruptIndexBytes(CorruptIndex &index, INT trainingTotal) {
+    if (!index.valid)
+        return 0;
+    return (2 * trainingTotal + index.headGroupTotal + index.tailGroupTotal + 2) * sizeof(INT);
+}
+
+#endif
@@ -31,8 +31,16 @@ SOFTWARE.
 #include "Utilities.h"
 #include "Triple.h"
 #include "Reader.h"
+#include "Random.h"
+#include "TextParser.h"
+#include "BinaryDataset.h"
 #include <cstdlib>
-#include <set>
+#include <cstring>
+#include <climits>
+#include <map>
+#include <string>
+#include <vector>
+#include <unordered_map>
 #include <algorithm>
 #include <iostream>
 #include <cmath>
@@ -64,33 +72,33 @@ INT getNumSnapshots() {
 // added to the graph so far, no matter if they have been deleted in the meantime. By doing so, it 
 // is assured that the written code for the incremental setting is consistent with the original
 // version of the OpenKE framework.
-// all_entities = num_currently_contained_entities + num_deleted_entities
-
-// static std::set<INT> all_entities;
-// static std::set<INT> currently_contained_entities;
-// static std::set<INT> deleted_entities;
-// std::set<INT> all_relations;
-// std::set<INT> currently_contained_relations;
-// std::set<INT> deleted_relations;
+// num_all_entities = num_currently_contained_entities + num_deleted_entities
 
 // Since trainList is loaded in TrainDataLoader and tripleList in TestDataloader we can rely 
 // on the same entity sets and variables which support the processing of triple operations
 // into the specific triple lists trainList and tripleList 
 
+// Membership of entities (or relations) over the global id space, one bit per id. contained marks the
+// ids which occur in the current list, seen the ids which occurred in any snapshot so far. Both are
+// updated in O(1) per operation from the degrees of the TripleDelta. The ascending arrays
+// currently_contained_entities etc. are loaded from the bitmaps once per snapshot.
+struct ElementBitmap {
+    std::vector<unsigned long long> contained;
+    std::vector<unsigned long long> seen;
+};
+
 // Variables for entire triple operation set
-INT *all_entities;
+ElementBitmap entityBitmap;
 INT num_all_entities = 0;
 INT *currently_contained_entities;
 INT num_currently_contained_entities = 0;
-INT *deleted_entities;
 INT num_deleted_entities = 0;
 
 
-INT *all_relations;
+ElementBitmap relationBitmap;
 INT num_all_relations = 0;
 INT *currently_contained_relations;
 INT num_currently_contained_relations = 0;
-INT *deleted_relations;
 INT num_deleted_relations = 0;
 
 
@@ -104,19 +112,17 @@ INT maxRelation = 0;
 TripleOperation *KnowledgeGraphOperations;
 
 // Variables for train operation set
-INT *all_train_entities;
+ElementBitmap trainEntityBitmap;
 INT num_all_train_entities = 0;
 INT *currently_contained_train_entities;
 INT num_currently_contained_train_entities = 0;
-INT *deleted_train_entities;
 INT num_deleted_train_entities = 0;
 
 
-INT *all_train_relations;
+ElementBitmap trainRelationBitmap;
 INT num_all_train_relations = 0;
 INT *currently_contained_train_relations;
 INT num_currently_contained_train_relations = 0;
-INT *deleted_train_relations;
 INT num_deleted_train_relations = 0;
 
 
@@ -129,6 +135,146 @@ INT maxTrainRelation = 0;
 
 TripleOperation *KnowledgeGraphTrainOperations;
 
+/*
+===================== Triple operations of a snapshot =========================
+*/
+
+// The operations of a snapshot are applied to the trainList/tripleList of the previous snapshot
+// without modifying it. The list is sorted by cmp_head, so the number of copies of a triple is found
+// by binary search, and delta holds the number of copies inserted (> 0) or deleted (< 0) since. The
+// degrees count the triples in which an entity or relation occurs. Once all operations of the
+// snapshot have been applied, materializeTripleDelta merges the delta into a new sorted list.
+struct TripleHash {
+    size_t operator()(const Triple &triple) const {
+        return mixBits(mixBits(mixBits(triple.h) ^ triple.r) ^ triple.t);
+    }
+};
+
+struct TripleEqual {
+    bool operator()(const Triple &a, const Triple &b) const {
+        return a.h == b.h && a.r == b.r && a.t == b.t;
+    }
+};
+
+struct TripleDelta {
+    Triple *list;
+    INT listTotal;
+    std::unordered_map<Triple, INT, TripleHash, TripleEqual> delta;
+    std::vector<INT> entityDegree;
+    std::vector<INT> relationDegree;
+};
+
+TripleDelta trainDelta;
+TripleDelta tripleDelta;
+
+void beginTripleDelta(TripleDelta &delta, Triple *&list, INT total) {
+    if (not std::is_sorted(list, list + total, Triple::cmp_head)) {
+        if (isMapped(list)) {
+            Triple *copy = (Triple *) malloc(total * sizeof(Triple));
+            memcpy(copy, list, total * sizeof(Triple));
+            list = copy;
+        }
+        std::sort(list, list + total, Triple::cmp_head);
+    }
+    delta.list = list;
+    delta.listTotal = total;
+    delta.delta.clear();
+    delta.entityDegree.assign(entityTotal, 0);
+    delta.relationDegree.assign(relationTotal, 0);
+    for (INT i = 0; i < total; i++) {
+        delta.entityDegree[list[i].h]++;
+        delta.entityDegree[list[i].t]++;
+        delta.relationDegree[list[i].r]++;
+    }
+}
+
+INT countTriple(TripleDelta &delta, const Triple &triple) {
+    std::pair<Triple *, Triple *> range = std::equal_range(delta.list, delta.list + delta.listTotal, triple,
+                                                           Triple::cmp_head);
+    INT count = range.second - range.first;
+    std::unordered_map<Triple, INT, TripleHash, TripleEqual>::iterator it = delta.delta.find(triple);
+    if (it != delta.delta.end())
+        count += it->second;
+    return count;
+}
+
+void updateTripleDegrees(TripleDelta &delta, const Triple &triple, INT change) {
+    delta.entityDegree[triple.h] += change;
+    delta.entityDegree[triple.t] += change;
+    delta.relationDegree[triple.r] += change;
+}
+
+void insertTripleDelta(TripleDelta &delta, const Triple &triple) {
+    delta.delta[triple]++;
+    updateTripleDegrees(delta, triple, 1);
+}
+
+// Returns false if the triple is not contained.
+bool deleteTripleDelta(TripleDelta &delta, const Triple &triple) {
+    if (countTriple(delta, triple) == 0)
+        return false;
+    delta.delta[triple]--;
+    updateTripleDegrees(delta, triple, -1);
+    return true;
+}
+
+// The copies inserted into and deleted from the list by the operations.
+void collectTripleDelta(TripleDelta &delta, std::vector<Triple> &inserted, std::vector<Triple> &deleted) {
+    for (std::unordered_map<Triple, INT, TripleHash, TripleEqual>::iterator it = delta.delta.begin();
+         it != delta.delta.end(); it++) {
+        for (INT i = 0; i < it->second; i++)
+            inserted.push_back(it->first);
+        for (INT i = 0; i < -it->second; i++)
+            deleted.push_back(it->first);
+    }
+}
+
+// Returns a new array of the triples of list, sorted by cmp, with the inserted copies added and the
+// deleted copies removed. Sorts inserted and deleted by cmp.
+Triple *mergeTripleDelta(Triple *list, INT total, std::vector<Triple> &inserted, std::vector<Triple> &deleted,
+                         bool (*cmp)(const Triple &, const Triple &)) {
+    std::sort(inserted.begin(), inserted.end(), cmp);
+    std::sort(deleted.begin(), deleted.end(), cmp);
+
+    INT newTotal = total + inserted.size() - deleted.size();
+    Triple *newList = (Triple *) malloc(std::max(newTotal, (INT) 1) * sizeof(Triple));
+    if (!newList) {
+        printf("out of mem\n");
+        exit(EXIT_FAILURE);
+    }
+    INT next = 0;
+    size_t nextInserted = 0, nextDeleted = 0;
+    for (INT i = 0; i < total; i++) {
+        const Triple &triple = list[i];
+        while (nextInserted < inserted.size() and cmp(inserted[nextInserted], triple))
+            newList[next++] = inserted[nextInserted++];
+        if (nextDeleted < deleted.size() and TripleEqual()(deleted[nextDeleted], triple)) {
+            nextDeleted++;
+            continue;
+        }
+        newList[next++] = triple;
+    }
+    while (nextInserted < inserted.size())
+        newList[next++] = inserted[nextInserted++];
+    return newList;
+}
+
+// Replaces list by the sorted list of the triples contained after the operations and returns the
+// inserted and deleted copies.
+void materializeTripleDelta(TripleDelta &delta, Triple *&list, INT &total, std::vector<Triple> &inserted,
+                            std::vector<Triple> &deleted) {
+    collectTripleDelta(delta, inserted, deleted);
+    Triple *newList = mergeTripleDelta(delta.list, delta.listTotal, inserted, deleted, Triple::cmp_head);
+
+    if (list != NULL and not isMapped(list))
+        free(list);
+    list = newList;
+    total = delta.listTotal + inserted.size() - deleted.size();
+    delta.list = list;
+    delta.listTotal = total;
+    delta.delta.clear();
+}
+
 
 
 extern "C"
@@ -160,23 +306,70 @@ void allocTripleArray(Triple* &arr, INT length) {
         arr = (Triple *) realloc(arr, length * sizeof(Triple));
 }
 
-void createArrayEntry(INT *&arr, INT &arrayLength, INT entry) {
-	arrayLength++;
-    callocIntArray(arr, arrayLength);
-    arr[arrayLength-1] = entry;
+inline bool testBit(const std::vector<unsigned long long> &bits, INT id) {
+    return (size_t) (id >> 6) < bits.size() and ((bits[id >> 6] >> (id & 63)) & 1);
 }
 
-void deleteArrayEntry(INT *&arr, INT &arrayLength, INT entry) {	
-    for(int i=0; i<arrayLength; i++){
-        if(arr[i] == entry){
-            for(int j=i; j<arrayLength-1; j++){
-                arr[j] = arr[j+1];
-            }
-            arrayLength--;
-            callocIntArray(arr, arrayLength);
-            break;
-        }
+inline void setBit(std::vector<unsigned long long> &bits, INT id) {
+    if ((size_t) (id >> 6) >= bits.size())
+        bits.resize((id >> 6) + 1, 0);
+    bits[id >> 6] |= 1ULL << (id & 63);
+}
+
+inline void clearBit(std::vector<unsigned long long> &bits, INT id) {
+    if ((size_t) (id >> 6) < bits.size())
+        bits[id >> 6] &= ~(1ULL << (id & 63));
+}
+
+// Returns the smallest set id >= from, -1 if there is none.
+inline INT nextBit(const std::vector<unsigned long long> &bits, INT from) {
+    size_t word = from >> 6;
+    if (word >= bits.size())
+        return -1;
+    unsigned long long bitsLeft = bits[word] & (~0ULL << (from & 63));
+    while (bitsLeft == 0) {
+        if (++word >= bits.size())
+            return -1;
+        bitsLeft = bits[word];
+    }
+    return (INT) (word << 6) + __builtin_ctzll(bitsLeft);
+}
+
+INT countBits(const std::vector<unsigned long long> &bits) {
+    INT count = 0;
+    for (size_t word = 0; word < bits.size(); word++)
+        count += __builtin_popcountll(bits[word]);
+    return count;
+}
+
+// Loads the ascending ids of the set bits into arr.
+void loadContainedElements(const std::vector<unsigned long long> &bits, INT *&arr, INT total) {
+    callocIntArray(arr, total > 0 ? total : 1);
+    INT i = 0;
+    for (INT id = nextBit(bits, 0); id != -1; id = nextBit(bits, id + 1))
+        arr[i++] = id;
+}
+
+// Marks id as contained. An id which is contained again after its deletion is no longer counted as deleted.
+void addElement(ElementBitmap &bitmap, INT id, INT &numAll, INT &numContained, INT &numDeleted) {
+    if (testBit(bitmap.contained, id))
+        return;
+    if (testBit(bitmap.seen, id)) {
+        numDeleted--;
+    } else {
+        setBit(bitmap.seen, id);
+        numAll++;
     }
+    setBit(bitmap.contained, id);
+    numContained++;
+}
+
+void removeElement(ElementBitmap &bitmap, INT id, INT &numContained, INT &numDeleted) {
+    if (not testBit(bitmap.contained, id))
+        return;
+    clearBit(bitmap.contained, id);
+    numContained--;
+    numDeleted++;
 }
 
 extern "C"
@@ -346,289 +539,91 @@ void initializeTripleOperations(int snapshot) {
     printf("Finished loading KG operations.\n");
 }
 
-// Checks if entity ent exists in tripleList
+// Checks if entity ent exists in tripleList while the operations of a snapshot are applied
 bool checkIfEntityExists(INT ent){
-    bool entityExists = false;
-    for(int i=0; i<tripleTotal; i++){
-        if(tripleList[i].h == ent || tripleList[i].t == ent){
-            entityExists = true;
-            break;
-        }
-    }    
-    return entityExists;
+    return tripleDelta.entityDegree[ent] > 0;
 }
 
 bool checkIfTrainEntityExists(INT ent){
-    bool entityExists = false;
-    for(int i=0; i<trainTotal; i++){
-        if(trainList[i].h == ent || trainList[i].t == ent){
-            entityExists = true;
-            break;
-        }
-    }    
-    return entityExists;
+    return trainDelta.entityDegree[ent] > 0;
 }
 
-// Checks if relation rel exists in tripleList
+// Checks if relation rel exists in tripleList while the operations of a snapshot are applied
 bool checkIfRelationExists(INT rel){
-    bool relationExists = false;
-    for(int i=0; i<tripleTotal; i++){
-        if(tripleList[i].r == rel){
-            relationExists = true;
-            break;
-        }
-    }    
-    return relationExists;
+    return tripleDelta.relationDegree[rel] > 0;
 }
 
-// Checks if relation rel exists in tripleList
+// Checks if relation rel exists in trainList while the operations of a snapshot are applied
 bool checkIfTrainRelationExists(INT rel){
-    bool relationExists = false;
-    for(int i=0; i<trainTotal; i++){
-        if(trainList[i].r == rel){
-            relationExists = true;
-            break;
-        }
-    }    
-    return relationExists;
-}
-
-bool checkIfEntityIsNew(INT entity){
-    bool entityIsNew = true;
-    for(int i=0; i<num_all_entities; i++){
-        if(all_entities[i] == entity){
-            entityIsNew = false;
-            break;
-        }
-    }
-    return entityIsNew;
-}
-
-bool checkIfTrainEntityIsNew(INT entity){
-    bool entityIsNew = true;
-    for(int i=0; i<num_all_train_entities; i++){
-        if(all_train_entities[i] == entity){
-            entityIsNew = false;
-            break;
-        }
-    }
-    return entityIsNew;
-}
-
-bool checkIfRelationIsNew(INT rel){
-    bool relationIsNew = true;
-    for(int i=0; i<num_all_relations; i++){
-        if(all_relations[i] == rel){
-            relationIsNew = false;
-            break;
-        }
-    }
-    return relationIsNew;
-}
-
-bool checkIfTrainRelationsIsNew(INT rel){
-    bool relationIsNew = true;
-    for(int i=0; i<num_all_train_relations; i++){
-        if(all_train_relations[i] == rel){
-            relationIsNew = false;
-            break;
-        }
-    }
-    return relationIsNew;
-}
-
-bool checkIfEntityDeleted(INT entity){
-    // return deleted_entities.find(entity) != deleted_entities.end();
-    bool entityDeleted = false;
-    for(int i=0; i<num_deleted_entities; i++){
-        if(deleted_entities[i] == entity){
-            entityDeleted = true;
-            break;
-        }
-    }
-    return entityDeleted;
-}
-
-bool checkIfTrainEntityDeleted(INT entity){
-    // return deleted_entities.find(entity) != deleted_entities.end();
-    bool entityDeleted = false;
-    for(int i=0; i<num_deleted_train_entities; i++){
-        if(deleted_train_entities[i] == entity){
-            entityDeleted = true;
-            break;
-        }
-    }
-    return entityDeleted;
+    return trainDelta.relationDegree[rel] > 0;
 }
 
 void adjustEntitySet(INT ent){
     // If entity exists in KG return else entity is either new or was deleted before
-    if(checkIfEntityExists(ent)){
+    if(checkIfEntityExists(ent))
         return;
-    } else {
-        if(checkIfEntityIsNew(ent)){
-            createArrayEntry(all_entities, num_all_entities, ent);
-        }else{
-            deleteArrayEntry(deleted_entities, num_deleted_entities, ent);
-        }   
-        createArrayEntry(currently_contained_entities, num_currently_contained_entities, ent); 
-    }
+    addElement(entityBitmap, ent, num_all_entities, num_currently_contained_entities, num_deleted_entities);
 }
 
 void adjustTrainEntitySet(INT ent){
-    // If entity exists in KG return else entity is either new or was deleted before
-    if(checkIfTrainEntityExists(ent)){
+    if(checkIfTrainEntityExists(ent))
         return;
-    } else {
-        if(checkIfTrainEntityIsNew(ent)){
-            createArrayEntry(all_train_entities, num_all_train_entities, ent);
-        }else{
-            deleteArrayEntry(deleted_train_entities, num_deleted_train_entities, ent);
-        }   
-        createArrayEntry(currently_contained_train_entities, num_currently_contained_train_entities, ent);
-    }
-}
-
-bool checkIfRelationDeleted(INT relation){
-    // return deleted_relations.find(relation) != deleted_relations.end();
-        // return deleted_entities.find(entity) != deleted_entities.end();
-    bool relationDeleted = false;
-    for(int i=0; i<num_deleted_relations; i++){
-        if(deleted_relations[i] == relation){
-            relationDeleted = true;
-            break;
-        }
-    }
-    return relationDeleted;
-}
-
-bool checkIfTrainRelationDeleted(INT relation){
-    bool relationDeleted = false;
-    for(int i=0; i<num_deleted_train_relations; i++){
-        if(deleted_train_relations[i] == relation){
-            relationDeleted = true;
-            break;
-        }
-    }
-    return relationDeleted;
+    addElement(trainEntityBitmap, ent, num_all_train_entities, num_currently_contained_train_entities,
+               num_deleted_train_entities);
 }
 
 void adjustRelationSet(INT rel){
     // If relation exists in KG return else relation is either new or was deleted before
-    if(checkIfRelationExists(rel)){
+    if(checkIfRelationExists(rel))
         return;
-    } else {
-        if(checkIfRelationIsNew(rel)){
-            createArrayEntry(all_relations, num_all_relations, rel);
-        }else{
-            deleteArrayEntry(deleted_relations, num_deleted_relations, rel);
-        }   
-        createArrayEntry(currently_contained_relations, num_currently_contained_relations, rel);
-    }
+    addElement(relationBitmap, rel, num_all_relations, num_currently_contained_relations, num_deleted_relations);
 }
 
 void adjustTrainRelationSet(INT rel){
-    // If relation exists in KG return else relation is either new or was deleted before
-    if(checkIfTrainRelationExists(rel)){
+    if(checkIfTrainRelationExists(rel))
         return;
-    } else {
-        if(checkIfTrainRelationsIsNew(rel)){
-            createArrayEntry(all_train_relations, num_all_train_relations, rel);
-        }else{
-            deleteArrayEntry(deleted_train_relations, num_deleted_train_relations, rel);
-        }   
-        createArrayEntry(currently_contained_train_relations, num_currently_contained_train_relations, rel);
-    }
+    addElement(trainRelationBitmap, rel, num_all_train_relations, num_currently_contained_train_relations,
+               num_deleted_train_relations);
 }
 
 void insertTriple(Triple trip) {
     adjustEntitySet(trip.h);
     adjustEntitySet(trip.t);
     adjustRelationSet(trip.r);
-    
-    tripleTotal++;
-    callocTripleArray(tripleList, tripleTotal);
-    
-    tripleList[tripleTotal-1].h = trip.h;
-    tripleList[tripleTotal-1].t = trip.t; 
-    tripleList[tripleTotal-1].r = trip.r;
+    insertTripleDelta(tripleDelta, trip);
 }
 
 void insertTrainTriple(Triple trip) {
     //adjustTrainEntitySet(trip.h);
     //adjustTrainEntitySet(trip.t);
     adjustTrainRelationSet(trip.r);
-    
-    trainTotal++;
-    callocTripleArray(trainList, trainTotal);
-    
-    trainList[trainTotal-1].h = trip.h;
-    trainList[trainTotal-1].t = trip.t; 
-    trainList[trainTotal-1].r = trip.r;
+    insertTripleDelta(trainDelta, trip);
 }
 
 void entityRemovalCheck(INT ent){
-    // If entity ent does not exists after delete operation remove it from currently_contained_entities
-    // and add it do deleted entities
-    bool entityExists = checkIfEntityExists(ent);
-    if(!entityExists){
-        // currently_contained_entities.erase(ent);
-        deleteArrayEntry(currently_contained_entities, num_currently_contained_entities, ent);
-        // deleted_entities.insert(ent);
-        createArrayEntry(deleted_entities, num_deleted_entities, ent);
-    }   
+    // If entity ent does not exist after delete operation it is no longer contained but deleted
+    if(!checkIfEntityExists(ent))
+        removeElement(entityBitmap, ent, num_currently_contained_entities, num_deleted_entities);
 }
 
 void trainEntityRemovalCheck(INT ent){
-    // If entity ent does not exists after delete operation remove it from currently_contained_entities
-        // and add it do deleted entities
-    bool entityExists = checkIfTrainEntityExists(ent);
-    if(!entityExists){
-        // currently_contained_entities.erase(ent);
-        deleteArrayEntry(currently_contained_train_entities, num_currently_contained_train_entities, ent);
-        // deleted_entities.insert(ent);
-        createArrayEntry(deleted_train_entities, num_deleted_train_entities, ent);
-    }   
+    if(!checkIfTrainEntityExists(ent))
+        removeElement(trainEntityBitmap, ent, num_currently_contained_train_entities, num_deleted_train_entities);
 }
 
 void relationRemovalCheck(INT rel){
-    bool relationExists = checkIfRelationExists(rel); 
-    if(!relationExists){
-        // currently_contained_relations.erase(relation);
-        deleteArrayEntry(currently_contained_relations, num_currently_contained_relations, rel);
-        // deleted_relations.insert(relation);
-        createArrayEntry(deleted_relations, num_deleted_relations, rel);
-    }
+    if(!checkIfRelationExists(rel))
+        removeElement(relationBitmap, rel, num_currently_contained_relations, num_deleted_relations);
 }
 
 void trainRelationRemovalCheck(INT rel){
-    bool relationExists = checkIfTrainRelationExists(rel); 
-    if(relationExists == false){
-        // currently_contained_relations.erase(relation);
-        deleteArrayEntry(currently_contained_train_relations, num_currently_contained_train_relations, rel);
-        // deleted_relations.insert(relation);
-        createArrayEntry(deleted_train_relations, num_deleted_train_relations, rel);
-    }
+    if(!checkIfTrainRelationExists(rel))
+        removeElement(trainRelationBitmap, rel, num_currently_contained_train_relations,
+                      num_deleted_train_relations);
 }
 
 void deleteTriple(Triple trip) {
-    bool triple_existed = false;
-    for(int i=0; i<tripleTotal; i++){
-        if(tripleList[i].h == trip.h && tripleList[i].r == trip.r && tripleList[i].t == trip.t){
-            triple_existed = true;
-            for(int j=i; j<tripleTotal-1; j++){
-                tripleList[j].h = tripleList[j+1].h;
-                tripleList[j].r = tripleList[j+1].r;
-                tripleList[j].t = tripleList[j+1].t;
-            }
-            break;
-        }
-    }
-    
-    if(triple_existed){
-        tripleTotal--;
-        callocTripleArray(tripleList, tripleTotal);
-
+    if(deleteTripleDelta(tripleDelta, trip)){
         entityRemovalCheck(trip.h);
         entityRemovalCheck(trip.t);
         relationRemovalCheck(trip.r);
@@ -639,23 +634,7 @@ void deleteTriple(Triple trip) {
 }
 
 void deleteTrainTriple(Triple trip) {
-    bool triple_existed = false;
-    for(int i=0; i<trainTotal; i++){
-        if(trainList[i].h == trip.h && trainList[i].r == trip.r && trainList[i].t == trip.t){
-            triple_existed = true;
-            for(int j=i; j<trainTotal-1; j++){
-                trainList[j].h = trainList[j+1].h;
-                trainList[j].r = trainList[j+1].r;
-                trainList[j].t = trainList[j+1].t;
-            }
-            break;
-        }
-    }
-    
-    if(triple_existed){
-        trainTotal--;
-        callocTripleArray(trainList, trainTotal);
-
+    if(deleteTripleDelta(trainDelta, trip)){
         // trainEntityRemovalCheck(trip.h);
         // trainEntityRemovalCheck(trip.t);
         trainRelationRemovalCheck(trip.r);
@@ -682,6 +661,7 @@ void resetIncrementalHelpers() {
     resetIntHelper(rigRel2);
     resetRealHelper(left_mean);
     resetRealHelper(right_mean);
+    resetCorruptIndex(corruptIndex);
 }
 
 void loadIncrementalHelpers(
@@ -795,13 +775,164 @@ void loadIncrementalHelpers(
     }
 }
 
+/*
+===================== Maintenance of the training helpers across snapshots =========================
+*/
+
+// Number of distinct (h,r) and (t,r) pairs of every relation, the denominators of left_mean and
+// right_mean. incrementalHelpers* identify the helpers built by evolveTrainList, which are updated
+// with the delta of the next snapshot instead of being rebuilt if they are still in place.
+INT *headPairTotal = NULL;
+INT *tailPairTotal = NULL;
+Triple *incrementalHelpersHead = NULL;
+Triple *incrementalHelpersTail = NULL;
+Triple *incrementalHelpersRel = NULL;
+Triple *incrementalHelpersRel2 = NULL;
+INT incrementalHelpersTotal = -1;
+
+void rememberIncrementalHelpers() {
+    incrementalHelpersHead = trainHead;
+    incrementalHelpersTail = trainTail;
+    incrementalHelpersRel = trainRel;
+    incrementalHelpersRel2 = trainRel2;
+    incrementalHelpersTotal = trainTotal;
+}
+
+bool incrementalHelpersInPlace(INT previousTotal) {
+    return trainHead != NULL and trainHead == incrementalHelpersHead and trainTail == incrementalHelpersTail
+           and trainRel == incrementalHelpersRel and trainRel2 == incrementalHelpersRel2
+           and previousTotal == incrementalHelpersTotal and headPairTotal != NULL;
+}
+
+void loadPairTotals() {
+    callocIntArray(headPairTotal, relationTotal);
+    callocIntArray(tailPairTotal, relationTotal);
+    memset(headPairTotal, 0, relationTotal * sizeof(INT));
+    memset(tailPairTotal, 0, relationTotal * sizeof(INT));
+    for (INT i = 0; i < trainTotal; i++) {
+        if (i == 0 or trainHead[i].h != trainHead[i - 1].h or trainHead[i].r != trainHead[i - 1].r)
+            headPairTotal[trainHead[i].r]++;
+        if (i == 0 or trainTail[i].t != trainTail[i - 1].t or trainTail[i].r != trainTail[i - 1].r)
+            tailPairTotal[trainTail[i].r]++;
+    }
+}
+
+// Adds sign to the total of every distinct (h,r) pair of changed (sorted by cmp_head) which occurs in
+// list. The pairs are searched from the position of the previous one.
+void countHeadPairs(std::vector<Triple> &changed, Triple *list, INT total, INT sign) {
+    Triple *next = list;
+    for (size_t i = 0; i < changed.size(); i++) {
+        if (i > 0 and changed[i].h == changed[i - 1].h and changed[i].r == changed[i - 1].r)
+            continue;
+        Triple key = {changed[i].h, changed[i].r, LONG_MIN};
+        next = std::lower_bound(next, list + total, key, Triple::cmp_head);
+        if (next != list + total and next->h == key.h and next->r == key.r)
+            headPairTotal[key.r] += sign;
+    }
+}
+
+// The same for the (t,r) pairs of changed (sorted by cmp_tail).
+void countTailPairs(std::vector<Triple> &changed, Triple *list, INT total, INT sign) {
+    Triple *next = list;
+    for (size_t i = 0; i < changed.size(); i++) {
+        if (i > 0 and changed[i].t == changed[i - 1].t and changed[i].r == changed[i - 1].r)
+            continue;
+        Triple key = {LONG_MIN, changed[i].r, changed[i].t};
+        next = std::lower_bound(next, list + total, key, Triple::cmp_tail);
+        if (next != list + total and next->t == key.t and next->r == key.r)
+            tailPairTotal[key.r] += sign;
+    }
+}
+
+
+// lefHead/rigHead etc. of the sorted helpers, as set by loadIncrementalHelpers.
+void loadIncrementalRanges() {
+    memset(lefHead, 0, sizeof(INT) * entityTotal);
+    memset(lefTail, 0, sizeof(INT) * entityTotal);
+    memset(lefRel, 0, sizeof(INT) * entityTotal);
+    memset(lefRel2, 0, sizeof(INT) * relationTotal);
+    memset(rigHead, -1, sizeof(INT) * entityTotal);
+    memset(rigTail, -1, sizeof(INT) * entityTotal);
+    memset(rigRel, -1, sizeof(INT) * entityTotal);
+    memset(rigRel2, -1, sizeof(INT) * relationTotal);
+
+    for (INT i = 1; i < trainTotal; i++) {
+        if (trainTail[i].t != trainTail[i - 1].t) {
+            rigTail[trainTail[i - 1].t] = i - 1;
+            lefTail[trainTail[i].t] = i;
+        }
+        if (trainHead[i].h != trainHead[i - 1].h) {
+            rigHead[trainHead[i - 1].h] = i - 1;
+            lefHead[trainHead[i].h] = i;
+        }
+        if (trainRel[i].h != trainRel[i - 1].h) {
+            rigRel[trainRel[i - 1].h] = i - 1;
+            lefRel[trainRel[i].h] = i;
+        }
+        if (trainRel2[i].r != trainRel2[i - 1].r) {
+            rigRel2[trainRel2[i - 1].r] = i - 1;
+            lefRel2[trainRel2[i].r] = i;
+        }
+    }
+    lefHead[trainHead[0].h] = 0;
+    rigHead[trainHead[trainTotal - 1].h] = trainTotal - 1;
+    lefTail[trainTail[0].t] = 0;
+    rigTail[trainTail[trainTotal - 1].t] = trainTotal - 1;
+    lefRel[trainRel[0].h] = 0;
+    rigRel[trainRel[trainTotal - 1].h] = trainTotal - 1;
+    lefRel2[trainRel2[0].r] = 0;
+    rigRel2[trainRel2[trainTotal - 1].r] = trainTotal - 1;
+}
+
+// Merges the inserted and deleted copies of a snapshot into the helpers of the previous snapshot
+// (previousTotal triples) and updates the frequencies and means, instead of sorting the helpers again.
+void updateIncrementalHelpers(std::vector<Triple> &inserted, std::vector<Triple> &deleted, INT previousTotal) {
+    Triple **helpers[4] = {&trainHead, &trainTail, &trainRel, &trainRel2};
+    bool (*cmps[4])(const Triple &, const Triple &) = {Triple::cmp_head, Triple::cmp_tail, Triple::cmp_rel,
+                                                       Triple::cmp_rel2};
+    std::vector<Triple> changed(inserted.size() + deleted.size());
+    for (INT i = 0; i < 4; i++) {
+        Triple *helperBefore = *helpers[i];
+        *helpers[i] = mergeTripleDelta(helperBefore, previousTotal, inserted, deleted, cmps[i]);
+
+        // The pairs of the changed triples, which occur before and/or after the snapshot, change the
+        // pair totals. inserted and deleted have just been sorted by cmps[i].
+        if (i < 2)
+            std::merge(inserted.begin(), inserted.end(), deleted.begin(), deleted.end(), changed.begin(), cmps[i]);
+        if (i == 0) {
+            countHeadPairs(changed, helperBefore, previousTotal, -1);
+            countHeadPairs(changed, trainHead, trainTotal, 1);
+        } else if (i == 1) {
+            countTailPairs(changed, helperBefore, previousTotal, -1);
+            countTailPairs(changed, trainTail, trainTotal, 1);
+        }
+        resetTripleHelper(helperBefore);
+    }
+
+    for (size_t i = 0; i < inserted.size(); i++) {
+        freqEnt[inserted[i].h]++;
+        freqEnt[inserted[i].t]++;
+        freqRel[inserted[i].r]++;
+    }
+    for (size_t i = 0; i < deleted.size(); i++) {
+        freqEnt[deleted[i].h]--;
+        freqEnt[deleted[i].t]--;
+        freqRel[deleted[i].r]--;
+    }
+    for (INT i = 0; i < relationTotal; i++) {
+        left_mean[i] = freqRel[i] / (REAL) headPairTotal[i];
+        right_mean[i] = freqRel[i] / (REAL) tailPairTotal[i];
+    }
+    loadIncrementalRanges();
+    resetCorruptIndex(corruptIndex);
+}
+
 extern "C"
 void evolveTrainList() {
-    resetIncrementalHelpers();
-
     INT operation = 0;
     if (numOperationsRate == 0)
         numOperationsRate = totalOperations;
+    beginTripleDelta(trainDelta, trainList, trainTotal);
     while(operation < numOperationsRate){
         if(KnowledgeGraphOperations[next_operation_id].operation == '+')
             insertTrainTriple(KnowledgeGraphOperations[next_operation_id].triple);
@@ -817,8 +948,21 @@ void evolveTrainList() {
             printf("Reached snapshot.\n");
         }
     }
+    INT previousTotal = trainTotal;
+    std::vector<Triple> inserted, deleted;
+    materializeTripleDelta(trainDelta, trainList, trainTotal, inserted, deleted);
+    loadContainedElements(trainRelationBitmap.contained, currently_contained_train_relations,
+                          num_currently_contained_train_relations);
     resetSnapShot();
 
+    if (trainTotal > 0 and incrementalHelpersInPlace(previousTotal)) {
+        updateIncrementalHelpers(inserted, deleted, previousTotal);
+        rememberIncrementalHelpers();
+        printf("Currently contained train triples: %ld.\n", trainTotal);
+        return;
+    }
+
+    resetIncrementalHelpers();
     loadIncrementalHelpers(
         trainList,
         trainHead,
@@ -841,14 +985,15 @@ void evolveTrainList() {
         left_mean,
         right_mean
     );
+    loadPairTotals();
+    rememberIncrementalHelpers();
     
     printf("Currently contained train triples: %ld.\n", trainTotal);
 }
 ///////// Alternative mechanism
 void resetTripleList(){
     if (tripleList != NULL) {
-        free(tripleList);
-        tripleList = NULL;
+        resetTripleHelper(tripleList);
         tripleTotal = 0;
         
         free(currently_contained_entities);
@@ -857,70 +1002,215 @@ void resetTripleList(){
     }
 }
 
-void loadCurrentKGElements(std::set<INT> entity_set, std::set<INT> relation_set){
-    num_currently_contained_entities = entity_set.size();
+// Loads the counts and the ascending array of the elements whose contained bit is set.
+void loadCurrentKGElements(ElementBitmap &bitmap, INT *&arr, INT &numAll, INT &numContained, INT &numDeleted){
+    if (bitmap.seen.size() < bitmap.contained.size())
+        bitmap.seen.resize(bitmap.contained.size(), 0);
+    for (size_t word = 0; word < bitmap.contained.size(); word++)
+        bitmap.seen[word] |= bitmap.contained[word];
+    numContained = countBits(bitmap.contained);
+    numAll = countBits(bitmap.seen);
+    numDeleted = numAll - numContained;
+    loadContainedElements(bitmap.contained, arr, numContained);
+}
+
+void loadCurrentKGElements(){
+    loadCurrentKGElements(entityBitmap, currently_contained_entities, num_all_entities,
+                          num_currently_contained_entities, num_deleted_entities);
     printf("Currently contained entities: %ld.\n", getNumCurrentlyContainedEntities());
-    callocIntArray(currently_contained_entities, num_currently_contained_entities);
-    INT entity_index = 0;
-    INT current_entity = -1;
-    
-    // Transmit from entity set to global array currently_contained_entities
-    for (std::set<INT>::iterator it = entity_set.begin(); it != entity_set.end();){
-        current_entity = *it;
-        currently_contained_entities[entity_index] = current_entity;
-        entity_index++;
-        it++;
-    } 
-
-    num_currently_contained_relations = relation_set.size();
+    loadCurrentKGElements(relationBitmap, currently_contained_relations, num_all_relations,
+                          num_currently_contained_relations, num_deleted_relations);
     printf("Currently contained relations: %ld.\n\n", num_currently_contained_relations);
-    callocIntArray(currently_contained_relations, num_currently_contained_relations);
-    INT relation_index = 0;
-    INT current_relation = -1;
-    
-    // Transmit from relation set to global array currently_contained_relations
-    for (std::set<INT>::iterator it = relation_set.begin(); it != relation_set.end();){
-        current_relation = *it;
-        currently_contained_entities[relation_index] = current_relation;
-        relation_index++;
-        it++;
-    } 
+}
 
+// Stable LSD radix sort of list into cmp_head order, 16 bits of t, r and h per pass. Only as many
+// passes as the largest id of a field needs are made. list has to be allocated by malloc.
+void radixSortTriples(Triple *&list, INT total) {
+    if (total < 2)
+        return;
+    Triple *buffer = (Triple *) malloc(total * sizeof(Triple));
+    INT *count = (INT *) malloc((1 << 16) * sizeof(INT));
+    INT Triple::*fields[3] = {&Triple::t, &Triple::r, &Triple::h};
+    for (INT f = 0; f < 3; f++) {
+        INT Triple::*field = fields[f];
+        INT maxId = 0;
+        for (INT i = 0; i < total; i++)
+            maxId = std::max(maxId, list[i].*field);
+        for (INT shift = 0; shift == 0 or (maxId >> shift) > 0; shift += 16) {
+            memset(count, 0, (1 << 16) * sizeof(INT));
+            for (INT i = 0; i < total; i++)
+                count[((list[i].*field) >> shift) & 0xFFFF]++;
+            INT position = 0;
+            for (INT digit = 0; digit < (1 << 16); digit++) {
+                INT digitTotal = count[digit];
+                count[digit] = position;
+                position += digitTotal;
+            }
+            for (INT i = 0; i < total; i++)
+                buffer[count[((list[i].*field) >> shift) & 0xFFFF]++] = list[i];
+            std::swap(list, buffer);
+        }
+    }
+    free(buffer);
+    free(count);
+}
+
+/*
+===================== Snapshot sidecar =========================
+*/
+
+// global_triple2id.bin next to the global_triple2id.txt of a snapshot holds its triples sorted by
+// cmp_head and the contained bitmaps of its entities and relations, each section aligned like in
+// dataset.bin. It is written on the first load of the snapshot and mapped on later loads as long as
+// the size and modification time (in nanoseconds) of the text file are unchanged. It is written to a
+// temporary file first and renamed, so an interrupted write never leaves a truncated sidecar behind.
+
+#define SNAPSHOT_TRIPLES_MAGIC "OPENKES"
+#define SNAPSHOT_TRIPLES_VERSION 2
+
+enum SnapshotTriplesSection {
+    SNAPSHOT_SECTION_TRIPLES,
+    SNAPSHOT_SECTION_ENTITIES,
+    SNAPSHOT_SECTION_RELATIONS,
+    SNAPSHOT_SECTION_TOTAL
+};
+
+struct SnapshotTriplesHeader {
+    char magic[8];
+    INT version;
+    INT sourceSize;
+    INT sourceTime;
+    INT sourceTimeNsec;
+    INT tripleTotal;
+    INT offset[SNAPSHOT_SECTION_TOTAL];
+    INT size[SNAPSHOT_SECTION_TOTAL];
+};
+
+// Sidecars mapped so far by path. The mappings are kept for the lifetime of the process since
+// tripleList and the lists of later snapshots may point into them.
+std::map<std::string, SnapshotTriplesHeader *> snapshotSidecars;
+
+void writeSnapshotSidecar(const std::string &path, const struct stat &source) {
+    SnapshotTriplesHeader header;
+    memset(&header, 0, sizeof(header));
+    strncpy(header.magic, SNAPSHOT_TRIPLES_MAGIC, sizeof(header.magic));
+    header.version = SNAPSHOT_TRIPLES_VERSION;
+    header.sourceSize = source.st_size;
+    header.sourceTime = source.st_mtim.tv_sec;
+    header.sourceTimeNsec = source.st_mtim.tv_nsec;
+    header.tripleTotal = tripleTotal;
+
+    std::string temporaryPath = path + ".tmp";
+    FILE *fout = fopen(temporaryPath.c_str(), "wb");
+    if (fout == NULL) {
+        printf("Cannot write %s.\n", path.c_str());
+        return;
+    }
+    fwrite(&header, sizeof(header), 1, fout);
+    writeBinarySection(fout, header, SNAPSHOT_SECTION_TRIPLES, tripleList, tripleTotal * sizeof(Triple));
+    writeBinarySection(fout, header, SNAPSHOT_SECTION_ENTITIES, entityBitmap.contained.data(),
+                       entityBitmap.contained.size() * sizeof(unsigned long long));
+    writeBinarySection(fout, header, SNAPSHOT_SECTION_RELATIONS, relationBitmap.contained.data(),
+                       relationBitmap.contained.size() * sizeof(unsigned long long));
+    fseek(fout, 0, SEEK_SET);
+    fwrite(&header, sizeof(header), 1, fout);
+    bool failed = ferror(fout);
+    if (fclose(fout) != 0 or failed or rename(temporaryPath.c_str(), path.c_str()) != 0) {
+        printf("Cannot write %s.\n", path.c_str());
+        unlink(temporaryPath.c_str());
+    }
+}
+
+bool snapshotSidecarMatches(const SnapshotTriplesHeader *header, const struct stat &source) {
+    return header->sourceSize == source.st_size and header->sourceTime == source.st_mtim.tv_sec and
+           header->sourceTimeNsec == source.st_mtim.tv_nsec;
+}
+
+// Returns the mapped sidecar at path if it has been written from the current source, NULL otherwise.
+SnapshotTriplesHeader *mapSnapshotSidecar(const std::string &path, const struct stat &source) {
+    std::map<std::string, SnapshotTriplesHeader *>::iterator it = snapshotSidecars.find(path);
+    if (it != snapshotSidecars.end() and snapshotSidecarMatches(it->second, source))
+        return it->second;
+
+    int fd = open(path.c_str(), O_RDONLY);
+    if (fd < 0)
+        return NULL;
+    struct stat st;
+    fstat(fd, &st);
+    if ((size_t) st.st_size < sizeof(SnapshotTriplesHeader)) {
+        close(fd);
+        return NULL;
+    }
+    char *data = (char *) mmap(NULL, st.st_size, PROT_READ | PROT_WRITE, MAP_PRIVATE, fd, 0);
+    close(fd);
+    if (data == MAP_FAILED)
+        return NULL;
+
+    SnapshotTriplesHeader *header = (SnapshotTriplesHeader *) data;
+    if (strncmp(header->magic, SNAPSHOT_TRIPLES_MAGIC, sizeof(header->magic)) != 0 or
+        header->version != SNAPSHOT_TRIPLES_VERSION or not snapshotSidecarMatches(header, source)) {
+        munmap(data, st.st_size);
+        return NULL;
+    }
+    mappedDatasets.push_back(std::make_pair(data, (size_t) st.st_size));
+    snapshotSidecars[path] = header;
+    return header;
+}
+
+void loadSnapshotBitmap(SnapshotTriplesHeader *header, INT section, std::vector<unsigned long long> &bits) {
+    unsigned long long *words = (unsigned long long *) ((char *) header + header->offset[section]);
+    bits.assign(words, words + header->size[section] / sizeof(unsigned long long));
+}
+
+// Parses the text file of a snapshot and marks its entities and relations in the contained bitmaps.
+void readSnapshotTriples(const std::string &path) {
+    INT valueTotal;
+    INT *values = parseIntegerFile(path, valueTotal);
+    tripleTotal = valueTotal / 3;
+    tripleList = (Triple *) malloc(std::max(tripleTotal, (INT) 1) * sizeof(Triple));
+    entityBitmap.contained.assign((entityTotal + 63) / 64, 0);
+    relationBitmap.contained.assign((relationTotal + 63) / 64, 0);
+    for (INT i = 0; i < tripleTotal; i++) {
+        tripleList[i].h = values[3 * i];
+        tripleList[i].t = values[3 * i + 1];
+        tripleList[i].r = values[3 * i + 2];
+        setBit(entityBitmap.contained, tripleList[i].h);
+        setBit(entityBitmap.contained, tripleList[i].t);
+        setBit(relationBitmap.contained, tripleList[i].r);
+    }
+    free(values);
+    radixSortTriples(tripleList, tripleTotal);
 }
 
 extern "C"
 void loadSnapshotTriples(int snapshot) {
     resetTripleList();
     printf("Import triple list for snapshot: %d.\n", snapshot);
-    std::string snapshot_folder = int_to_string(snapshot);
-    
-    std::set<INT> entity_set;
-    std::set<INT> relation_set;
-
-    FILE *fin;
-    int tmp;
-
-    printf("Folder: %s.\n", (inPath + "incremental/" + snapshot_folder + "/global_triple2id.txt").c_str());
-    fin = fopen((inPath + "incremental/" + snapshot_folder + "/global_triple2id.txt").c_str(), "r");
-    
-    tripleTotal = getLineNum(fin);
-    tripleList = (Triple *) calloc(tripleTotal, sizeof(Triple));
-    printf("Captured %ld triples in snapshot %d.\n", tripleTotal, snapshot);
-    for (INT i = 0; i < tripleTotal; i++) {
-        tmp = fscanf(fin, "%ld", &tripleList[i].h);
-        entity_set.insert(tripleList[i].h);
-        
-        tmp = fscanf(fin, "%ld", &tripleList[i].t);
-        entity_set.insert(tripleList[i].t);
-        
-        tmp = fscanf(fin, "%ld", &tripleList[i].r);
-        relation_set.insert(tripleList[i].r);
+    std::string snapshot_folder = inPath + "incremental/" + int_to_string(snapshot) + "/";
+    std::string source_path = snapshot_folder + "global_triple2id.txt";
+    std::string sidecar_path = snapshot_folder + "global_triple2id.bin";
+    printf("Folder: %s.\n", source_path.c_str());
+
+    struct stat source;
+    if (stat(source_path.c_str(), &source) != 0) {
+        printf("Cannot open %s.\n", source_path.c_str());
+        return;
     }
-    fclose(fin);
-    std::sort(tripleList, tripleList + tripleTotal, Triple::cmp_head);
+    SnapshotTriplesHeader *sidecar = mapSnapshotSidecar(sidecar_path, source);
+    if (sidecar != NULL) {
+        tripleTotal = sidecar->tripleTotal;
+        tripleList = (Triple *) ((char *) sidecar + sidecar->offset[SNAPSHOT_SECTION_TRIPLES]);
+        loadSnapshotBitmap(sidecar, SNAPSHOT_SECTION_ENTITIES, entityBitmap.contained);
+        loadSnapshotBitmap(sidecar, SNAPSHOT_SECTION_RELATIONS, relationBitmap.contained);
+    } else {
+        readSnapshotTriples(source_path);
+        writeSnapshotSidecar(sidecar_path, source);
+    }
+    printf("Captured %ld triples in snapshot %d.\n", tripleTotal, snapshot);
 
     printf("Finished loading snapshot.\n");
-    loadCurrentKGElements(entity_set, relation_set);
+    loadCurrentKGElements();
+    buildKnownAnswers(knownAnswers, tripleList, tripleTotal, currently_contained_entities, num_currently_contained_entities);
 }
 
 /////////
@@ -930,6 +1220,7 @@ void evolveTripleList() {
     INT operation = 0;
     if (numOperationsRate == 0)
         numOperationsRate = totalOperations;
+    beginTripleDelta(tripleDelta, tripleList, tripleTotal);
         
     while(operation < numOperationsRate){
         if(KnowledgeGraphOperations[next_operation_id].operation == '+')
@@ -942,7 +1233,11 @@ void evolveTripleList() {
         next_operation_id++;
     }
 
-    std::sort(tripleList, tripleList + tripleTotal, Triple::cmp_head);
+    std::vector<Triple> inserted, deleted;
+    materializeTripleDelta(tripleDelta, tripleList, tripleTotal, inserted, deleted);
+    loadContainedElements(entityBitmap.contained, currently_contained_entities, num_currently_contained_entities);
+    loadContainedElements(relationBitmap.contained, currently_contained_relations, num_currently_contained_relations);
+    buildKnownAnswers(knownAnswers, tripleList, tripleTotal, currently_contained_entities, num_currently_contained_entities);
     printf("Currently contained entities: %ld.\n", getNumCurrentlyContainedEntities());
     printf("Currently deleted entities: %ld.\n", num_deleted_entities);
     printf("All entities: %ld.\n", num_all_entities);
@@ -0,0 +1,164 @@
+/*
+MIT License
+
+Copyright (c) 2020 Rashid Lafraie
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+*/
+
+#ifndef KNOWNANSWERS_H
+#define KNOWNANSWERS_H
+
+#include "Setting.h"
+#include "Triple.h"
+#include "Utilities.h"
+#include <cstdlib>
+#include <cstring>
+#include <algorithm>
+
+/*
+===================== Known answers for filtered link prediction =========================
+*/
+
+// byHead holds the distinct triples of tripleList in cmp_head order, so the known tails of a
+// (h,r) query are one contiguous range of it. byTail holds the same triples in cmp_tail order for
+// the known heads of a (r,t) query. The filtered rank of a test triple is its raw rank minus the
+// number of known answers that score better than the test triple, which only needs one range
+// lookup per test triple instead of a binary search per better scored candidate.
+//
+// In the incremental setting the candidates are the currently contained entities, entityPosition
+// maps an entity to its index in that array (-1 if it is not contained).
+
+struct KnownAnswers {
+    Triple *byHead;
+    Triple *byTail;
+    INT total;
+    INT *entityPosition;
+    INT entityPositionTotal;
+    bool valid;
+};
+
+KnownAnswers knownAnswers = {NULL, NULL, 0, NULL, 0, false};
+
+void resetKnownAnswers(KnownAnswers &answers) {
+    resetTripleHelper(answers.byHead);
+    resetTripleHelper(answers.byTail);
+    resetIntHelper(answers.entityPosition);
+    answers.total = 0;
+    answers.entityPositionTotal = 0;
+    answers.valid = false;
+}
+
+// list has to be sorted with cmp_head. contained may be NULL outside of the incremental setting.
+void buildKnownAnswers(KnownAnswers &answers, Triple *list, INT total, INT *contained, INT containedTotal) {
+    resetKnownAnswers(answers);
+
+    callocTripleArray(answers.byHead, total);
+    for (INT i = 0; i < total; i++)
+        if (i == 0 || list[i].h != list[i - 1].h || list[i].r != list[i - 1].r || list[i].t != list[i - 1].t)
+            answers.byHead[answers.total++] = list[i];
+
+    callocTripleArray(answers.byTail, answers.total);
+    memcpy(answers.byTail, answers.byHead, answers.total * sizeof(Triple));
+    std::sort(answers.byTail, answers.byTail + answers.total, Triple::cmp_tail);
+
+    if (contained != NULL && containedTotal > 0) {
+        for (INT i = 0; i < containedTotal; i++)
+            answers.entityPositionTotal = std::max(answers.entityPositionTotal, contained[i] + 1);
+        callocIntArray(answers.entityPosition, answers.entityPositionTotal);
+        for (INT i = 0; i < answers.entityPositionTotal; i++)
+            answers.entityPosition[i] = -1;
+        for (INT i = 0; i < containedTotal; i++)
+            answers.entityPosition[contained[i]] = i;
+    }
+    answers.valid = true;
+}
+
+// [lef, rig) of byHead holding the known tails of (h, r).
+void findKnownTails(KnownAnswers &answers, INT h, INT r, INT &lef, INT &rig) {
+    Triple key = {h, r, 0};
+    auto cmp = [](const Triple &a, const Triple &b) { return a.h < b.h || (a.h == b.h && a.r < b.r); };
+    std::pair<Triple *, Triple *> range = std::equal_range(answers.byHead, answers.byHead + answers.total, key, cmp);
+    lef = range.first - answers.byHead;
+    rig = range.second - answers.byHead;
+}
+
+// [lef, rig) of byTail holding the known heads of (r, t).
+void findKnownHeads(KnownAnswers &answers, INT r, INT t, INT &lef, INT &rig) {
+    Triple key = {0, r, t};
+    auto cmp = [](const Triple &a, const Triple &b) { return a.t < b.t || (a.t == b.t && a.r < b.r); };
+    std::pair<Triple *, Triple *> range = std::equal_range(answers.byTail, answers.byTail + answers.total, key, cmp);
+    lef = range.first - answers.byTail;
+    rig = range.second - answers.byTail;
+}
+
+// Index of entity ent in a score array built by getHeadBatch/getTailBatch for the test entity
+// target, i.e. con[0] is the score of target and the remaining candidates follow in order with
+// target skipped. Returns -1 if ent is not scored as a candidate.
+INT knownAnswerPosition(KnownAnswers &answers, INT ent, INT target, INT candidateTotal, bool incremental) {
+    if (ent == target)
+        return -1;
+    INT position = ent, targetPosition = target;
+    if (incremental) {
+        if (ent < 0 || ent >= answers.entityPositionTotal || answers.entityPosition[ent] < 0)
+            return -1;
+        position = answers.entityPosition[ent];
+        targetPosition = (target >= 0 && target < answers.entityPositionTotal) ? answers.entityPosition[target] : -1;
+    }
+    INT j = (targetPosition < 0 || position < targetPosition) ? position + 1 : position;
+    return j < candidateTotal ? j : -1;
+}
+
+// number of candidates in con[1, candidateTotal) scoring better than the test triple.
+INT countBetterScores(REAL *con, INT candidateTotal, REAL minimal) {
+    INT better = 0;
+    for (INT j = 1; j < candidateTotal; j++)
+        better += con[j] < minimal;
+    return better;
+}
+
+// Number of known heads of (r, t) besides h that are scored better than the test triple, or that
+// are scored at all if con is NULL.
+INT countKnownHeads(KnownAnswers &answers, INT h, INT r, INT t, REAL *con, INT candidateTotal, REAL minimal,
+                    bool incremental) {
+    INT lef, rig, known = 0;
+    findKnownHeads(answers, r, t, lef, rig);
+    for (INT i = lef; i < rig; i++) {
+        INT j = knownAnswerPosition(answers, answers.byTail[i].h, h, candidateTotal, incremental);
+        if (j >= 0 && (con == NULL || con[j] < minimal))
+            known++;
+    }
+    return known;
+}
+
+// Number of known tails of (h, r) besides t that are scored better than the test triple, or that
+// are scored at all if con is NULL.
+INT countKnownTails(KnownAnswers &answers, INT h, INT r, INT t, REAL *con, INT candidateTotal, REAL minimal,
+                    bool incremental) {
+    INT lef, rig, known = 0;
+    findKnownTails(answers, h, r, lef, rig);
+    for (INT i = lef; i < rig; i++) {
+        INT j = knownAnswerPosition(answers, answers.byHead[i].t, t, candidateTotal, incremental);
+        if (j >= 0 && (con == NULL || con[j] < minimal))
+            known++;
+    }
+    return known;
+}
+
+#endif
@@ -2,46 +2,87 @@
 #define RANDOM_H
 #include "Setting.h"
 #include <cstdlib>
+#include <ctime>
 
-// the random seeds for all threads.
-unsigned long long *next_random;
+// Counter-based random streams. The n-th number of a stream is a SplitMix64 hash of the stream
+// key and n, so a stream can be (re)positioned in O(1) and does not share state with other
+// streams or with libc rand().
+struct RandomStream {
+	unsigned long long key;
+	unsigned long long counter;
+};
 
-// reset the random seeds for all threads
+INT random_seed;
+
+// the random streams for all threads.
+RandomStream *next_random = NULL;
+
+// stream for the single threaded callers of rand(a, b), e.g. the universe constructor.
+RandomStream global_random = {0, 0};
+
+// index of the next batch drawn by the sampler, used to key the streams of its samples.
+INT samplingBatch = 0;
+
+inline unsigned long long mixBits(unsigned long long z) {
+	z = (z ^ (z >> 30)) * 0xBF58476D1CE4E5B9ULL;
+	z = (z ^ (z >> 27)) * 0x94D049BB133111EBULL;
+	return z ^ (z >> 31);
+}
+
+inline unsigned long long seededStreamKey(INT seed, unsigned long long a, unsigned long long b) {
+	return mixBits(mixBits(mixBits((unsigned long long) seed + 0x9E3779B97F4A7C15ULL) ^ a) + b);
+}
+
+inline unsigned long long streamKey(unsigned long long a, unsigned long long b) {
+	return seededStreamKey(random_seed, a, b);
+}
+
+inline unsigned long long nextRandom(RandomStream &stream) {
+	stream.counter++;
+	return mixBits(stream.key + stream.counter * 0x9E3779B97F4A7C15ULL);
+}
+
+// reset the random streams for all threads
 extern "C"
 void randReset() {
-	next_random = (unsigned long long *)calloc(workThreads, sizeof(unsigned long long));
+	free(next_random);
+	next_random = (RandomStream *)calloc(workThreads, sizeof(RandomStream));
 	for (INT i = 0; i < workThreads; i++)
-		next_random[i] = rand();
+		next_random[i].key = streamKey(0, i);
+	global_random.key = streamKey(1, 0);
+	global_random.counter = 0;
+	samplingBatch = 0;
 }
 
-// get a random interger for the id-th thread with the corresponding random seed.
-unsigned long long randd(INT id) {
-	next_random[id] = next_random[id] * (unsigned long long)(25214903917) + 11;
-	return next_random[id];
+// key the stream of a sampler context by the position of the sample it draws next. The numbers
+// drawn for a sample then only depend on the seed, the batch and the position within the batch,
+// not on the thread that draws it.
+void randSeek(RandomStream &stream, INT seed, INT batch, INT position) {
+	stream.key = seededStreamKey(seed, 2 + batch, position);
+	stream.counter = 0;
 }
 
-// get a random interger from the range [0,x) for the id-th thread.
-INT rand_max(INT id, INT x) {
-	INT res = randd(id) % x;
-	while (res < 0)
-		res += x;
-	return res;
+// get a random interger from the range [0,x) from the given stream.
+INT rand_max(RandomStream &stream, INT x) {
+	return nextRandom(stream) % x;
 }
 
-// get a random interger from the range [a,b) for the id-th thread.
+// get a random interger for the id-th thread with the corresponding random stream.
+unsigned long long randd(INT id) {
+	return nextRandom(next_random[id]);
+}
+
+// get a random interger from the range [a,b) from the global stream.
 INT rand(INT a, INT b){
-	return (rand() % (b-a))+ a;
+	return (nextRandom(global_random) % (b-a))+ a;
 }
 
-INT random_seed;
 extern "C"
 void setRandomSeed(INT seed = -1){
     if(seed == -1)
 		random_seed = time(0);
 	else
 		random_seed = seed;
-	
-	srand(random_seed);
 }
 
 extern "C"
@@ -4,6 +4,9 @@
 #include "Setting.h"
 #include "Utilities.h"
 #include "Triple.h"
+#include "CorruptIndex.h"
+#include "KnownAnswers.h"
+#include "TextParser.h"
 #include <cstdlib>
 #include <set>
 #include <algorithm>
@@ -84,8 +87,8 @@ void loadHelpers(
     callocTripleArray(trainingListRel, trainingTotal);
     callocTripleArray(trainingListRel2, trainingTotal);
 
-    callocIntArray(frequencyEntity, entityTotal);
-    callocIntArray(frequencyRelation, relationTotal);
+    callocIntArray(frequencyEntity, entTotal);
+    callocIntArray(frequencyRelation, relTotal);
 
     trainingListHead[0] = trainingListTail[0] = trainingListRel[0] = trainingListRel2[0] = trainingList[0];
     frequencyEntity[trainingList[0].t] += 1;
@@ -96,26 +99,26 @@ void loadHelpers(
         trainingListHead[i] = trainingListTail[i] = trainingListRel[i] = trainingListRel2[i] = trainingList[i];
         frequencyEntity[trainingList[i].h]++;
         frequencyEntity[trainingList[i].t]++;
-        frequencyRelation[trainList[i].r]++;
+        frequencyRelation[trainingList[i].r]++;
     }
     std::sort(trainingListHead, trainingListHead + trainingTotal, Triple::cmp_head);
     std::sort(trainingListTail, trainingListTail + trainingTotal, Triple::cmp_tail);
     std::sort(trainingListRel, trainingListRel + trainingTotal, Triple::cmp_rel);
     std::sort(trainingListRel2, trainingListRel2 + trainingTotal, Triple::cmp_rel2);
 
-    callocIntArray(leftIndexHead, entityTotal);
-    callocIntArray(rightIndexHead, entityTotal);
-    callocIntArray(leftIndexTail, entityTotal);
-    callocIntArray(rightIndexTail, entityTotal);
-    callocIntArray(leftIndexRelation, entityTotal);
-    callocIntArray(rightIndexRelation, entityTotal);
-    callocIntArray(leftIndexRelation2, relationTotal);
-    callocIntArray(rightIndexRelation2, relationTotal);
-
-    memset(rightIndexHead, -1, sizeof(INT) * entityTotal);
-    memset(rightIndexTail, -1, sizeof(INT) * entityTotal);
-    memset(rightIndexRelation, -1, sizeof(INT) * entityTotal);
-    memset(rightIndexRelation2, -1, sizeof(INT) * relationTotal);
+    callocIntArray(leftIndexHead, entTotal);
+    callocIntArray(rightIndexHead, entTotal);
+    callocIntArray(leftIndexTail, entTotal);
+    callocIntArray(rightIndexTail, entTotal);
+    callocIntArray(leftIndexRelation, entTotal);
+    callocIntArray(rightIndexRelation, entTotal);
+    callocIntArray(leftIndexRelation2, relTotal);
+    callocIntArray(rightIndexRelation2, relTotal);
+
+    memset(rightIndexHead, -1, sizeof(INT) * entTotal);
+    memset(rightIndexTail, -1, sizeof(INT) * entTotal);
+    memset(rightIndexRelation, -1, sizeof(INT) * entTotal);
+    memset(rightIndexRelation2, -1, sizeof(INT) * relTotal);
     
     for (INT i = 1; i < trainingTotal; i++) {
         if (trainingListTail[i].t != trainingListTail[i - 1].t) {
@@ -145,8 +148,8 @@ void loadHelpers(
     leftIndexRelation2[trainingListRel2[0].r] = 0;
     rightIndexRelation2[trainingListRel2[trainingTotal - 1].r] = trainingTotal - 1;
     
-    callocRealArray(leftIndex_mean, relationTotal);
-    callocRealArray(rightIndex_mean, relationTotal);
+    callocRealArray(leftIndex_mean, relTotal);
+    callocRealArray(rightIndex_mean, relTotal);
 
     for (INT i = 0; i < entTotal; i++) {
         for (INT j = leftIndexHead[i] + 1; j <= rightIndexHead[i]; j++)
@@ -170,31 +173,15 @@ extern "C"
 void importTrainFiles() {
 
     printf("The toolkit is importing datasets.\n");
-    FILE *fin;
-    int tmp;
+    INT tmp;
     
-    fin = fopen((inPath + "relation2id.txt").c_str(), "r");
-    relationTotal = getLineNum(fin);
-    // tmp = fscanf(fin, "%ld", &relationTotal);
+    relationTotal = countFileLines(inPath + "relation2id.txt");
     printf("The total of relations is %ld.\n", relationTotal);
-    fclose(fin);
 
-    fin = fopen((inPath + "entity2id.txt").c_str(), "r");
-    entityTotal = getLineNum(fin);
-    // tmp = fscanf(fin, "%ld", &entityTotal);
+    entityTotal = countFileLines(inPath + "entity2id.txt");
     printf("The total of entities is %ld.\n", entityTotal);
-    fclose(fin);
 
-    fin = fopen((inPath + "train2id.txt").c_str(), "r");
-    trainTotal = getLineNum(fin);
-    // tmp = fscanf(fin, "%ld", &trainTotal);
-    trainList = (Triple *) calloc(trainTotal, sizeof(Triple));
-    for (INT i = 0; i < trainTotal; i++) {
-        tmp = fscanf(fin, "%ld", &trainList[i].h);
-        tmp = fscanf(fin, "%ld", &trainList[i].t);
-        tmp = fscanf(fin, "%ld", &trainList[i].r);
-    }
-    fclose(fin);
+    trainTotal = readTripleFile(inPath + "train2id.txt", trainList);
 
     std::sort(trainList, trainList + trainTotal, Triple::cmp_head);
     tmp = trainTotal;
@@ -229,8 +216,7 @@ void importTrainFiles() {
             left_mean,
             right_mean
     );
-
-
+    resetCorruptIndex(corruptIndex);
 }
 
 Triple *testList;
@@ -245,71 +231,31 @@ void activateLoadOfAllTriples(bool){
 
 extern "C"
 void importTestFiles() {
-    FILE *fin;
-    INT tmp;
-
-    fin = fopen((inPath + "relation2id.txt").c_str(), "r");
-    // tmp = fscanf(fin, "%ld", &relationTotal);
-    relationTotal = getLineNum(fin);
-    fclose(fin);
+    relationTotal = countFileLines(inPath + "relation2id.txt");
+    entityTotal = countFileLines(inPath + "entity2id.txt");
 
-    fin = fopen((inPath + "entity2id.txt").c_str(), "r");
-    // tmp = fscanf(fin, "%ld", &entityTotal);
-    entityTotal = getLineNum(fin);
-    fclose(fin);
-
-    FILE *f_kb1 = fopen((inPath + "test2id.txt").c_str(), "r");
-    FILE *f_kb2 = fopen((inPath + "train2id.txt").c_str(), "r");
-    FILE *f_kb3 = fopen((inPath + "valid2id.txt").c_str(), "r");
-    // tmp = fscanf(f_kb1, "%ld", &testTotal);
-    // tmp = fscanf(f_kb2, "%ld", &trainTotal);
-    // tmp = fscanf(f_kb3, "%ld", &validTotal);
-    testTotal = getLineNum(f_kb1);
-    trainTotal = getLineNum(f_kb2);
-    validTotal = getLineNum(f_kb3);
+    Triple *trainingList;
+    testTotal = readTripleFile(inPath + "test2id.txt", testList);
+    trainTotal = readTripleFile(inPath + "train2id.txt", trainingList);
+    validTotal = readTripleFile(inPath + "valid2id.txt", validList);
     tripleTotal = testTotal + trainTotal + validTotal;
     
-    testList = (Triple *) calloc(testTotal, sizeof(Triple));
-    validList = (Triple *) calloc(validTotal, sizeof(Triple));
     tripleList = (Triple *) calloc(tripleTotal, sizeof(Triple));
-    for (INT i = 0; i < testTotal; i++) {
-        tmp = fscanf(f_kb1, "%ld", &testList[i].h);
-        tmp = fscanf(f_kb1, "%ld", &testList[i].t);
-        tmp = fscanf(f_kb1, "%ld", &testList[i].r);
-        tripleList[i] = testList[i];
-    }
-    for (INT i = 0; i < trainTotal; i++) {
-        tmp = fscanf(f_kb2, "%ld", &tripleList[i + testTotal].h);
-        tmp = fscanf(f_kb2, "%ld", &tripleList[i + testTotal].t);
-        tmp = fscanf(f_kb2, "%ld", &tripleList[i + testTotal].r);
-    }
-    for (INT i = 0; i < validTotal; i++) {
-        tmp = fscanf(f_kb3, "%ld", &tripleList[i + testTotal + trainTotal].h);
-        tmp = fscanf(f_kb3, "%ld", &tripleList[i + testTotal + trainTotal].t);
-        tmp = fscanf(f_kb3, "%ld", &tripleList[i + testTotal + trainTotal].r);
-        validList[i] = tripleList[i + testTotal + trainTotal];
-    }
-    fclose(f_kb1);
-    fclose(f_kb2);
-    fclose(f_kb3);
+    memcpy(tripleList, testList, testTotal * sizeof(Triple));
+    memcpy(tripleList + testTotal, trainingList, trainTotal * sizeof(Triple));
+    memcpy(tripleList + testTotal + trainTotal, validList, validTotal * sizeof(Triple));
+    free(trainingList);
 
     if (loadAllTriple){
-        FILE *fin1 = fopen((inPath + "triple2id.txt").c_str(), "r");
-        tripleTotal = getLineNum(fin1);
-        callocTripleArray(tripleList ,tripleTotal);
+        free(tripleList);
+        tripleTotal = readTripleFile(inPath + "triple2id.txt", tripleList);
         printf("Captured %ld triples in total.\n", tripleTotal);
-        
-        for (INT i = 0; i < tripleTotal; i++) {
-            tmp = fscanf(fin1, "%ld", &tripleList[i].h);
-            tmp = fscanf(fin1, "%ld", &tripleList[i].t);
-            tmp = fscanf(fin1, "%ld", &tripleList[i].r);
-        }
-        fclose(fin1);
     }
 
     std::sort(tripleList, tripleList + tripleTotal, Triple::cmp_head);
     std::sort(testList, testList + testTotal, Triple::cmp_rel2);
     std::sort(validList, validList + validTotal, Triple::cmp_rel2);
+    buildKnownAnswers(knownAnswers, tripleList, tripleTotal, NULL, 0);
     printf("The total of test triples is %ld.\n", testTotal);
     printf("The total of valid triples is %ld.\n", validTotal);
     printf("The total of train triples is %ld.\n", trainTotal);
@@ -357,49 +303,38 @@ void importTypeFiles() {
     tail_rig = (INT *) calloc(relationTotal, sizeof(INT));
     INT total_lef = 0;
     INT total_rig = 0;
-    FILE *f_type = fopen((inPath + "type_constrain.txt").c_str(), "r");
-    INT tmp;
-    tmp = fscanf(f_type, "%ld", &tmp);
+    // type_constrain.txt: number of relations, then per relation "rel tot heads..." and "rel tot tails..."
+    INT valueTotal;
+    INT *values = parseIntegerFile(inPath + "type_constrain.txt", valueTotal);
+    INT next = 1;
     for (INT i = 0; i < relationTotal; i++) {
-        INT rel, tot;
-        tmp = fscanf(f_type, "%ld %ld", &rel, &tot);
-        for (INT j = 0; j < tot; j++) {
-            tmp = fscanf(f_type, "%ld", &tmp);
-            total_lef++;
-        }
-        tmp = fscanf(f_type, "%ld%ld", &rel, &tot);
-        for (INT j = 0; j < tot; j++) {
-            tmp = fscanf(f_type, "%ld", &tmp);
-            total_rig++;
-        }
+        total_lef += values[next + 1];
+        next += 2 + values[next + 1];
+        total_rig += values[next + 1];
+        next += 2 + values[next + 1];
     }
-    fclose(f_type);
     head_type = (INT *) calloc(total_lef, sizeof(INT));
     tail_type = (INT *) calloc(total_rig, sizeof(INT));
     total_lef = 0;
     total_rig = 0;
-    f_type = fopen((inPath + "type_constrain.txt").c_str(), "r");
-    tmp = fscanf(f_type, "%ld", &tmp);
+    next = 1;
     for (INT i = 0; i < relationTotal; i++) {
-        INT rel, tot;
-        tmp = fscanf(f_type, "%ld%ld", &rel, &tot);
+        INT rel = values[next], tot = values[next + 1];
         head_lef[rel] = total_lef;
-        for (INT j = 0; j < tot; j++) {
-            tmp = fscanf(f_type, "%ld", &head_type[total_lef]);
-            total_lef++;
-        }
+        memcpy(head_type + total_lef, values + next + 2, tot * sizeof(INT));
+        total_lef += tot;
+        next += 2 + tot;
         head_rig[rel] = total_lef;
         std::sort(head_type + head_lef[rel], head_type + head_rig[rel]);
-        tmp = fscanf(f_type, "%ld%ld", &rel, &tot);
+        rel = values[next], tot = values[next + 1];
         tail_lef[rel] = total_rig;
-        for (INT j = 0; j < tot; j++) {
-            tmp = fscanf(f_type, "%ld", &tail_type[total_rig]);
-            total_rig++;
-        }
+        memcpy(tail_type + total_rig, values + next + 2, tot * sizeof(INT));
+        total_rig += tot;
+        next += 2 + tot;
         tail_rig[rel] = total_rig;
         std::sort(tail_type + tail_lef[rel], tail_type + tail_rig[rel]);
     }
-    fclose(f_type);
+    free(values);
 }
 
 void resetHelpers() {
@@ -420,6 +355,7 @@ void resetHelpers() {
     resetIntHelper(rigRel2);
     resetRealHelper(left_mean);
     resetRealHelper(right_mean);
+    resetCorruptIndex(corruptIndex);
 }
 
 #endif
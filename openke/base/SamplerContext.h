@@ -0,0 +1,238 @@
+/*
+MIT License
+
+Copyright (c) 2020 Rashid Lafraie
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+*/
+#ifndef SAMPLERCONTEXT_H
+#define SAMPLERCONTEXT_H
+
+#include "Setting.h"
+#include "Triple.h"
+#include "Random.h"
+#include "Utilities.h"
+#include "TextParser.h"
+#include "CorruptIndex.h"
+#include "Reader.h"
+#include "UniverseSetting.h"
+#include "Incremental.h"
+#include <cstdlib>
+#include <cstring>
+#include <algorithm>
+#include <pthread.h>
+
+/*
+===================== Sampler contexts =========================
+*/
+
+// Everything the negative sampler reads. The corruption functions and getBatch only access the
+// training data through a context, so independent contexts can be sampled from concurrently.
+//
+// The global context is a view on the process-global training data (importTrainFiles, the
+// universe and incremental settings) and is refreshed before every call of the global sampling
+// API, only its random streams are its own. Contexts created by createSamplerContext own their
+// training data, random streams and corrupt index.
+
+struct SamplerContext {
+    Triple *trainList;
+    Triple *trainHead;
+    Triple *trainTail;
+    Triple *trainRel;
+    Triple *trainRel2;
+    INT *freqRel, *freqEnt;
+    INT *lefHead, *rigHead;
+    INT *lefTail, *rigTail;
+    INT *lefRel, *rigRel;
+    INT *lefRel2, *rigRel2;
+    REAL *left_mean, *right_mean;
+
+    INT entityTotal;
+    INT relationTotal;
+    INT trainTotal;
+
+    INT bernFlag;
+    bool corruptIndexOn;
+    CorruptIndex corruptIndex;
+
+    // incremental setting: negatives are drawn from the currently contained entities if set
+    INT *containedEntities;
+    INT containedTotal;
+
+    INT randomSeed;
+    RandomStream *streams;
+    INT streamTotal;
+    INT samplingBatch;
+
+    pthread_mutex_t mutex;
+};
+
+SamplerContext globalSamplerContext;
+
+void syncGlobalSamplerContext() {
+    SamplerContext &ctx = globalSamplerContext;
+    ctx.trainList = trainList;
+    ctx.trainHead = trainHead;
+    ctx.trainTail = trainTail;
+    ctx.trainRel = trainRel;
+    ctx.trainRel2 = trainRel2;
+    ctx.freqRel = freqRel;
+    ctx.freqEnt = freqEnt;
+    ctx.lefHead = lefHead;
+    ctx.rigHead = rigHead;
+    ctx.lefTail = lefTail;
+    ctx.rigTail = rigTail;
+    ctx.lefRel = lefRel;
+    ctx.rigRel = rigRel;
+    ctx.lefRel2 = lefRel2;
+    ctx.rigRel2 = rigRel2;
+    ctx.left_mean = left_mean;
+    ctx.right_mean = right_mean;
+
+    ctx.entityTotal = entityTotal;
+    ctx.relationTotal = relationTotal;
+    ctx.trainTotal = trainTotal;
+
+    ctx.bernFlag = bernFlag;
+    ctx.corruptIndexOn = corruptIndexOn;
+    ctx.corruptIndex = corruptIndex;
+
+    bool contained = incrementalSetting and not swap;
+    ctx.containedEntities = contained ? currently_contained_entities : NULL;
+    ctx.containedTotal = contained ? num_currently_contained_entities : 0;
+
+    ctx.randomSeed = random_seed;
+    ctx.samplingBatch = samplingBatch;
+}
+
+// Resizes the random streams of a context to the number of pool workers. The streams are keyed
+// per sample (randSeek), so they do not carry state between batches.
+void ensureContextStreams(SamplerContext *ctx, INT threads) {
+    if (ctx->streamTotal >= threads)
+        return;
+    ctx->streams = (RandomStream *) realloc(ctx->streams, threads * sizeof(RandomStream));
+    memset(ctx->streams, 0, threads * sizeof(RandomStream));
+    ctx->streamTotal = threads;
+}
+
+void ensureContextCorruptIndex(SamplerContext *ctx) {
+    if (ctx->corruptIndexOn and not ctx->corruptIndex.valid and ctx->trainList != NULL)
+        buildCorruptIndex(ctx->corruptIndex, ctx->trainList, ctx->trainTotal);
+}
+
+// Reads train2id.txt of path into a new context, without touching the global training data.
+extern "C"
+void *createSamplerContext(char *path) {
+    std::string directory = path;
+    SamplerContext *ctx = (SamplerContext *) calloc(1, sizeof(SamplerContext));
+    pthread_mutex_init(&ctx->mutex, NULL);
+
+    ctx->relationTotal = countFileLines(directory + "relation2id.txt");
+    ctx->entityTotal = countFileLines(directory + "entity2id.txt");
+    INT total = readTripleFile(directory + "train2id.txt", ctx->trainList);
+
+    std::sort(ctx->trainList, ctx->trainList + total, Triple::cmp_head);
+    ctx->trainTotal = total > 0 ? 1 : 0;
+    for (INT i = 1; i < total; i++)
+        if (ctx->trainList[i].h != ctx->trainList[i - 1].h || ctx->trainList[i].r != ctx->trainList[i - 1].r ||
+            ctx->trainList[i].t != ctx->trainList[i - 1].t) {
+            ctx->trainList[ctx->trainTotal] = ctx->trainList[i];
+            ctx->trainTotal++;
+        }
+
+    loadHelpers(ctx->trainList, ctx->trainHead, ctx->trainTail, ctx->trainRel, ctx->trainRel2,
+                ctx->freqRel, ctx->freqEnt, ctx->trainTotal, ctx->entityTotal, ctx->relationTotal,
+                ctx->lefHead, ctx->rigHead, ctx->lefTail, ctx->rigTail, ctx->lefRel, ctx->rigRel,
+                ctx->lefRel2, ctx->rigRel2, ctx->left_mean, ctx->right_mean);
+
+    ctx->randomSeed = random_seed;
+    ctx->corruptIndex = {NULL, NULL, NULL, NULL, 0, 0, false};
+    ensureContextStreams(ctx, workThreads);
+    return (void *) ctx;
+}
+
+extern "C"
+void destroySamplerContext(void *context) {
+    SamplerContext *ctx = (SamplerContext *) context;
+    resetTripleHelper(ctx->trainList);
+    resetTripleHelper(ctx->trainHead);
+    resetTripleHelper(ctx->trainTail);
+    resetTripleHelper(ctx->trainRel);
+    resetTripleHelper(ctx->trainRel2);
+    resetIntHelper(ctx->freqEnt);
+    resetIntHelper(ctx->freqRel);
+    resetIntHelper(ctx->lefHead);
+    resetIntHelper(ctx->rigHead);
+    resetIntHelper(ctx->lefTail);
+    resetIntHelper(ctx->rigTail);
+    resetIntHelper(ctx->lefRel);
+    resetIntHelper(ctx->rigRel);
+    resetIntHelper(ctx->lefRel2);
+    resetIntHelper(ctx->rigRel2);
+    resetRealHelper(ctx->left_mean);
+    resetRealHelper(ctx->right_mean);
+    resetCorruptIndex(ctx->corruptIndex);
+    free(ctx->streams);
+    pthread_mutex_destroy(&ctx->mutex);
+    free(ctx);
+}
+
+extern "C"
+void setContextBern(void *context, INT con) {
+    ((SamplerContext *) context)->bernFlag = con;
+}
+
+// Restarts the random streams of the context like setRandomSeed + randReset do for the global one.
+extern "C"
+void setContextRandomSeed(void *context, INT seed) {
+    SamplerContext *ctx = (SamplerContext *) context;
+    pthread_mutex_lock(&ctx->mutex);
+    ctx->randomSeed = seed;
+    ctx->samplingBatch = 0;
+    pthread_mutex_unlock(&ctx->mutex);
+}
+
+extern "C"
+void setContextCorruptIndex(void *context, bool flag) {
+    SamplerContext *ctx = (SamplerContext *) context;
+    pthread_mutex_lock(&ctx->mutex);
+    ctx->corruptIndexOn = flag;
+    if (flag)
+        ensureContextCorruptIndex(ctx);
+    else
+        resetCorruptIndex(ctx->corruptIndex);
+    pthread_mutex_unlock(&ctx->mutex);
+}
+
+extern "C"
+INT getContextEntityTotal(void *context) {
+    return ((SamplerContext *) context)->entityTotal;
+}
+
+extern "C"
+INT getContextRelationTotal(void *context) {
+    return ((SamplerContext *) context)->relationTotal;
+}
+
+extern "C"
+INT getContextTrainTotal(void *context) {
+    return ((SamplerContext *) context)->trainTotal;
+}
+
+#endif
@@ -0,0 +1,209 @@
+/*
+MIT License
+
+Copyright (c) 2020 Rashid Lafraie
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+*/
+
+#ifndef SAMPLERPOOL_H
+#define SAMPLERPOOL_H
+
+#include "Setting.h"
+#include <cstdlib>
+#include <ctime>
+#include <pthread.h>
+
+/*
+===================== Persistent worker pool for the sampler =========================
+*/
+
+// The workers are spawned once (setWorkThreads) and sleep on a condition variable between
+// batches. A job is published by bumping the generation counter, every worker runs the job
+// function on its slice of the argument array and the dispatching thread waits until the
+// last worker has reported back.
+
+struct SamplerPool {
+    pthread_t *threads;
+    INT size;
+
+    pthread_mutex_t mutex;
+    pthread_cond_t job_cond;
+    pthread_cond_t done_cond;
+
+    INT generation;
+    INT pending;
+    bool shutdown;
+
+    void *(*job)(void *);
+    char *args;
+    size_t arg_size;
+
+    // utilization statistics
+    INT jobs;
+    double busy_time;
+    double wall_time;
+};
+
+SamplerPool samplerPool = {NULL, 0, PTHREAD_MUTEX_INITIALIZER, PTHREAD_COND_INITIALIZER, PTHREAD_COND_INITIALIZER,
+                           0, 0, false, NULL, NULL, 0, 0, 0, 0};
+
+// Serializes dispatches, e.g. when the python side samples from a prefetch thread.
+pthread_mutex_t samplerPoolDispatchMutex = PTHREAD_MUTEX_INITIALIZER;
+
+double getMonotonicTime() {
+    struct timespec ts;
+    clock_gettime(CLOCK_MONOTONIC, &ts);
+    return ts.tv_sec + ts.tv_nsec * 1e-9;
+}
+
+void *samplerPoolWorker(void *con) {
+    INT id = (INT) (size_t) con;
+    INT seen_generation = 0;
+
+    pthread_mutex_lock(&samplerPool.mutex);
+    while (true) {
+        while (!samplerPool.shutdown && samplerPool.generation == seen_generation)
+            pthread_cond_wait(&samplerPool.job_cond, &samplerPool.mutex);
+        if (samplerPool.shutdown)
+            break;
+        seen_generation = samplerPool.generation;
+        void *(*job)(void *) = samplerPool.job;
+        void *arg = (void *) (samplerPool.args + id * samplerPool.arg_size);
+        pthread_mutex_unlock(&samplerPool.mutex);
+
+        double start = getMonotonicTime();
+        job(arg);
+        double busy = getMonotonicTime() - start;
+
+        pthread_mutex_lock(&samplerPool.mutex);
+        samplerPool.busy_time += busy;
+        samplerPool.pending--;
+        if (samplerPool.pending == 0)
+            pthread_cond_signal(&samplerPool.done_cond);
+    }
+    pthread_mutex_unlock(&samplerPool.mutex);
+    return NULL;
+}
+
+void stopSamplerPoolWorkers() {
+    if (samplerPool.threads == NULL)
+        return;
+
+    pthread_mutex_lock(&samplerPool.mutex);
+    samplerPool.shutdown = true;
+    pthread_cond_broadcast(&samplerPool.job_cond);
+    pthread_mutex_unlock(&samplerPool.mutex);
+
+    for (INT i = 0; i < samplerPool.size; i++)
+        pthread_join(samplerPool.threads[i], NULL);
+    free(samplerPool.threads);
+
+    samplerPool.threads = NULL;
+    samplerPool.size = 0;
+    samplerPool.generation = 0;
+    samplerPool.pending = 0;
+    samplerPool.shutdown = false;
+}
+
+extern "C"
+void destroySamplerPool() {
+    pthread_mutex_lock(&samplerPoolDispatchMutex);
+    stopSamplerPoolWorkers();
+    pthread_mutex_unlock(&samplerPoolDispatchMutex);
+}
+
+extern "C"
+void resetSamplerPoolStats() {
+    pthread_mutex_lock(&samplerPool.mutex);
+    samplerPool.jobs = 0;
+    samplerPool.busy_time = 0;
+    samplerPool.wall_time = 0;
+    pthread_mutex_unlock(&samplerPool.mutex);
+}
+
+// The caller holds samplerPoolDispatchMutex.
+void startSamplerPoolWorkers(INT threads) {
+    stopSamplerPoolWorkers();
+    resetSamplerPoolStats();
+
+    samplerPool.threads = (pthread_t *) calloc(threads, sizeof(pthread_t));
+    samplerPool.size = threads;
+    for (INT i = 0; i < threads; i++)
+        pthread_create(&samplerPool.threads[i], NULL, samplerPoolWorker, (void *) (size_t) i);
+}
+
+extern "C"
+void createSamplerPool(INT threads) {
+    pthread_mutex_lock(&samplerPoolDispatchMutex);
+    startSamplerPoolWorkers(threads);
+    pthread_mutex_unlock(&samplerPoolDispatchMutex);
+}
+
+// Runs job(args + id * arg_size) on every worker id in [0, threads) and blocks until all workers
+// have finished. threads is the number of entries the caller allocated in args, it is read from
+// workThreads once by the caller because another loader may change workThreads in the meantime.
+// The pool is (re)created under the dispatch lock if its size does not match threads.
+void runSamplerPool(void *(*job)(void *), void *args, size_t arg_size, INT threads) {
+    pthread_mutex_lock(&samplerPoolDispatchMutex);
+    if (samplerPool.size != threads)
+        startSamplerPoolWorkers(threads);
+    double start = getMonotonicTime();
+
+    pthread_mutex_lock(&samplerPool.mutex);
+    samplerPool.job = job;
+    samplerPool.args = (char *) args;
+    samplerPool.arg_size = arg_size;
+    samplerPool.pending = samplerPool.size;
+    samplerPool.generation++;
+    pthread_cond_broadcast(&samplerPool.job_cond);
+    while (samplerPool.pending > 0)
+        pthread_cond_wait(&samplerPool.done_cond, &samplerPool.mutex);
+    samplerPool.jobs++;
+    samplerPool.wall_time += getMonotonicTime() - start;
+    pthread_mutex_unlock(&samplerPool.mutex);
+
+    pthread_mutex_unlock(&samplerPoolDispatchMutex);
+}
+
+extern "C"
+void setWorkThreads(INT threads) {
+	workThreads = threads;
+	createSamplerPool(threads);
+}
+
+extern "C"
+INT getSamplerPoolSize() {
+    return samplerPool.size;
+}
+
+extern "C"
+INT getSamplerPoolJobs() {
+    return samplerPool.jobs;
+}
+
+// Fraction of the dispatched wall time in which the workers were busy sampling.
+extern "C"
+REAL getSamplerPoolUtilization() {
+    if (samplerPool.wall_time == 0 || samplerPool.size == 0)
+        return 0;
+    return samplerPool.busy_time / (samplerPool.wall_time * samplerPool.size);
+}
+
+#endif
@@ -31,13 +31,9 @@ void setOutPath(char *path) {
 ============================================================
 */
 
+// setWorkThreads is defined in SamplerPool.h as it (re)creates the sampler worker pool
 INT workThreads = 1;
 
-extern "C"
-void setWorkThreads(INT threads) {
-	workThreads = threads;
-}
-
 extern "C"
 INT getWorkThreads() {
 	return workThreads;
@@ -4,6 +4,7 @@
 #include "Reader.h"
 #include "Corrupt.h"
 #include "Incremental.h"
+#include "SamplerPool.h"
 
 /*=====================================================================================
 link prediction
@@ -20,18 +21,43 @@ REAL l3_filter_tot_constrain = 0, l3_tot_constrain = 0, r3_tot_constrain = 0, r3
 REAL hit1, hit3, hit10, mr, mrr;
 REAL hit1TC, hit3TC, hit10TC, mrTC, mrrTC;
 
+// Ranks of the test triples, raw == -1 marks a triple that has not been ranked. Ranking only
+// writes the entry of its own triple, so a batch of rows can be ranked on all work threads, and
+// the metrics are reduced from the ranks in test_link_prediction.
+struct LinkRank {
+    INT raw;
+    INT filter;
+    INT raw_constrain;
+    INT filter_constrain;
+};
+
+LinkRank *headRanks = NULL;
+LinkRank *tailRanks = NULL;
+INT rankTotal = 0;
+
+void resetLinkMetrics() {
+    l1_filter_tot = 0, l1_tot = 0, r1_tot = 0, r1_filter_tot = 0, l_tot = 0, r_tot = 0, l_filter_rank = 0, l_rank = 0, l_filter_reci_rank = 0, l_reci_rank = 0;
+    l3_filter_tot = 0, l3_tot = 0, r3_tot = 0, r3_filter_tot = 0, l_filter_tot = 0, r_filter_tot = 0, r_filter_rank = 0, r_rank = 0, r_filter_reci_rank = 0, r_reci_rank = 0;
+    l1_filter_tot_constrain = 0, l1_tot_constrain = 0, r1_tot_constrain = 0, r1_filter_tot_constrain = 0, l_tot_constrain = 0, r_tot_constrain = 0, l_filter_rank_constrain = 0, l_rank_constrain = 0, l_filter_reci_rank_constrain = 0, l_reci_rank_constrain = 0;
+    l3_filter_tot_constrain = 0, l3_tot_constrain = 0, r3_tot_constrain = 0, r3_filter_tot_constrain = 0, l_filter_tot_constrain = 0, r_filter_tot_constrain = 0, r_filter_rank_constrain = 0, r_rank_constrain = 0, r_filter_reci_rank_constrain = 0, r_reci_rank_constrain = 0;
+}
+
 extern "C"
 void initTest() {
     printf("Initialize test\n");
     lastHead = 0;
     lastTail = 0;
     lastRel = 0;
-    l1_filter_tot = 0, l1_tot = 0, r1_tot = 0, r1_filter_tot = 0, l_tot = 0, r_tot = 0, l_filter_rank = 0, l_rank = 0, l_filter_reci_rank = 0, l_reci_rank = 0;
-    l3_filter_tot = 0, l3_tot = 0, r3_tot = 0, r3_filter_tot = 0, l_filter_tot = 0, r_filter_tot = 0, r_filter_rank = 0, r_rank = 0, r_filter_reci_rank = 0, r_reci_rank = 0;
+    resetLinkMetrics();
     REAL rel3_tot = 0, rel3_filter_tot = 0, rel_filter_tot = 0, rel_filter_rank = 0, rel_rank = 0, rel_filter_reci_rank = 0, rel_reci_rank = 0, rel_tot = 0, rel1_tot = 0, rel1_filter_tot = 0;
 
-    l1_filter_tot_constrain = 0, l1_tot_constrain = 0, r1_tot_constrain = 0, r1_filter_tot_constrain = 0, l_tot_constrain = 0, r_tot_constrain = 0, l_filter_rank_constrain = 0, l_rank_constrain = 0, l_filter_reci_rank_constrain = 0, l_reci_rank_constrain = 0;
-    l3_filter_tot_constrain = 0, l3_tot_constrain = 0, r3_tot_constrain = 0, r3_filter_tot_constrain = 0, l_filter_tot_constrain = 0, r_filter_tot_constrain = 0, r_filter_rank_constrain = 0, r_rank_constrain = 0, r_filter_reci_rank_constrain = 0, r_reci_rank_constrain = 0;
+    free(headRanks);
+    free(tailRanks);
+    rankTotal = testTotal;
+    headRanks = (LinkRank *) calloc(rankTotal, sizeof(LinkRank));
+    tailRanks = (LinkRank *) calloc(rankTotal, sizeof(LinkRank));
+    for (INT i = 0; i < rankTotal; i++)
+        headRanks[i].raw = tailRanks[i].raw = -1;
 }
 
 extern "C"
@@ -46,17 +72,16 @@ void getHeadBatch(INT *ph, INT *pt, INT *pr) {
     INT offset = -1;
 
     if(incrementalSetting){
-        for(INT i=1; i<num_currently_contained_entities;i++) {
-            if (currently_contained_entities[i+offset] == testH)
-                offset++;
-            
-            INT entity = currently_contained_entities[i + offset];
-
+        INT i = 1;
+        for (INT entity = nextBit(entityBitmap.contained, 0); entity != -1 and i < num_currently_contained_entities;
+             entity = nextBit(entityBitmap.contained, entity + 1)) {
+            if (entity == testH)
+                continue;
             ph[i] = entity;
             pt[i] = testT;
             pr[i] = testR;
             i++;
-        } 
+        }
     }else{
         for (INT i = 1; i < entityTotal; i++) {
             if (i + offset == testH)
@@ -81,18 +106,16 @@ void getTailBatch(INT *ph, INT *pt, INT *pr) {
     pt[0] = testT;
     pr[0] = testR;
     if(incrementalSetting){
-        for(INT i=1; i<num_currently_contained_entities;i++) {
-            // TODO Test
-            if(currently_contained_entities[i + offset] == testT)
-                offset++;
-            
-            INT entity = currently_contained_entities[i + offset]; 
-
+        INT i = 1;
+        for (INT entity = nextBit(entityBitmap.contained, 0); entity != -1 and i < num_currently_contained_entities;
+             entity = nextBit(entityBitmap.contained, entity + 1)) {
+            if (entity == testT)
+                continue;
             ph[i] = testH;
             pt[i] = entity;
             pr[i] = testR;
             i++;
-        } 
+        }
     }else{
         for (INT i = 1; i < entityTotal; i++) {
             if (i + offset == testT)
@@ -115,101 +138,35 @@ void getRelBatch(INT *ph, INT *pt, INT *pr) {
     }
 }
 
-extern "C"
-void testHead(REAL *con, INT lastHead, bool type_constrain = false) {
-    //printf("lastHead: %ld.\n", lastHead);
-    INT h = testList[lastHead].h;
-    INT t = testList[lastHead].t;
-    INT r = testList[lastHead].r;
-    INT filter_offset = -1;
-
-    INT lef, rig;
-    if (type_constrain) {
-        lef = head_lef[r];
-        rig = head_rig[r];
+// number of the type constrained candidates type[lef, rig) scoring better than the test triple,
+// whose entity target is scored at con[0].
+INT countConstrainedScores(REAL *con, INT *type, INT lef, INT rig, INT target, REAL minimal) {
+    INT better = 0;
+    for (INT i = lef; i < rig; i++) {
+        if (i > lef && type[i] == type[i - 1])
+            continue;
+        INT j = knownAnswerPosition(knownAnswers, type[i], target, entityTotal, false);
+        if (j >= 0)
+            better += con[j] < minimal;
     }
-    REAL minimal = con[0];
-    //printf("lastHead score: %f.\n", con[0]);
-    INT l_s = 0;
-    INT l_filter_s = 0;
-    INT l_s_constrain = 0;
-    INT l_filter_s_constrain = 0;
+    return better;
+}
 
-    if (minimal != INFINITY){
-        if (incrementalSetting){
-            for (INT j = 1; j < num_currently_contained_entities; j++) {
-                REAL value = con[j];
-                if (currently_contained_entities[j + filter_offset] == h)
-                        filter_offset++;
-                    
-                if (value < minimal) {
-                    l_s += 1;
-                    
-                    if (not _find(currently_contained_entities[j + filter_offset], t, r)){
-                        l_filter_s += 1;
-                    }
-                }
-            }
-        } else {
-            for (INT j = 1; j < entityTotal; j++) {
-                REAL value = con[j];
-                if (j + filter_offset == h)
-                        filter_offset++;
-                    
-                if (value < minimal) {
-                    l_s += 1;
-                    
-                    if (not _find(j + filter_offset, t, r)){
-                        l_filter_s += 1;
-                    }else{
-                        // printf("Found: %ld, %ld, %ld.\n", j + filter_offset, t, r);
-                    }
-                }
-                if (type_constrain) {
-                    while (lef < rig && head_type[lef] < j) lef ++;
-                    if (lef < rig && j == head_type[lef]) {
-                        if (value < minimal) {
-                            l_s_constrain += 1;
-                            if (not _find(j, t, r)) {
-                                l_filter_s_constrain += 1;
-                            }
-                        }  
-                    }
-                }
-            }
-        }
-    } else {
-        if (incrementalSetting){
-            l_s = num_currently_contained_entities;
-            l_filter_s = num_currently_contained_entities;
-
-            for (INT j = 1; j < num_currently_contained_entities; j++) {
-                if (currently_contained_entities[j + filter_offset] == h)
-                    filter_offset++;
-                                
-                if (_find(currently_contained_entities[j + filter_offset], t, r)){
-                    l_filter_s -= 1;
-                }
-            }
-        } else {
-            l_s = entityTotal;
-            l_filter_s = entityTotal;
-            
-            for (INT j = 1; j < entityTotal; j++){ 
-                if (j + filter_offset == h)
-                        filter_offset++;
-                
-                if (_find(j + filter_offset, t, r))
-                    l_filter_s -= 1;
-                
-            }
-        }
+// number of the known answers in answerList[lef, rig) that are type constrained candidates and
+// score better than the test triple.
+INT countConstrainedKnownAnswers(REAL *con, Triple *answerList, INT lef, INT rig, bool head,
+                                 INT *type, INT typeLef, INT typeRig, INT target, REAL minimal) {
+    INT known = 0;
+    for (INT i = lef; i < rig; i++) {
+        INT ent = head ? answerList[i].h : answerList[i].t;
+        INT j = knownAnswerPosition(knownAnswers, ent, target, entityTotal, false);
+        if (j >= 0 && con[j] < minimal && std::binary_search(type + typeLef, type + typeRig, ent))
+            known++;
     }
+    return known;
+}
 
-    //printf("Triple (%ld, %ld, %ld).\n", h, t, r);
-    //printf("raw Rank: %ld.\n", l_s);
-    //printf("filter Rank: %ld.\n", l_filter_s);
-    //printf("-------\n");
+void addHeadRanks(INT l_s, INT l_filter_s, INT l_s_constrain, INT l_filter_s_constrain, bool type_constrain) {
     if (l_filter_s < 10) l_filter_tot += 1;
     if (l_s < 10) l_tot += 1;
     if (l_filter_s < 3) l3_filter_tot += 1;
@@ -237,18 +194,84 @@ void testHead(REAL *con, INT lastHead, bool type_constrain = false) {
     }
 }
 
+void addTailRanks(INT r_s, INT r_filter_s, INT r_s_constrain, INT r_filter_s_constrain, bool type_constrain) {
+    if (r_filter_s < 10) r_filter_tot += 1;
+    if (r_s < 10) r_tot += 1;
+    if (r_filter_s < 3) r3_filter_tot += 1;
+    if (r_s < 3) r3_tot += 1;
+    if (r_filter_s < 1) r1_filter_tot += 1;
+    if (r_s < 1) r1_tot += 1;
+
+    r_filter_rank += (1+r_filter_s);
+    r_rank += (1+r_s);
+    r_filter_reci_rank += 1.0/(1+r_filter_s);
+    r_reci_rank += 1.0/(1+r_s);
+    
+    if (type_constrain) {
+        if (r_filter_s_constrain < 10) r_filter_tot_constrain += 1;
+        if (r_s_constrain < 10) r_tot_constrain += 1;
+        if (r_filter_s_constrain < 3) r3_filter_tot_constrain += 1;
+        if (r_s_constrain < 3) r3_tot_constrain += 1;
+        if (r_filter_s_constrain < 1) r1_filter_tot_constrain += 1;
+        if (r_s_constrain < 1) r1_tot_constrain += 1;
+
+        r_filter_rank_constrain += (1+r_filter_s_constrain);
+        r_rank_constrain += (1+r_s_constrain);
+        r_filter_reci_rank_constrain += 1.0/(1+r_filter_s_constrain);
+        r_reci_rank_constrain += 1.0/(1+r_s_constrain);
+    }
+}
+
+void setLinkRank(LinkRank *ranks, INT index, INT raw, INT filter, INT raw_constrain, INT filter_constrain) {
+    if (index < 0 || index >= rankTotal)
+        return;
+    ranks[index].raw = raw;
+    ranks[index].filter = filter;
+    ranks[index].raw_constrain = raw_constrain;
+    ranks[index].filter_constrain = filter_constrain;
+}
+
+extern "C"
+void testHead(REAL *con, INT lastHead, bool type_constrain = false) {
+    //printf("lastHead: %ld.\n", lastHead);
+    INT h = testList[lastHead].h;
+    INT t = testList[lastHead].t;
+    INT r = testList[lastHead].r;
+    INT candidateTotal = incrementalSetting ? num_currently_contained_entities : entityTotal;
+
+    REAL minimal = con[0];
+    //printf("lastHead score: %f.\n", con[0]);
+    INT l_s = 0;
+    INT l_filter_s = 0;
+    INT l_s_constrain = 0;
+    INT l_filter_s_constrain = 0;
+
+    if (minimal != INFINITY){
+        l_s = countBetterScores(con, candidateTotal, minimal);
+        l_filter_s = l_s - countKnownHeads(knownAnswers, h, r, t, con, candidateTotal, minimal, incrementalSetting);
+
+        if (type_constrain && !incrementalSetting) {
+            INT lef, rig;
+            findKnownHeads(knownAnswers, r, t, lef, rig);
+            l_s_constrain = countConstrainedScores(con, head_type, head_lef[r], head_rig[r], h, minimal);
+            l_filter_s_constrain = l_s_constrain - countConstrainedKnownAnswers(
+                    con, knownAnswers.byTail, lef, rig, true, head_type, head_lef[r], head_rig[r], h, minimal);
+        }
+    } else {
+        l_s = candidateTotal;
+        l_filter_s = candidateTotal - countKnownHeads(knownAnswers, h, r, t, NULL, candidateTotal, minimal, incrementalSetting);
+    }
+
+    setLinkRank(headRanks, lastHead, l_s, l_filter_s, l_s_constrain, l_filter_s_constrain);
+}
+
 extern "C"
 void testTail(REAL *con, INT lastTail, bool type_constrain = false) {
     INT h = testList[lastTail].h;
     INT t = testList[lastTail].t;
     INT r = testList[lastTail].r;
-    INT filter_offset = -1;
+    INT candidateTotal = incrementalSetting ? num_currently_contained_entities : entityTotal;
 
-    INT lef, rig;
-    if (type_constrain) {
-        lef = tail_lef[r];
-        rig = tail_rig[r];
-    }
     REAL minimal = con[0];
     INT r_s = 0;
     INT r_filter_s = 0;
@@ -256,72 +279,19 @@ void testTail(REAL *con, INT lastTail, bool type_constrain = false) {
     INT r_filter_s_constrain = 0;
     
     if (minimal != INFINITY){
-        if (incrementalSetting){
-            for (INT j = 1; j < num_currently_contained_entities; j++) {
-                REAL value = con[j];
-                if (currently_contained_entities[j + filter_offset] == t)
-                        filter_offset++;
-                    
-                if (value < minimal) {
-                    r_s += 1;
-                    
-                    if (not _find(h, currently_contained_entities[j + filter_offset], r)){
-                        r_filter_s += 1;
-                    }
-                }
-            }
-        } else {
-            for (INT j = 1; j < entityTotal; j++) {
-                REAL value = con[j];
-                if (j + filter_offset == t)
-                        filter_offset++;    
-                    
-                if (value < minimal) {
-                    r_s += 1;                
-
-                    if (not _find(h, j + filter_offset, r)){
-                        r_filter_s += 1;
-                    } else {
-                        // printf("Found: %ld, %ld, %ld.\n", h, j + filter_offset, r);
-                    }
-                }
-                if (type_constrain) {
-                    while (lef < rig && tail_type[lef] < j) lef ++;
-                    if (lef < rig && j == tail_type[lef]) {
-                            if (value < minimal) {
-                                r_s_constrain += 1;
-                                if (not _find(h, j ,r)) {
-                                    r_filter_s_constrain += 1;
-                                }
-                            }
-                    }
-                }
-                
-            }
+        r_s = countBetterScores(con, candidateTotal, minimal);
+        r_filter_s = r_s - countKnownTails(knownAnswers, h, r, t, con, candidateTotal, minimal, incrementalSetting);
+
+        if (type_constrain && !incrementalSetting) {
+            INT lef, rig;
+            findKnownTails(knownAnswers, h, r, lef, rig);
+            r_s_constrain = countConstrainedScores(con, tail_type, tail_lef[r], tail_rig[r], t, minimal);
+            r_filter_s_constrain = r_s_constrain - countConstrainedKnownAnswers(
+                    con, knownAnswers.byHead, lef, rig, false, tail_type, tail_lef[r], tail_rig[r], t, minimal);
         }
     } else {
-        if (incrementalSetting){
-            r_s = num_currently_contained_entities;
-            r_filter_s = num_currently_contained_entities;    
-
-            for (INT j = 1; j < num_currently_contained_entities; j++) {
-                if (currently_contained_entities[j + filter_offset] == t)
-                    filter_offset++;
-                
-                if (_find(h, currently_contained_entities[j + filter_offset], r))
-                    r_filter_s -= 1;
-            }
-        } else {
-            r_s = entityTotal;
-            r_filter_s = entityTotal;
-            for (INT j = 1; j < entityTotal; j++){ 
-                if (j + filter_offset == t)
-                        filter_offset++;
-                
-                if (_find(h, j + filter_offset, r))
-                    r_filter_s -= 1;
-            }
-        }
+        r_s = candidateTotal;
+        r_filter_s = candidateTotal - countKnownTails(knownAnswers, h, r, t, NULL, candidateTotal, minimal, incrementalSetting);
     }
     
     if (incrementalSetting && r_s >= num_currently_contained_entities && lastTail < 10){
@@ -331,33 +301,149 @@ void testTail(REAL *con, INT lastTail, bool type_constrain = false) {
         printf("\n");
     }
 
-    if (r_filter_s < 10) r_filter_tot += 1;
-    if (r_s < 10) r_tot += 1;
-    if (r_filter_s < 3) r3_filter_tot += 1;
-    if (r_s < 3) r3_tot += 1;
-    if (r_filter_s < 1) r1_filter_tot += 1;
-    if (r_s < 1) r1_tot += 1;
+    setLinkRank(tailRanks, lastTail, r_s, r_filter_s, r_s_constrain, r_filter_s_constrain);
+}
 
-    r_filter_rank += (1+r_filter_s);
-    r_rank += (1+r_s);
-    r_filter_reci_rank += 1.0/(1+r_filter_s);
-    r_reci_rank += 1.0/(1+r_s);
-    
-    if (type_constrain) {
-        if (r_filter_s_constrain < 10) r_filter_tot_constrain += 1;
-        if (r_s_constrain < 10) r_tot_constrain += 1;
-        if (r_filter_s_constrain < 3) r3_filter_tot_constrain += 1;
-        if (r_s_constrain < 3) r3_tot_constrain += 1;
-        if (r_filter_s_constrain < 1) r1_filter_tot_constrain += 1;
-        if (r_s_constrain < 1) r1_tot_constrain += 1;
+/*
+batched link prediction: row i of con holds the scores of all entityTotal entities as head (tail)
+of the test triple begin + i, so the test entity itself is scored at con[i * entityTotal + h].
+*/
+
+bool isBatchCandidate(INT ent) {
+    if (ent < 0 || ent >= entityTotal)
+        return false;
+    if (!incrementalSetting)
+        return true;
+    return ent < knownAnswers.entityPositionTotal && knownAnswers.entityPosition[ent] >= 0;
+}
 
-        r_filter_rank_constrain += (1+r_filter_s_constrain);
-        r_rank_constrain += (1+r_s_constrain);
-        r_filter_reci_rank_constrain += 1.0/(1+r_filter_s_constrain);
-        r_reci_rank_constrain += 1.0/(1+r_s_constrain);
+void rankBatchRow(REAL *row, INT h, INT r, INT t, bool head, bool type_constrain,
+                  INT &raw, INT &filter, INT &raw_constrain, INT &filter_constrain) {
+    INT target = head ? h : t;
+    INT candidateTotal = incrementalSetting ? num_currently_contained_entities : entityTotal;
+    REAL minimal = row[target];
+
+    INT lef, rig;
+    Triple *answerList;
+    if (head) {
+        findKnownHeads(knownAnswers, r, t, lef, rig);
+        answerList = knownAnswers.byTail;
+    } else {
+        findKnownTails(knownAnswers, h, r, lef, rig);
+        answerList = knownAnswers.byHead;
+    }
+
+    raw = filter = raw_constrain = filter_constrain = 0;
+    if (minimal == INFINITY) {
+        filter = raw = candidateTotal;
+        for (INT i = lef; i < rig; i++) {
+            INT ent = head ? answerList[i].h : answerList[i].t;
+            if (ent != target && isBatchCandidate(ent))
+                filter--;
+        }
+        return;
+    }
+
+    if (incrementalSetting) {
+        for (INT ent = nextBit(entityBitmap.contained, 0); ent != -1; ent = nextBit(entityBitmap.contained, ent + 1))
+            raw += row[ent] < minimal;
+    } else {
+        // the test entity never scores better than itself, so it does not need to be skipped
+        for (INT i = 0; i < entityTotal; i++)
+            raw += row[i] < minimal;
+    }
+
+    INT *type = head ? head_type : tail_type;
+    INT typeLef = 0, typeRig = 0;
+    bool constrained = type_constrain && !incrementalSetting;
+    if (constrained) {
+        typeLef = head ? head_lef[r] : tail_lef[r];
+        typeRig = head ? head_rig[r] : tail_rig[r];
+        for (INT i = typeLef; i < typeRig; i++) {
+            if (i > typeLef && type[i] == type[i - 1])
+                continue;
+            if (isBatchCandidate(type[i]))
+                raw_constrain += row[type[i]] < minimal;
+        }
+    }
+
+    INT known = 0, known_constrain = 0;
+    for (INT i = lef; i < rig; i++) {
+        INT ent = head ? answerList[i].h : answerList[i].t;
+        if (ent == target || !isBatchCandidate(ent) || !(row[ent] < minimal))
+            continue;
+        known++;
+        if (constrained && std::binary_search(type + typeLef, type + typeRig, ent))
+            known_constrain++;
+    }
+    filter = raw - known;
+    filter_constrain = raw_constrain - known_constrain;
+}
+
+extern "C"
+void getTestTriples(INT *ph, INT *pt, INT *pr, INT begin, INT total) {
+    for (INT i = 0; i < total && begin + i < testTotal; i++) {
+        ph[i] = testList[begin + i].h;
+        pt[i] = testList[begin + i].t;
+        pr[i] = testList[begin + i].r;
     }
 }
 
+struct RankParameter {
+    INT id;
+    INT threads;
+    REAL *con;
+    INT begin;
+    INT batchSize;
+    bool head;
+    bool type_constrain;
+};
+
+void *rankBatch(void *con) {
+    RankParameter *para = (RankParameter *) (con);
+    INT slice = (para->batchSize + para->threads - 1) / para->threads;
+    INT lef = para->id * slice;
+    INT rig = std::min(lef + slice, para->batchSize);
+    LinkRank *ranks = para->head ? headRanks : tailRanks;
+    for (INT i = lef; i < rig; i++) {
+        Triple &triple = testList[para->begin + i];
+        LinkRank &rank = ranks[para->begin + i];
+        rankBatchRow(para->con + i * entityTotal, triple.h, triple.r, triple.t, para->head, para->type_constrain,
+                     rank.raw, rank.filter, rank.raw_constrain, rank.filter_constrain);
+    }
+    return NULL;
+}
+
+// ranks the rows of con on all work threads, every thread takes a contiguous slice of rows.
+void rankBatchRows(REAL *con, INT begin, INT batchSize, bool head, bool type_constrain) {
+    batchSize = std::min(batchSize, std::min(testTotal, rankTotal) - begin);
+    if (batchSize <= 0)
+        return;
+    INT threads = workThreads;
+    RankParameter *para = (RankParameter *) calloc(threads, sizeof(RankParameter));
+    for (INT id = 0; id < threads; id++) {
+        para[id].id = id;
+        para[id].threads = threads;
+        para[id].con = con;
+        para[id].begin = begin;
+        para[id].batchSize = batchSize;
+        para[id].head = head;
+        para[id].type_constrain = type_constrain;
+    }
+    runSamplerPool(rankBatch, para, sizeof(RankParameter), threads);
+    free(para);
+}
+
+extern "C"
+void testHeadBatch(REAL *con, INT begin, INT batchSize, bool type_constrain = false) {
+    rankBatchRows(con, begin, batchSize, true, type_constrain);
+}
+
+extern "C"
+void testTailBatch(REAL *con, INT begin, INT batchSize, bool type_constrain = false) {
+    rankBatchRows(con, begin, batchSize, false, type_constrain);
+}
+
 extern "C"
 void testRel(REAL *con) {
     INT h = testList[lastRel].h;
@@ -395,8 +481,39 @@ void testRel(REAL *con) {
 }
 
 
+void reduceLinkRanks(bool type_constrain) {
+    resetLinkMetrics();
+    for (INT i = 0; i < rankTotal; i++) {
+        LinkRank &head = headRanks[i];
+        LinkRank &tail = tailRanks[i];
+        if (head.raw >= 0)
+            addHeadRanks(head.raw, head.filter, head.raw_constrain, head.filter_constrain, type_constrain);
+        if (tail.raw >= 0)
+            addTailRanks(tail.raw, tail.filter, tail.raw_constrain, tail.filter_constrain, type_constrain);
+    }
+}
+
+// ranks (1 for the best) of the ranked test triples, 0 for the ones that have not been ranked.
+extern "C"
+void getTestLinkRanks(INT *headRank, INT *tailRank, INT total, bool filter = true, bool type_constrain = false) {
+    for (INT i = rankTotal; i < total; i++)
+        headRank[i] = tailRank[i] = 0;
+    for (INT i = 0; i < rankTotal && i < total; i++) {
+        LinkRank &head = headRanks[i];
+        LinkRank &tail = tailRanks[i];
+        if (type_constrain) {
+            headRank[i] = head.raw >= 0 ? 1 + (filter ? head.filter_constrain : head.raw_constrain) : 0;
+            tailRank[i] = tail.raw >= 0 ? 1 + (filter ? tail.filter_constrain : tail.raw_constrain) : 0;
+        } else {
+            headRank[i] = head.raw >= 0 ? 1 + (filter ? head.filter : head.raw) : 0;
+            tailRank[i] = tail.raw >= 0 ? 1 + (filter ? tail.filter : tail.raw) : 0;
+        }
+    }
+}
+
 extern "C"
 void test_link_prediction(bool type_constrain = false) {
+    reduceLinkRanks(type_constrain);
     printf("Test Total is: %ld.\n", testTotal);
     printf("Triple Total is: %ld.\n", tripleTotal);
     if (incrementalSetting)
@@ -576,12 +693,13 @@ extern "C"
 void getNegTest() {
     if (negTestList == NULL)
         negTestList = (Triple *)calloc(testTotal, sizeof(Triple));
+    syncGlobalSamplerContext();
     for (INT i = 0; i < testTotal; i++) {
         negTestList[i] = testList[i];
         if (randd(0) % 1000 < 500)
-            negTestList[i].t = corrupt_head(0, testList[i].h, testList[i].r);
+            negTestList[i].t = corrupt_head(globalSamplerContext, 0, testList[i].h, testList[i].r);
         else
-            negTestList[i].h = corrupt_tail(0, testList[i].t, testList[i].r);
+            negTestList[i].h = corrupt_tail(globalSamplerContext, 0, testList[i].t, testList[i].r);
     }
 }
 
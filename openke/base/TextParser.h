@@ -0,0 +1,178 @@
+/*
+MIT License
+
+Copyright (c) 2020 Rashid Lafraie
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+*/
+
+#ifndef TEXTPARSER_H
+#define TEXTPARSER_H
+
+#include "Setting.h"
+#include "Triple.h"
+#include "SamplerPool.h"
+#include <cstdlib>
+#include <cstring>
+#include <string>
+
+/*
+===================== Parallel parsing of the dataset text files =========================
+*/
+
+// A file is read with a single fread and split into workThreads chunks at line boundaries. The
+// sampler pool first counts the integers in every chunk and then parses each chunk into its
+// slice of the output array.
+
+struct ParseChunk {
+    char *begin;
+    char *end;
+    INT *values;
+    INT valueTotal;
+    bool count;
+};
+
+// Bytes parsed by the text parser since the last reset, for throughput measurements.
+INT parsedBytes = 0;
+double parseTime = 0;
+
+char *readWholeFile(const std::string &path, INT &size) {
+    FILE *fin = fopen(path.c_str(), "rb");
+    if (fin == NULL) {
+        printf("Cannot open %s.\n", path.c_str());
+        size = 0;
+        return NULL;
+    }
+    fseek(fin, 0, SEEK_END);
+    size = ftell(fin);
+    fseek(fin, 0, SEEK_SET);
+    char *buffer = (char *) malloc(size + 1);
+    size = fread(buffer, 1, size, fin);
+    buffer[size] = '\0';
+    fclose(fin);
+    return buffer;
+}
+
+// Number of '\n' in the file, same as getLineNum.
+INT countFileLines(const std::string &path) {
+    INT size;
+    char *buffer = readWholeFile(path, size);
+    INT lines = 0;
+    for (char *c = buffer; c != NULL && (c = (char *) memchr(c, '\n', buffer + size - c)) != NULL; c++)
+        lines++;
+    free(buffer);
+    return lines;
+}
+
+void *parseChunk(void *con) {
+    ParseChunk *chunk = (ParseChunk *) con;
+    INT valueTotal = 0;
+    char *c = chunk->begin;
+    while (c < chunk->end) {
+        while (c < chunk->end && !((*c >= '0' && *c <= '9') || *c == '-'))
+            c++;
+        if (c >= chunk->end)
+            break;
+        bool negative = (*c == '-');
+        if (negative)
+            c++;
+        INT value = 0;
+        while (c < chunk->end && *c >= '0' && *c <= '9')
+            value = value * 10 + (*c++ - '0');
+        if (!chunk->count)
+            chunk->values[valueTotal] = negative ? -value : value;
+        valueTotal++;
+    }
+    chunk->valueTotal = valueTotal;
+    return NULL;
+}
+
+// Parses all whitespace separated integers of the file, valueTotal is set to their number.
+INT *parseIntegerFile(const std::string &path, INT &valueTotal) {
+    double start = getMonotonicTime();
+    INT size;
+    char *buffer = readWholeFile(path, size);
+    valueTotal = 0;
+    if (buffer == NULL)
+        return NULL;
+
+    INT threads = workThreads;
+    ParseChunk *chunks = (ParseChunk *) calloc(threads, sizeof(ParseChunk));
+    char *begin = buffer;
+    for (INT i = 0; i < threads; i++) {
+        char *end = (i == threads - 1) ? buffer + size : buffer + size * (i + 1) / threads;
+        if (end < begin)
+            end = begin;
+        while (end < buffer + size && *end != '\n')
+            end++;
+        chunks[i].begin = begin;
+        chunks[i].end = end;
+        chunks[i].count = true;
+        begin = end;
+    }
+    runSamplerPool(parseChunk, (void *) chunks, sizeof(ParseChunk), threads);
+
+    for (INT i = 0; i < threads; i++)
+        valueTotal += chunks[i].valueTotal;
+    INT *values = (INT *) calloc(valueTotal + 1, sizeof(INT));
+    INT offset = 0;
+    for (INT i = 0; i < threads; i++) {
+        chunks[i].values = values + offset;
+        chunks[i].count = false;
+        offset += chunks[i].valueTotal;
+    }
+    runSamplerPool(parseChunk, (void *) chunks, sizeof(ParseChunk), threads);
+
+    free(chunks);
+    free(buffer);
+    parsedBytes += size;
+    parseTime += getMonotonicTime() - start;
+    return values;
+}
+
+// Reads a file of "h t r" lines, returns the number of triples.
+INT readTripleFile(const std::string &path, Triple *&list) {
+    INT valueTotal;
+    INT *values = parseIntegerFile(path, valueTotal);
+    INT total = valueTotal / 3;
+    list = (Triple *) calloc(total, sizeof(Triple));
+    for (INT i = 0; i < total; i++) {
+        list[i].h = values[3 * i];
+        list[i].t = values[3 * i + 1];
+        list[i].r = values[3 * i + 2];
+    }
+    free(values);
+    return total;
+}
+
+extern "C"
+void resetParseStats() {
+    parsedBytes = 0;
+    parseTime = 0;
+}
+
+// Parse throughput of the text parser in MB/s since the last reset.
+extern "C"
+REAL getParseThroughput() {
+    if (parseTime == 0)
+        return 0;
+    return parsedBytes / 1048576.0 / parseTime;
+}
+
+#endif
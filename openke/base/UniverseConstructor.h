@@ -31,7 +31,8 @@ SOFTWARE.
 #include "Random.h"
 #include "UniverseSetting.h"
 #include <cstdlib>
-#include <set>
+#include <cstring>
+#include <vector>
 #include <algorithm>
 #include <iostream>
 #include <cmath>
@@ -52,66 +53,126 @@ INT gatherTripleFromTail(INT entity, INT &new_head, INT &new_rel, INT &new_tail)
     return new_head;
 }
 
-std::set<INT> get_entity_subset(std::set<INT> entity_set, INT semantic_threshold) {
-    std::set<INT> entity_subset;
-    std::set<INT>::iterator random_entity;
-    INT num_sub = 0;
+void sortUnique(std::vector<INT> &entities) {
+    std::sort(entities.begin(), entities.end());
+    entities.erase(std::unique(entities.begin(), entities.end()), entities.end());
+}
+
+std::vector<INT> get_entity_subset(std::vector<INT> entity_set, INT semantic_threshold) {
+    std::vector<INT> entity_subset;
     while (entity_subset.size() < semantic_threshold) {
-        random_entity = entity_set.begin();
-        std::advance(random_entity, rand() % entity_set.size());
-        entity_subset.insert(*random_entity);
-        entity_set.erase(random_entity);
+        INT random_entity = rand(0, entity_set.size());
+        entity_subset.push_back(entity_set[random_entity]);
+        entity_set.erase(entity_set.begin() + random_entity);
     }
-
+    std::sort(entity_subset.begin(), entity_subset.end());
     return entity_subset;
 }
 
-std::set<INT> gatherRelationEntities(INT relation) {
+// sorted entities which occur with the relation
+std::vector<INT> gatherRelationEntities(INT relation) {
     printf("Gather entities which occur with relation %ld.\n", relation);
     INT left_index = lefRel2[relation];
     INT right_index = rigRel2[relation];
-    std::set<INT> entity_set;
-    for (int idx = left_index; idx < right_index + 1; idx++) {
+    std::vector<INT> entity_set;
+    for (INT idx = left_index; idx < right_index + 1; idx++) {
         // exclude deleted triples here
-        entity_set.insert(trainRel2[idx].h);
-        entity_set.insert(trainRel2[idx].t);
+        entity_set.push_back(trainRel2[idx].h);
+        entity_set.push_back(trainRel2[idx].t);
     }
+    sortUnique(entity_set);
     return entity_set;
 }
 
-bool checkDuplicate(INT head, INT rel, INT tail, INT last_index) {
-    for (int i = 0; i < last_index; i++) {
-        if (head == trainListUniverse[i].h && rel == trainListUniverse[i].r &&
-            tail == trainListUniverse[i].t) {
+/*
+===================== State of the random walk =========================
+*/
+
+// Open addressing set of the triples gathered by the walk. A triple is stored as the key
+// (h * relationTotal + r) * entityTotal + t and probed linearly from the hash of its key.
+const unsigned long long EMPTY_WALK_TRIPLE = ~0ULL;
+unsigned long long *walkTriples = NULL;
+INT walkTripleCapacity = 0;
+
+// walkEntityStamp[e] == walkStamp iff entity e occurs in a triple of the current walk, likewise
+// for relations. Bumping walkStamp clears both arrays for the next walk.
+INT *walkEntityStamp = NULL;
+INT *walkRelationStamp = NULL;
+INT walkEntityStampTotal = 0;
+INT walkRelationStampTotal = 0;
+INT walkStamp = 0;
+
+void resetWalkTriples(INT triple_constraint) {
+    INT capacity = 16;
+    while (capacity < 2 * triple_constraint)
+        capacity <<= 1;
+    if (capacity != walkTripleCapacity) {
+        free(walkTriples);
+        walkTriples = (unsigned long long *) malloc(capacity * sizeof(unsigned long long));
+        walkTripleCapacity = capacity;
+    }
+    memset(walkTriples, 0xff, capacity * sizeof(unsigned long long));
+}
+
+// Adds the triple to the walk and returns false if it has already been gathered.
+bool insertWalkTriple(INT head, INT rel, INT tail) {
+    unsigned long long key = ((unsigned long long) head * relationTotal + rel) * entityTotal + tail;
+    INT mask = walkTripleCapacity - 1;
+    for (INT slot = mixBits(key) & mask;; slot = (slot + 1) & mask) {
+        if (walkTriples[slot] == EMPTY_WALK_TRIPLE) {
+            walkTriples[slot] = key;
             return true;
         }
+        if (walkTriples[slot] == key)
+            return false;
     }
-    return false;
 }
 
-void BidirectionalRandomWalk(std::set<INT> entity_set) {
+void ensureWalkStamps(INT *&stamps, INT &stampTotal, INT total) {
+    if (stampTotal >= total)
+        return;
+    stamps = (INT *) realloc(stamps, total * sizeof(INT));
+    memset(stamps + stampTotal, 0, (total - stampTotal) * sizeof(INT));
+    stampTotal = total;
+}
+
+// Marks the element for the current walk and returns whether it was new.
+bool markWalkElement(INT *stamps, INT element) {
+    if (stamps[element] == walkStamp)
+        return false;
+    stamps[element] = walkStamp;
+    return true;
+}
+
+// entity_set is sorted. A round visits the entities of entity_set in order. The next round starts
+// from the (sorted) entities reached in this round and the entities the previous round left over.
+void BidirectionalRandomWalk(std::vector<INT> entity_set) {
     INT universe_index = 0;
     INT num_round = 0;
     INT current_entity = -1;
-    INT gathered_triples = 0;
 
     INT last_duplicate_entity = -1;
     INT iter_duplicate_gathering_tolerance = 5;
-    bool duplicate = false;
     
     INT iter_triple_set_not_increasing_tolerance = 20;
     INT last_triple_set_size = 0;
 
-    std::set<INT> new_starting_points;
-    std::set<INT> universe_entities;
-    std::set<INT> universe_relations;
+    std::vector<INT> new_starting_points;
+    std::vector<INT> left_over_entities;
+    INT universe_entities = 0;
+    INT universe_relations = 0;
+
+    resetWalkTriples(trainTotalUniverse);
+    ensureWalkStamps(walkEntityStamp, walkEntityStampTotal, entityTotal);
+    ensureWalkStamps(walkRelationStamp, walkRelationStampTotal, relationTotal);
+    walkStamp++;
 
     REAL prob = 500;
     while (universe_index < trainTotalUniverse) {
         // printf("Gathered triples: %ld.\n", universe_index);
-        for (std::set<INT>::iterator it = entity_set.begin();
-             it != entity_set.end() && universe_index < trainTotalUniverse;) {
-            current_entity = *it;
+        size_t it = 0;
+        while (it < entity_set.size() && universe_index < trainTotalUniverse) {
+            current_entity = entity_set[it];
 
             INT new_head = 0;
             INT new_rel = 0;
@@ -119,7 +180,7 @@ void BidirectionalRandomWalk(std::set<INT> entity_set) {
             INT new_starting_entity = -1;
 
             // Determine if gather triple with entity as head or as tail
-            if (rand() % 1000 < prob) {
+            if (rand(0, 1000) < prob) {
                 if (rigHead[current_entity] != -1) {
                     new_starting_entity = gatherTripleFromHead(current_entity, new_head, new_rel, new_tail);
                 } else if (rigTail[current_entity] != -1) {
@@ -138,8 +199,7 @@ void BidirectionalRandomWalk(std::set<INT> entity_set) {
             }
 
             //check whether gathered triple was already collected
-            if (checkDuplicate(new_head, new_rel, new_tail, universe_index)) {
-                duplicate = false;
+            if (not insertWalkTriple(new_head, new_rel, new_tail)) {
                 if (last_duplicate_entity == current_entity) {
                     iter_duplicate_gathering_tolerance--;
                 } else {
@@ -147,6 +207,7 @@ void BidirectionalRandomWalk(std::set<INT> entity_set) {
                 }
                 if (iter_duplicate_gathering_tolerance == 0) {
                     iter_duplicate_gathering_tolerance = 5;
+                    left_over_entities.push_back(current_entity);
                     it++;
                 }
                 // printf("Continue \n");
@@ -156,18 +217,22 @@ void BidirectionalRandomWalk(std::set<INT> entity_set) {
             trainListUniverse[universe_index].h = new_head;
             trainListUniverse[universe_index].r = new_rel;
             trainListUniverse[universe_index].t = new_tail;
-            gathered_triples += 1;
 
-            new_starting_points.insert(new_starting_entity);
-            universe_entities.insert(new_tail);
-            universe_entities.insert(new_head);
-            universe_relations.insert(new_rel);
+            new_starting_points.push_back(new_starting_entity);
+            universe_entities += markWalkElement(walkEntityStamp, new_tail);
+            universe_entities += markWalkElement(walkEntityStamp, new_head);
+            universe_relations += markWalkElement(walkRelationStamp, new_rel);
 
-            entity_set.erase(it++);
+            it++;
             universe_index++;
 
         }
+        left_over_entities.insert(left_over_entities.end(), entity_set.begin() + it, entity_set.end());
+
+        sortUnique(new_starting_points);
         entity_set.swap(new_starting_points);
+        new_starting_points.swap(left_over_entities);
+        left_over_entities.clear();
         num_round++;
 
         // Check if triple set still grows
@@ -186,22 +251,49 @@ void BidirectionalRandomWalk(std::set<INT> entity_set) {
         }
     }
     // set number of entities and relations in universe
-    entityTotalUniverse = universe_entities.size();
-    relationTotalUniverse = universe_relations.size();
+    entityTotalUniverse = universe_entities;
+    relationTotalUniverse = universe_relations;
 }
 
-void enumerateTrainUniverseTriples() {
-    callocTripleArray(trainListUniverseEnum, trainTotalUniverse);
+// universeEntityMapping[e] is the universe id of entity e or -1, likewise for relations. Only the
+// entries of the current universe are set and they are cleared again after the enumeration.
+INT *universeEntityMapping = NULL;
+INT *universeRelationMapping = NULL;
+INT universeEntityMappingTotal = 0;
+INT universeRelationMappingTotal = 0;
+
+void ensureUniverseMapping(INT *&mapping, INT &mappingTotal, INT total) {
+    if (mappingTotal >= total)
+        return;
+    mapping = (INT *) realloc(mapping, total * sizeof(INT));
+    memset(mapping + mappingTotal, -1, (total - mappingTotal) * sizeof(INT));
+    mappingTotal = total;
+}
+
+// Bytes of the arena used by a universe of at most triple_constraint triples.
+size_t getUniverseArenaBytes(INT triple_constraint) {
+    INT entities = std::min(entityTotal, 2 * triple_constraint);
+    INT relations = std::min(relationTotal, triple_constraint);
+    // trainListUniverse, trainListUniverseEnum, the four sorted helpers and two sort buffers
+    return 8 * universeArraySize<Triple>(triple_constraint) +
+           // freqEnt, lef/rig of Head, Tail and Rel, entity_remapping and the head and tail offsets
+           8 * universeArraySize<INT>(entities) + 2 * universeArraySize<INT>(entities + 1) +
+           // freqRel, lef/rig of Rel2, relation_remapping and the relation offsets
+           4 * universeArraySize<INT>(relations) + universeArraySize<INT>(relations + 1) +
+           // the sort cursor
+           universeArraySize<INT>(std::max(entities, relations)) +
+           2 * universeArraySize<REAL>(relations);
+}
 
-    INT *entity_mapping = (INT *) calloc(entityTotal, sizeof(INT));
-    INT *relation_mapping = (INT *) calloc(relationTotal, sizeof(INT));
-    memset(entity_mapping, -1, sizeof(INT) * entityTotal);
-    memset(relation_mapping, -1, sizeof(INT) * relationTotal);
+void enumerateTrainUniverseTriples() {
+    trainListUniverseEnum = allocUniverseArray<Triple>(trainTotalUniverse);
+    entity_remapping = allocUniverseArray<INT>(entityTotalUniverse);
+    relation_remapping = allocUniverseArray<INT>(relationTotalUniverse);
 
-    callocIntArray(entity_remapping, entityTotal);
-    callocIntArray(relation_remapping, relationTotal);
-    memset(entity_remapping, -1, sizeof(INT) * entityTotal);
-    memset(relation_remapping, -1, sizeof(INT) * relationTotal);
+    ensureUniverseMapping(universeEntityMapping, universeEntityMappingTotal, entityTotal);
+    ensureUniverseMapping(universeRelationMapping, universeRelationMappingTotal, relationTotal);
+    INT *entity_mapping = universeEntityMapping;
+    INT *relation_mapping = universeRelationMapping;
 
     INT next_entity_id = 0;
     INT next_relation_id = 0;
@@ -230,95 +322,115 @@ void enumerateTrainUniverseTriples() {
         }
         trainListUniverseEnum[i].r = relation_mapping[trainListUniverse[i].r];
     }
-}
-
-void loadUniverseHelpers() {
-    std::sort(trainListUniverseEnum, trainListUniverseEnum + trainTotalUniverse, Triple::cmp_head);
 
-    callocTripleArray(trainHeadUniverse, trainTotal);
-    callocTripleArray(trainTailUniverse, trainTotal);
-    callocTripleArray(trainRelUniverse, trainTotal);
-    callocTripleArray(trainRel2Universe, trainTotal);
+    for (INT i = 0; i < next_entity_id; i++)
+        entity_mapping[entity_remapping[i]] = -1;
+    for (INT i = 0; i < next_relation_id; i++)
+        relation_mapping[relation_remapping[i]] = -1;
+}
 
-    callocIntArray(freqEntUniverse, entityTotal);
-    callocIntArray(freqRelUniverse, relationTotal);
+// Stable counting sort of source into target by one element of the triples. offset[k] is the
+// first position of the triples with element k in target.
+void countingSortTriples(Triple *source, Triple *target, INT total, INT Triple::*element,
+                         INT *offset, INT *cursor, INT keyTotal) {
+    memcpy(cursor, offset, keyTotal * sizeof(INT));
+    for (INT i = 0; i < total; i++)
+        target[cursor[source[i].*element]++] = source[i];
+}
 
-    trainHeadUniverse[0] = trainTailUniverse[0] = trainRelUniverse[0] = trainRel2Universe[0] = trainListUniverseEnum[0];
-    freqEntUniverse[trainListUniverseEnum[0].t] += 1;
-    freqEntUniverse[trainListUniverseEnum[0].h] += 1;
-    freqRelUniverse[trainListUniverseEnum[0].r] += 1;
+// offset becomes the exclusive prefix sum of count (keyTotal + 1 entries), lef/rig the range of
+// every key or 0/-1 if the key does not occur. count may be the same array as lef.
+void loadUniverseRanges(INT *count, INT *offset, INT *lef, INT *rig, INT keyTotal) {
+    offset[0] = 0;
+    for (INT k = 0; k < keyTotal; k++) {
+        INT keyCount = count[k];
+        offset[k + 1] = offset[k] + keyCount;
+        lef[k] = keyCount > 0 ? offset[k] : 0;
+        rig[k] = keyCount > 0 ? offset[k + 1] - 1 : -1;
+    }
+}
 
-    for (INT i = 1; i < trainTotalUniverse; i++) {
-        trainHeadUniverse[i] = trainTailUniverse[i] = trainRelUniverse[i] = trainRel2Universe[i] = trainListUniverseEnum[i];
-        freqEntUniverse[trainListUniverseEnum[i].t]++;
-        freqEntUniverse[trainListUniverseEnum[i].h]++;
+// The universe ids are dense (see enumerateTrainUniverseTriples), so the four orders of the
+// helpers are built by counting sorts over the universe's entities and relations. Every order is
+// the stable sort of a one-element sort by two more elements:
+//   head (h,r,t) and rel2 (r,h,t) from the sort by t, tail (t,r,h) from the sort by h
+//   and rel (h,t,r) from the sort by r.
+void loadUniverseHelpers() {
+    INT total = trainTotalUniverse;
+    INT entities = entityTotalUniverse;
+    INT relations = relationTotalUniverse;
+
+    trainHeadUniverse = allocUniverseArray<Triple>(total);
+    trainTailUniverse = allocUniverseArray<Triple>(total);
+    trainRelUniverse = allocUniverseArray<Triple>(total);
+    trainRel2Universe = allocUniverseArray<Triple>(total);
+    Triple *sorted = allocUniverseArray<Triple>(total);
+    Triple *sorted2 = allocUniverseArray<Triple>(total);
+
+    freqEntUniverse = allocUniverseArray<INT>(entities);
+    freqRelUniverse = allocUniverseArray<INT>(relations);
+    lefHeadUniverse = allocUniverseArray<INT>(entities);
+    rigHeadUniverse = allocUniverseArray<INT>(entities);
+    lefTailUniverse = allocUniverseArray<INT>(entities);
+    rigTailUniverse = allocUniverseArray<INT>(entities);
+    lefRelUniverse = allocUniverseArray<INT>(entities);
+    rigRelUniverse = allocUniverseArray<INT>(entities);
+    lefRel2Universe = allocUniverseArray<INT>(relations);
+    rigRel2Universe = allocUniverseArray<INT>(relations);
+    INT *headOffset = allocUniverseArray<INT>(entities + 1);
+    INT *tailOffset = allocUniverseArray<INT>(entities + 1);
+    INT *relOffset = allocUniverseArray<INT>(relations + 1);
+    INT *cursor = allocUniverseArray<INT>(std::max(entities, relations));
+    left_meanUniverse = allocUniverseArray<REAL>(relations);
+    right_meanUniverse = allocUniverseArray<REAL>(relations);
+
+    // the counts of heads and tails are kept in the lef arrays until the offsets are built
+    memset(lefHeadUniverse, 0, entities * sizeof(INT));
+    memset(lefTailUniverse, 0, entities * sizeof(INT));
+    memset(freqRelUniverse, 0, relations * sizeof(INT));
+    for (INT i = 0; i < total; i++) {
+        lefHeadUniverse[trainListUniverseEnum[i].h]++;
+        lefTailUniverse[trainListUniverseEnum[i].t]++;
         freqRelUniverse[trainListUniverseEnum[i].r]++;
     }
-    std::sort(trainHeadUniverse, trainHeadUniverse + trainTotalUniverse, Triple::cmp_head);
-    std::sort(trainTailUniverse, trainTailUniverse + trainTotalUniverse, Triple::cmp_tail);
-    std::sort(trainRelUniverse, trainRelUniverse + trainTotalUniverse, Triple::cmp_rel);
-    std::sort(trainRel2Universe, trainRel2Universe + trainTotalUniverse, Triple::cmp_rel2);
-
-    callocIntArray(lefHeadUniverse, entityTotal);
-    callocIntArray(rigHeadUniverse, entityTotal);
-    callocIntArray(lefTailUniverse, entityTotal);
-    callocIntArray(rigTailUniverse, entityTotal);
-    callocIntArray(lefRelUniverse, entityTotal);
-    callocIntArray(rigRelUniverse, entityTotal);
-    callocIntArray(lefRel2Universe, relationTotal);
-    callocIntArray(rigRel2Universe, relationTotal);
-
-    memset(rigHeadUniverse, -1, sizeof(INT) * entityTotalUniverse);
-    memset(rigTailUniverse, -1, sizeof(INT) * entityTotalUniverse);
-    memset(rigRelUniverse, -1, sizeof(INT) * entityTotalUniverse);
-    memset(rigRel2Universe, -1, sizeof(INT) * relationTotalUniverse);
-
-    for (INT i = 1; i < trainTotalUniverse; i++) {
-        if (trainTailUniverse[i].t != trainTailUniverse[i - 1].t) {
-            rigTailUniverse[trainTailUniverse[i - 1].t] = i - 1;
-            lefTailUniverse[trainTailUniverse[i].t] = i;
-        }
-        if (trainHeadUniverse[i].h != trainHeadUniverse[i - 1].h) {
-            rigHeadUniverse[trainHeadUniverse[i - 1].h] = i - 1;
-            lefHeadUniverse[trainHeadUniverse[i].h] = i;
-        }
-        if (trainRelUniverse[i].h != trainRelUniverse[i - 1].h) {
-            rigRelUniverse[trainRelUniverse[i - 1].h] = i - 1;
-            lefRelUniverse[trainRelUniverse[i].h] = i;
-        }
-        if (trainRel2Universe[i].r != trainRel2Universe[i - 1].r) {
-            rigRel2Universe[trainRel2Universe[i - 1].r] = i - 1;
-            lefRel2Universe[trainRel2Universe[i].r] = i;
-        }
-    }
-
-    lefHeadUniverse[trainHeadUniverse[0].h] = 0;
-    rigHeadUniverse[trainHeadUniverse[trainTotalUniverse - 1].h] = trainTotalUniverse - 1;
-    lefTailUniverse[trainTailUniverse[0].t] = 0;
-    rigTailUniverse[trainTailUniverse[trainTotalUniverse - 1].t] = trainTotalUniverse - 1;
-    lefRelUniverse[trainRelUniverse[0].h] = 0;
-    rigRelUniverse[trainRelUniverse[trainTotalUniverse - 1].h] = trainTotalUniverse - 1;
-    lefRel2Universe[trainRel2Universe[0].r] = 0;
-    rigRel2Universe[trainRel2Universe[trainTotalUniverse - 1].r] = trainTotalUniverse - 1;
-
-    callocRealArray(left_meanUniverse, relationTotal);
-    callocRealArray(right_meanUniverse, relationTotal);
-
-    for (INT i = 0; i < entityTotalUniverse; i++) {
-        for (INT j = lefHeadUniverse[i] + 1; j <= rigHeadUniverse[i]; j++) {
-            if (trainHeadUniverse[j].r != trainHeadUniverse[j - 1].r)
-                left_meanUniverse[trainHeadUniverse[j].r] += 1.0;
-        }
-        if (lefHeadUniverse[i] <= rigHeadUniverse[i])
-            left_meanUniverse[trainHeadUniverse[lefHeadUniverse[i]].r] += 1.0;
-        for (INT j = lefTailUniverse[i] + 1; j <= rigTailUniverse[i]; j++) {
-            if (trainTailUniverse[j].r != trainTailUniverse[j - 1].r)
-                right_meanUniverse[trainTailUniverse[j].r] += 1.0;
-        }
-        if (lefTailUniverse[i] <= rigTailUniverse[i])
-            right_meanUniverse[trainTailUniverse[lefTailUniverse[i]].r] += 1.0;
+    for (INT i = 0; i < entities; i++)
+        freqEntUniverse[i] = lefHeadUniverse[i] + lefTailUniverse[i];
+    memcpy(lefRel2Universe, freqRelUniverse, relations * sizeof(INT));
+
+    loadUniverseRanges(lefHeadUniverse, headOffset, lefHeadUniverse, rigHeadUniverse, entities);
+    loadUniverseRanges(lefTailUniverse, tailOffset, lefTailUniverse, rigTailUniverse, entities);
+    loadUniverseRanges(lefRel2Universe, relOffset, lefRel2Universe, rigRel2Universe, relations);
+    memcpy(lefRelUniverse, lefHeadUniverse, entities * sizeof(INT));
+    memcpy(rigRelUniverse, rigHeadUniverse, entities * sizeof(INT));
+
+    countingSortTriples(trainListUniverseEnum, sorted, total, &Triple::t, tailOffset, cursor, entities);
+    countingSortTriples(sorted, sorted2, total, &Triple::r, relOffset, cursor, relations);
+    countingSortTriples(sorted2, trainHeadUniverse, total, &Triple::h, headOffset, cursor, entities);
+    countingSortTriples(sorted, sorted2, total, &Triple::h, headOffset, cursor, entities);
+    countingSortTriples(sorted2, trainRel2Universe, total, &Triple::r, relOffset, cursor, relations);
+
+    countingSortTriples(trainListUniverseEnum, sorted, total, &Triple::h, headOffset, cursor, entities);
+    countingSortTriples(sorted, sorted2, total, &Triple::r, relOffset, cursor, relations);
+    countingSortTriples(sorted2, trainTailUniverse, total, &Triple::t, tailOffset, cursor, entities);
+
+    countingSortTriples(trainListUniverseEnum, sorted, total, &Triple::r, relOffset, cursor, relations);
+    countingSortTriples(sorted, sorted2, total, &Triple::t, tailOffset, cursor, entities);
+    countingSortTriples(sorted2, trainRelUniverse, total, &Triple::h, headOffset, cursor, entities);
+
+    // the training triples of the universe are sampled in head order
+    memcpy(trainListUniverseEnum, trainHeadUniverse, total * sizeof(Triple));
+
+    memset(left_meanUniverse, 0, relations * sizeof(REAL));
+    memset(right_meanUniverse, 0, relations * sizeof(REAL));
+    for (INT i = 0; i < total; i++) {
+        if (i == 0 || trainHeadUniverse[i].h != trainHeadUniverse[i - 1].h ||
+            trainHeadUniverse[i].r != trainHeadUniverse[i - 1].r)
+            left_meanUniverse[trainHeadUniverse[i].r] += 1.0;
+        if (i == 0 || trainTailUniverse[i].t != trainTailUniverse[i - 1].t ||
+            trainTailUniverse[i].r != trainTailUniverse[i - 1].r)
+            right_meanUniverse[trainTailUniverse[i].r] += 1.0;
     }
-    for (INT i = 0; i < relationTotalUniverse; i++) {
+    for (INT i = 0; i < relations; i++) {
         left_meanUniverse[i] = freqRelUniverse[i] / left_meanUniverse[i];
         right_meanUniverse[i] = freqRelUniverse[i] / right_meanUniverse[i];
     }
@@ -330,7 +442,8 @@ void getParallelUniverse(
         REAL balance_parameter
 ) {
     trainTotalUniverse = triple_constraint;
-    callocTripleArray(trainListUniverse, trainTotalUniverse);
+    reserveUniverseArena(getUniverseArenaBytes(triple_constraint));
+    trainListUniverse = allocUniverseArray<Triple>(trainTotalUniverse);
 
     INT relation_focus;
     if(incrementalSetting){
@@ -346,7 +459,7 @@ void getParallelUniverse(
             balance_parameter * triple_constraint; // calculate threshold for selection of relevant entities
 
     //Gather entities for semantic focus
-    std::set<INT> entity_set = gatherRelationEntities(relation_focus);
+    std::vector<INT> entity_set = gatherRelationEntities(relation_focus);
 
     // pick random subset if len(entity_set) > semantic_threshold
     if (entity_set.size() > semantic_threshold) {
@@ -368,6 +481,7 @@ void getParallelUniverse(
 
     printf("Initialize helper arrays. \n");
     loadUniverseHelpers();
+    resetCorruptIndex(corruptIndexUniverse);
     // loadHelpers(
     //         trainListUniverseEnum,
     //         trainHeadUniverse,
@@ -57,6 +57,56 @@ Triple *trainRel2Universe;
 
 INT *entity_remapping, *relation_remapping;
 
+CorruptIndex corruptIndexUniverse = {NULL, NULL, NULL, NULL, 0, 0, false};
+
+/*
+======================= Arena ===================
+*/
+
+// The arrays of a universe are carved from one block which is kept from universe to universe and
+// only grows with the largest universe. The block is registered in mappedDatasets, hence resetting
+// the helpers of a universe or swapping them into the training data never frees or reallocs it.
+char *universeArena = NULL;
+size_t universeArenaCapacity = 0;
+size_t universeArenaUsed = 0;
+
+template<typename T>
+size_t universeArraySize(INT length) {
+    return (length * sizeof(T) + 15) & ~(size_t) 15;
+}
+
+// Releases the arrays of the previous universe and makes room for bytes of new arrays.
+void reserveUniverseArena(size_t bytes) {
+    universeArenaUsed = 0;
+    if (bytes <= universeArenaCapacity)
+        return;
+    for (size_t i = 0; i < mappedDatasets.size(); i++)
+        if (mappedDatasets[i].first == universeArena) {
+            mappedDatasets.erase(mappedDatasets.begin() + i);
+            break;
+        }
+    free(universeArena);
+    universeArena = (char *) malloc(bytes);
+    if (!universeArena) {
+        printf("out of mem\n");
+        exit(EXIT_FAILURE);
+    }
+    universeArenaCapacity = bytes;
+    mappedDatasets.push_back(std::make_pair(universeArena, bytes));
+}
+
+template<typename T>
+T *allocUniverseArray(INT length) {
+    size_t bytes = universeArraySize<T>(length);
+    if (universeArenaUsed + bytes > universeArenaCapacity) {
+        printf("Universe arena exhausted.\n");
+        exit(EXIT_FAILURE);
+    }
+    T *arr = (T *) (universeArena + universeArenaUsed);
+    universeArenaUsed += bytes;
+    return arr;
+}
+
 /*
 ======================= Getter ===================
 */
@@ -142,6 +192,8 @@ void swapHelpers() {
     swapTripleArray(trainTailUniverse, trainTail);
     swapTripleArray(trainRelUniverse, trainRel);
     swapTripleArray(trainRel2Universe, trainRel2);
+
+    std::swap(corruptIndexUniverse, corruptIndex);
     
     swapInt(entityTotalUniverse, entityTotal);
     swapInt(relationTotalUniverse, relationTotal);
@@ -187,6 +239,8 @@ void resetUniverse() {
 
     resetRealHelper(left_meanUniverse);
     resetRealHelper(right_meanUniverse);
+
+    resetCorruptIndex(corruptIndexUniverse);
 }
 
 /*
@@ -26,10 +26,24 @@ SOFTWARE.
 #define UTILITIES_H
 #include "Utilities.h"
 #include "Triple.h"
+#include <vector>
+#include <utility>
 /*
 ================== Utility functions ==========================
 */
 
+// Regions of binary datasets mapped into memory (see BinaryDataset.h) and the arena of the
+// universe helpers (see UniverseSetting.h). Helper arrays pointing into such a region must not be
+// passed to realloc or free.
+std::vector<std::pair<char *, size_t> > mappedDatasets;
+
+bool isMapped(void *arr) {
+    for (size_t i = 0; i < mappedDatasets.size(); i++)
+        if ((char *) arr >= mappedDatasets[i].first && (char *) arr < mappedDatasets[i].first + mappedDatasets[i].second)
+            return true;
+    return false;
+}
+
 bool isEqual(const char *string1, const char *string2) {
     return strcmp(string1, string2) == 0;
 }
@@ -58,7 +72,7 @@ INT getLineNum(FILE *fl){
 
 
 void callocIntArray(INT* &arr, INT length) {
-    if(arr == NULL)
+    if(arr == NULL || isMapped(arr))
         arr = (INT *) calloc(length, sizeof(INT));
     
     else if(arr != NULL)
@@ -71,7 +85,7 @@ void callocIntArray(INT* &arr, INT length) {
 }
 
 void callocTripleArray(Triple* &arr, INT length) {
-    if(arr == NULL)
+    if(arr == NULL || isMapped(arr))
         arr = (Triple *) calloc(length, sizeof(Triple));
         
     else if(arr != NULL)
@@ -84,7 +98,7 @@ void callocTripleArray(Triple* &arr, INT length) {
 }
 
 void callocRealArray(REAL* &arr, INT length) {
-    if(arr == NULL){
+    if(arr == NULL || isMapped(arr)){
         arr = (REAL *) calloc(length, sizeof(REAL));
         // printf("REAL array allocated.\n");
     }
@@ -97,21 +111,24 @@ void callocRealArray(REAL* &arr, INT length) {
 
 void resetTripleHelper(Triple *&helper) {
     if (helper != NULL) {
-        free(helper);
+        if (!isMapped(helper))
+            free(helper);
         helper = NULL;
     }
 }
 
 void resetIntHelper(INT *&helper) {
     if (helper != NULL) {
-        free(helper);
+        if (!isMapped(helper))
+            free(helper);
         helper = NULL;
     }
 }
 
 void resetRealHelper(REAL *&helper) {
     if (helper != NULL) {
-        free(helper);
+        if (!isMapped(helper))
+            free(helper);
         helper = NULL;
     }
 }
@@ -43,6 +43,16 @@ void validInit() {
     r_valid_filter_tot = 0;
 }
 
+// The valid triples [begin, begin + total) in the order of getValidHeadBatch and getValidTailBatch.
+extern "C"
+void getValidTriples(INT *ph, INT *pt, INT *pr, INT begin, INT total) {
+    for (INT i = 0; i < total && begin + i < validTotal; i++) {
+        ph[i] = validList[begin + i].h;
+        pt[i] = validList[begin + i].t;
+        pr[i] = validList[begin + i].r;
+    }
+}
+
 extern "C"
 void getValidHeadBatch(INT *ph, INT *pt, INT *pr) {
     INT validH = validList[lastValidHead].h; 
@@ -55,16 +65,16 @@ void getValidHeadBatch(INT *ph, INT *pt, INT *pr) {
     pr[0] = validR;
 
     if(incrementalSetting){
-        for(INT i=1; i<num_currently_contained_entities;i++) {
-            if(currently_contained_entities[i + offset] == validH)
-                offset++;
-            
-            INT entity = currently_contained_entities[i + offset]; 
-
+        INT i = 1;
+        for (INT entity = nextBit(entityBitmap.contained, 0); entity != -1 and i < num_currently_contained_entities;
+             entity = nextBit(entityBitmap.contained, entity + 1)) {
+            if (entity == validH)
+                continue;
             ph[i] = entity;
             pt[i] = validT;
             pr[i] = validR;
-        } 
+            i++;
+        }
     }else{
         for (INT i = 1; i < entityTotal; i++) {
             if (i + offset == validH)
@@ -90,16 +100,16 @@ void getValidTailBatch(INT *ph, INT *pt, INT *pr) {
     pr[0] = validR;
 
     if(incrementalSetting){
-        for(INT i=1; i<num_currently_contained_entities;i++) {
-            if(currently_contained_entities[i + offset] == validT)
-                offset++;
-            
-            INT entity = currently_contained_entities[i + offset]; 
-
+        INT i = 1;
+        for (INT entity = nextBit(entityBitmap.contained, 0); entity != -1 and i < num_currently_contained_entities;
+             entity = nextBit(entityBitmap.contained, entity + 1)) {
+            if (entity == validT)
+                continue;
             ph[i] = validH;
             pt[i] = entity;
             pr[i] = validR;
-        } 
+            i++;
+        }
     }else{
         for (INT i = 1; i < entityTotal; i++) {
             if (i + offset == validT)
@@ -118,62 +128,16 @@ void validHead(REAL *con, INT lastValidHead) {
     INT h = validList[lastValidHead].h;
     INT t = validList[lastValidHead].t;
     INT r = validList[lastValidHead].r;
-    INT filter_offset = -1;
+    INT candidateTotal = incrementalSetting ? num_currently_contained_entities : entityTotal;
 
     REAL minimal = con[0];
     INT l_filter_s = 0;
     
-    if (minimal != INFINITY){
-        if (incrementalSetting){
-            for (INT j = 1; j < num_currently_contained_entities; j++) {
-                REAL value = con[j];
-                if (currently_contained_entities[j + filter_offset] == h)
-                        filter_offset++;
-                    
-                if (value < minimal) {
-                    if (not _find(currently_contained_entities[j + filter_offset], t, r)){
-                        l_filter_s += 1;
-                    }
-                }
-            }
-        } else {
-            for (INT j = 1; j < entityTotal; j++) {
-                REAL value = con[j];
-                if (j + filter_offset == h)
-                        filter_offset++;
-                    
-                if (value < minimal) {
-                    if (not _find(j + filter_offset, t, r)){
-                        l_filter_s += 1;
-                    }
-                }
-            }
-        }
-    } else {
-        if (incrementalSetting){
-            l_filter_s = num_currently_contained_entities;
-
-            for (INT j = 1; j < num_currently_contained_entities; j++) {
-                if (currently_contained_entities[j + filter_offset] == h)
-                    filter_offset++;
-                                
-                if (_find(currently_contained_entities[j + filter_offset], t, r)){
-                    l_filter_s -= 1;
-                }
-            }
-        } else {
-            l_filter_s = entityTotal;
-            
-            for (INT j = 1; j < entityTotal; j++){ 
-                if (j + filter_offset == h)
-                        filter_offset++;
-                
-                if (_find(j + filter_offset, t, r))
-                    l_filter_s -= 1;
-                
-            }
-        }
-    }
+    if (minimal != INFINITY)
+        l_filter_s = countBetterScores(con, candidateTotal, minimal) -
+                     countKnownHeads(knownAnswers, h, r, t, con, candidateTotal, minimal, incrementalSetting);
+    else
+        l_filter_s = candidateTotal - countKnownHeads(knownAnswers, h, r, t, NULL, candidateTotal, minimal, incrementalSetting);
     if (l_filter_s < 10) l_valid_filter_tot += 1;
 
 }
@@ -183,59 +147,16 @@ void validTail(REAL *con, INT lastValidTail) {
     INT h = validList[lastValidTail].h;
     INT t = validList[lastValidTail].t;
     INT r = validList[lastValidTail].r;
-    INT filter_offset = -1;
+    INT candidateTotal = incrementalSetting ? num_currently_contained_entities : entityTotal;
 
     REAL minimal = con[0];
     INT r_filter_s = 0;
     
-    if (minimal != INFINITY){
-        if (incrementalSetting){
-            for (INT j = 1; j < num_currently_contained_entities; j++) {
-                REAL value = con[j];
-                if (currently_contained_entities[j + filter_offset] == t)
-                        filter_offset++;
-                    
-                if (value < minimal) {
-                    if (not _find(h, currently_contained_entities[j + filter_offset], r)){
-                        r_filter_s += 1;
-                    }
-                }
-            }
-        } else {
-            for (INT j = 1; j < entityTotal; j++) {
-                REAL value = con[j];
-                if (j + filter_offset == t)
-                        filter_offset++;    
-                    
-                if (value < minimal) {
-                    if (not _find(h, j + filter_offset, r)){
-                        r_filter_s += 1;
-                    }
-                }
-            }
-        }
-    } else {
-        if (incrementalSetting){
-            r_filter_s = num_currently_contained_entities;    
-
-            for (INT j = 1; j < num_currently_contained_entities; j++) {
-                if (currently_contained_entities[j + filter_offset] == t)
-                    filter_offset++;
-                
-                if (_find(h, currently_contained_entities[j + filter_offset], r))
-                    r_filter_s -= 1;
-            }
-        } else {
-            r_filter_s = entityTotal;
-            for (INT j = 1; j < entityTotal; j++){ 
-                if (j + filter_offset == t)
-                        filter_offset++;
-                
-                if (_find(h, j + filter_offset, r))
-                    r_filter_s -= 1;
-            }
-        }
-    }
+    if (minimal != INFINITY)
+        r_filter_s = countBetterScores(con, candidateTotal, minimal) -
+                     countKnownTails(knownAnswers, h, r, t, con, candidateTotal, minimal, incrementalSetting);
+    else
+        r_filter_s = candidateTotal - countKnownTails(knownAnswers, h, r, t, NULL, candidateTotal, minimal, incrementalSetting);
     if (r_filter_s < 10) r_valid_filter_tot += 1;
 }
 
@@ -0,0 +1,191 @@
+# coding:utf-8
+import torch
+import torch.nn as nn
+import numpy as np
+from tqdm import tqdm
+
+class FusedUniverseTrainer(object):
+
+	# Trains the embedding spaces of several parallel universes as one model. The tables of the
+	# universe models are stacked into the tables of model (universe k owns the entity rows
+	# [ent_offsets[k], ent_offsets[k + 1]) and likewise for relations), so one forward and backward
+	# pass over the concatenated batches of all universes trains every universe. The universes do
+	# not share rows, hence each of them receives the gradients of its own margin loss. Adagrad is
+	# applied row-wise with the learning rate of the owning universe and a universe stops
+	# contributing batches once it reached its number of epochs.
+	#
+	# epochs[k] holds the batches of universe k as returned by TrainDataLoader.sample_epochs.
+
+	def __init__(self,
+				 model = None,
+				 models = None,
+				 epochs = None,
+				 margins = None,
+				 alphas = None,
+				 use_gpu = True):
+
+		self.model = model
+		self.models = models
+		self.epochs = epochs
+		self.margins = margins
+		self.alphas = alphas
+		self.use_gpu = use_gpu
+
+		self.eps = 1e-10
+
+		self.train_times = [epoch["batch_h"].shape[0] for epoch in epochs]
+		self.nbatches = epochs[0]["batch_h"].shape[1]
+
+		self.ent_offsets = np.cumsum([0] + [model.ent_tot for model in models])
+		self.rel_offsets = np.cumsum([0] + [model.rel_tot for model in models])
+
+		self.tables = self.get_tables()
+		self.offset_batches()
+		self.build_loss_indices()
+		self.loss_indices_universes = None
+		self.loss_indices = None
+
+	def get_tables(self):
+		# (name, is_entity_table) of the embedding tables, told apart by their number of rows
+		tables = []
+		for name, module in self.model.named_modules():
+			if not isinstance(module, nn.Embedding):
+				continue
+			if module.num_embeddings == self.ent_offsets[-1] and \
+					(module.num_embeddings != self.rel_offsets[-1] or name.startswith("ent")):
+				tables.append((name, True))
+			elif module.num_embeddings == self.rel_offsets[-1]:
+				tables.append((name, False))
+			else:
+				raise ValueError("Embedding table %s is neither indexed by entities nor relations." % name)
+		return tables
+
+	def offset_batches(self):
+		# moves the local ids of every universe to its rows of the stacked tables
+		for universe, epoch in enumerate(self.epochs):
+			epoch["batch_h"] += self.ent_offsets[universe]
+			epoch["batch_t"] += self.ent_offsets[universe]
+			epoch["batch_r"] += self.rel_offsets[universe]
+
+	def build_loss_indices(self):
+		# For every negative of a batch the index of its positive, the margin and the weight of the
+		# mean over the negatives of its universe, relative to the start of the universe's batch.
+		self.batch_seq_sizes = []
+		self.positive_index = []
+		self.negative_index = []
+		self.negative_margin = []
+		self.negative_weight = []
+		for universe, epoch in enumerate(self.epochs):
+			batch_seq_size = epoch["batch_h"].shape[2]
+			batch_size = epoch["batch_size"]
+			negatives = batch_seq_size - batch_size
+			self.batch_seq_sizes.append(batch_seq_size)
+			self.positive_index.append(np.arange(negatives) % batch_size)
+			self.negative_index.append(np.arange(batch_size, batch_seq_size))
+			self.negative_margin.append(np.full(negatives, self.margins[universe], dtype=np.float32))
+			self.negative_weight.append(np.full(negatives, 1.0 / negatives, dtype=np.float32))
+
+	def get_table(self, model, name):
+		return dict(model.named_modules())[name]
+
+	def stack_embedding_spaces(self):
+		for name, is_entity_table in self.tables:
+			offsets = self.ent_offsets if is_entity_table else self.rel_offsets
+			weight = self.get_table(self.model, name).weight.data
+			for universe, model in enumerate(self.models):
+				weight[offsets[universe]:offsets[universe + 1]].copy_(self.get_table(model, name).weight.data)
+
+	def split_embedding_spaces(self):
+		for name, is_entity_table in self.tables:
+			offsets = self.ent_offsets if is_entity_table else self.rel_offsets
+			weight = self.get_table(self.model, name).weight.data.cpu()
+			for universe, model in enumerate(self.models):
+				self.get_table(model, name).weight.data.copy_(weight[offsets[universe]:offsets[universe + 1]])
+
+	def init_optimizer(self):
+		# Adagrad state and the learning rate of every row of the stacked tables
+		self.state_sum = []
+		self.row_lr = []
+		for name, is_entity_table in self.tables:
+			weight = self.get_table(self.model, name).weight
+			totals = np.diff(self.ent_offsets if is_entity_table else self.rel_offsets)
+			row_lr = torch.from_numpy(np.repeat(np.asarray(self.alphas, dtype=np.float32), totals))
+			self.state_sum.append(torch.zeros_like(weight.data))
+			self.row_lr.append(self.to_var(row_lr, self.use_gpu).unsqueeze(-1))
+
+	def optimizer_step(self):
+		# torch.optim.Adagrad (lr_decay = weight_decay = 0) with one learning rate per row. The rows of
+		# universes without a batch in this step have a zero gradient and are left unchanged.
+		for (name, _), state_sum, row_lr in zip(self.tables, self.state_sum, self.row_lr):
+			weight = self.get_table(self.model, name).weight
+			if weight.grad is None:
+				continue
+			grad = weight.grad.data
+			state_sum.addcmul_(grad, grad)
+			weight.data.sub_(row_lr * grad / (state_sum.sqrt() + self.eps))
+
+	def get_loss_indices(self, universes):
+		# The loss indices only depend on the training universes, which change at most once per epoch,
+		# so the tensors of the last set of universes are kept.
+		if self.loss_indices_universes != tuple(universes):
+			starts = np.cumsum([0] + [self.batch_seq_sizes[universe] for universe in universes])
+			self.loss_indices = {
+				"positive_index": self.to_var(np.concatenate([self.positive_index[universe] + starts[index] for index, universe in enumerate(universes)]), self.use_gpu),
+				"negative_index": self.to_var(np.concatenate([self.negative_index[universe] + starts[index] for index, universe in enumerate(universes)]), self.use_gpu),
+				"negative_margin": self.to_var(np.concatenate([self.negative_margin[universe] for universe in universes]), self.use_gpu),
+				"negative_weight": self.to_var(np.concatenate([self.negative_weight[universe] for universe in universes]), self.use_gpu),
+				"margin": float(sum(self.margins[universe] for universe in universes))
+			}
+			self.loss_indices_universes = tuple(universes)
+		return self.loss_indices
+
+	def get_batch(self, epoch, batch, universes):
+		data = {}
+		for key in ("batch_h", "batch_t", "batch_r"):
+			data[key] = self.to_var(np.concatenate([self.epochs[universe][key][epoch, batch] for universe in universes]), self.use_gpu)
+		data["mode"] = "normal"
+		data.update(self.get_loss_indices(universes))
+		return data
+
+	def train_one_step(self, data):
+		self.model.zero_grad()
+		score = self.model({
+			'batch_h': data['batch_h'],
+			'batch_t': data['batch_t'],
+			'batch_r': data['batch_r'],
+			'mode': data['mode']
+		})
+		# sum over the universes of MarginLoss, i.e. mean(max(p - n, -margin)) + margin
+		p_score = score[data['positive_index']]
+		n_score = score[data['negative_index']]
+		loss = (data['negative_weight'] * torch.max(p_score - n_score, -data['negative_margin'])).sum() + data['margin']
+		loss.backward()
+		self.optimizer_step()
+		return loss.item()
+
+	def run(self):
+		if self.use_gpu:
+			self.model.cuda()
+		self.stack_embedding_spaces()
+		self.init_optimizer()
+		print("Finish initializing...")
+
+		training_range = tqdm(range(max(self.train_times)))
+		for epoch in training_range:
+			universes = [universe for universe, train_times in enumerate(self.train_times) if epoch < train_times]
+			res = 0.0
+			for batch in range(self.nbatches):
+				loss = self.train_one_step(self.get_batch(epoch, batch, universes))
+				res += loss
+			training_range.set_description("Epoch %d | universes: %d | loss: %f" % (epoch, len(universes), loss))
+
+		self.split_embedding_spaces()
+		return self.models
+
+	def to_var(self, x, use_gpu):
+		if not torch.is_tensor(x):
+			x = torch.from_numpy(x)
+		if use_gpu:
+			return x.cuda(non_blocking = True)
+		else:
+			return x
@@ -26,28 +26,24 @@ import torch
 import time
 import os
 import ctypes
+import multiprocessing
 from random import randrange, uniform, seed
 import numpy as np
 from ..module.model.Model import Model
 from .Trainer import Trainer
+from .FusedUniverseTrainer import FusedUniverseTrainer
+from .UniverseIdMapping import UniverseIdMapping, intersect_universes
 from .Tester import Tester
 from ..data import TestDataLoader
 from ..module.strategy import NegativeSampling
 from ..module.loss import MarginLoss
 from collections import defaultdict
+from contextlib import closing
 from tqdm import tqdm
 from copy import deepcopy
 from pathlib import Path
 
 
-def get_string_key(entity, relation):
-    return '{},{}'.format(entity, relation)
-
-
-def defaultdict_int(innerfactory=int):
-    return defaultdict(innerfactory)
-
-
 def float_default():
     return float("inf")
 
@@ -59,6 +55,19 @@ def to_tensor(x, use_gpu):
         return torch.tensor([x])
 
 
+# Parallel_Universe_Config of the coordinator, inherited by the forked workers of train_parallel_universes
+worker_config = None
+
+
+def init_universe_worker(workers):
+    # share the cores among the workers instead of starting a full torch thread pool in each of them
+    torch.set_num_threads(max(1, torch.get_num_threads() // workers))
+
+
+def train_universes_in_worker(task):
+    return worker_config.train_universes_for_coordinator(*task)
+
+
 class Parallel_Universe_Config(Tester):
     def __init__(self,
                  train_dataloader=None, training_identifier='', valid_dataloader=None, test_dataloader=None,
@@ -69,7 +78,7 @@ class Parallel_Universe_Config(Tester):
                  missing_embedding_handling='last_rank',
                  save_steps=5, checkpoint_dir='./checkpoint/', valid_steps=5, early_stopping_patience=5,
                  training_setting="static",
-                 incremental_strategy="normal"):
+                 incremental_strategy="normal", eval_batch_size=65536):
         super(Parallel_Universe_Config, self).__init__(data_loader=test_dataloader, use_gpu=torch.cuda.is_available())
 
         """ Train data + variables"""
@@ -87,12 +96,8 @@ class Parallel_Universe_Config(Tester):
         self.next_universe_id = 0
 
         self.trained_embedding_spaces = defaultdict(Model)  # universe_id -> embedding_space
-        self.entity_id_mappings = defaultdict(defaultdict_int)  # universe_id -> global entity_id -> local_entity_id
-        self.relation_id_mappings = defaultdict(
-            defaultdict_int)  # universe_id -> global relation_id -> local_relation_id
-
-        self.entity_universes = defaultdict(set)  # entity_id -> universe_id
-        self.relation_universes = defaultdict(set)  # relation_id -> universe_id
+        self.entity_id_mappings = UniverseIdMapping(self.ent_tot)  # universe_id -> global entity_id -> local_entity_id
+        self.relation_id_mappings = UniverseIdMapping(self.rel_tot)  # universe_id -> global relation_id -> local_relation_id
 
         self.initial_random_seed = self.train_dataloader.lib.getRandomSeed()
 
@@ -136,16 +141,36 @@ class Parallel_Universe_Config(Tester):
         """Global Energy Estimation data structures"""
         self.current_tested_universes = 0
         self.current_validated_universes = 0
-        self.evaluation_head2tail_triple_score_dict = {}
-        self.evaluation_tail2head_triple_score_dict = {}
-        self.evaluation_head2rel_tuple_score_dict = {}
-        self.evaluation_tail2rel_tuple_score_dict = {}
-        self.default_scores = [float("inf")] * self.ent_tot
+        # A query is the (entity, relation) tuple of a head_batch or tail_batch. Row evaluation_query_rows[i] of
+        # evaluation_triple_scores belongs to the query with key evaluation_query_keys[i] (see
+        # get_evaluation_query_keys, the keys are sorted) and holds the minimal energy of every candidate entity
+        # of the query over the evaluated universes, evaluation_tuple_scores the minimal energy of the tuple itself.
+        self.evaluation_query_keys = np.empty(0, dtype=np.int64)
+        self.evaluation_query_rows = np.empty(0, dtype=np.int64)
+        self.evaluation_triple_scores = np.empty((0, self.ent_tot), dtype=np.float32)
+        self.evaluation_tuple_scores = np.empty(0, dtype=np.float32)
+        self.eval_batch_size = eval_batch_size
 
         self.training_setting = training_setting  # ["incremental" | "static"]
         self.incremental_strategy = incremental_strategy  # ["normal" | "deprecate"]
         if self.training_setting == "incremental":
             self.deprecated_embeddingspaces = set()
+            # deprecation_counts[universe_id] is the number of resolved deleted triples the universe holds,
+            # for the universes below deprecation_universe_total and the id mappings they were resolved with
+            self.deprecation_counts = np.zeros(0, dtype=np.int64)
+            self.deprecation_resolved_triples = np.empty(0, dtype=np.int64)
+            self.deprecation_universe_total = 0
+            self.deprecation_id_mappings = None
+
+    @property
+    def entity_universes(self):
+        # entity_id -> universe_ids
+        return self.entity_id_mappings.universe_sets()
+
+    @property
+    def relation_universes(self):
+        # relation_id -> universe_ids
+        return self.relation_id_mappings.universe_sets()
 
     def get_default_value_list(self):
         return [float("inf") for i in range(self.ent_tot)]
@@ -194,17 +219,9 @@ class Parallel_Universe_Config(Tester):
 
     def process_universe_mappings(self):
         entity_remapping, relation_remapping = self.train_dataloader.get_universe_mappings()
-
-        entity_total_universe = self.train_dataloader.lib.getEntityTotalUniverse()
-        print('Entities are %d' % entity_total_universe)
-        for entity in range(entity_total_universe):
-            self.entity_universes[entity_remapping[entity].item()].add(self.next_universe_id)
-            self.entity_id_mappings[self.next_universe_id][entity_remapping[entity].item()] = entity
-
-        relation_total_universe = self.train_dataloader.lib.getRelationTotalUniverse()
-        for relation in range(relation_total_universe):
-            self.relation_universes[relation_remapping[relation].item()].add(self.next_universe_id)
-            self.relation_id_mappings[self.next_universe_id][relation_remapping[relation].item()] = relation
+        print('Entities are %d' % len(entity_remapping))
+        self.entity_id_mappings.add_universe(self.next_universe_id, entity_remapping)
+        self.relation_id_mappings.add_universe(self.next_universe_id, relation_remapping)
 
     def compile_train_datset(self):
         # Create train dataset for universe and process mapping of contained global entities and relations
@@ -225,6 +242,16 @@ class Parallel_Universe_Config(Tester):
 
         print('Train dataset for embedding space compiled.')
 
+    def print_embedding_space_hyperparameters(self, margin, train_times, lr):
+        print('hyperparams for universe %d------------' % self.next_universe_id)
+        print('--- epochs: %d' % train_times)
+        print('--- learning rate:', lr)
+        print('--- margin: %d' % margin)
+        if "p_norm" in self.embedding_model_param:
+            print('--- norm: %d' % self.embedding_model_param['p_norm'])
+        if "dim" in self.embedding_model_param:
+            print('--- dimensions: %d' % self.embedding_model_param['dim'])
+
     def train_embedding_space(self):
         # Create Model with factory
         entity_total_universe = self.train_dataloader.lib.getEntityTotalUniverse()
@@ -240,15 +267,7 @@ class Parallel_Universe_Config(Tester):
         lr = round(uniform(self.min_lr, self.max_lr), len(str(self.min_lr).split('.')[1]))
         trainer = Trainer(model=model, data_loader=self.train_dataloader, train_times=train_times, alpha=lr,
                           use_gpu=self.use_gpu, opt_method='Adagrad')
-
-        print('hyperparams for universe %d------------' % self.next_universe_id)
-        print('--- epochs: %d' % train_times)
-        print('--- learning rate:', lr)
-        print('--- margin: %d' % margin)
-        if "p_norm" in self.embedding_model_param:
-            print('--- norm: %d' % self.embedding_model_param['p_norm'])
-        if "dim" in self.embedding_model_param:
-            print('--- dimensions: %d' % self.embedding_model_param['dim'])
+        self.print_embedding_space_hyperparameters(margin, train_times, lr)
 
         # Train embedding space
         self.train_dataloader.swap_helpers()
@@ -257,11 +276,58 @@ class Parallel_Universe_Config(Tester):
 
         return model.model
 
-    def add_embedding_space(self, embedding_space):
+    def sample_embedding_space(self):
+        # Draws model, hyper parameters and the batches of all epochs exactly like train_embedding_space,
+        # but leaves the training to train_fused_embedding_spaces
+        entity_total_universe = self.train_dataloader.lib.getEntityTotalUniverse()
+        relation_total_universe = self.train_dataloader.lib.getRelationTotalUniverse()
+        margin = randrange(self.min_margin, self.max_margin)
+        model = self.embedding_model(entity_total_universe, relation_total_universe, **self.embedding_model_param)
+
+        train_times = self.const_num_epochs if self.const_num_epochs is not None \
+            else randrange(self.min_num_epochs, self.max_num_epochs)
+
+        lr = round(uniform(self.min_lr, self.max_lr), len(str(self.min_lr).split('.')[1]))
+        self.print_embedding_space_hyperparameters(margin, train_times, lr)
+
+        self.train_dataloader.swap_helpers()
+        epochs = self.train_dataloader.sample_epochs(train_times)
+        self.train_dataloader.reset_universe()
+
+        return model, epochs, margin, lr
+
+    def train_fused_embedding_spaces(self, num_of_embedding_spaces):
+        # Compiles the datasets of num_of_embedding_spaces universes up front and trains their embedding
+        # spaces together as one stacked model (see FusedUniverseTrainer). Every universe draws the same
+        # seed, dataset, hyper parameters, initialization and batches as in train_parallel_universes
+        # without fusing. Memory grows with the sampled batches of all epochs of all fused universes.
+        models, epochs, margins, alphas = [], [], [], []
+        for _ in range(num_of_embedding_spaces):
+            self.set_random_seed(self.initial_random_seed + self.next_universe_id)
+            self.compile_train_datset()
+            model, universe_epochs, margin, lr = self.sample_embedding_space()
+            models.append(model)
+            epochs.append(universe_epochs)
+            margins.append(margin)
+            alphas.append(lr)
+            self.next_universe_id += 1
+
+        fused_model = self.embedding_model(sum(model.ent_tot for model in models),
+                                           sum(model.rel_tot for model in models), **self.embedding_model_param)
+        trainer = FusedUniverseTrainer(model=fused_model, models=models, epochs=epochs, margins=margins,
+                                       alphas=alphas, use_gpu=self.use_gpu)
+        trainer.run()
+
+        first_universe_id = self.next_universe_id - num_of_embedding_spaces
+        for index, embedding_space in enumerate(models):
+            self.add_embedding_space(embedding_space, universe_id=first_universe_id + index)
+
+    def add_embedding_space(self, embedding_space, universe_id=None):
         for param in embedding_space.parameters():
             param.requires_grad = False
 
-        self.trained_embedding_spaces[self.next_universe_id] = embedding_space
+        universe_id = self.next_universe_id if universe_id is None else universe_id
+        self.trained_embedding_spaces[universe_id] = embedding_space
 
     def save_model(self, filename=None):
         save_directory = self.checkpoint_dir
@@ -277,19 +343,15 @@ class Parallel_Universe_Config(Tester):
 
     def get_state(self):
         # best_state = deepcopy(self)
-        # best_state.evaluation_head2tail_triple_score_dict = None
-        # best_state.evaluation_tail2head_triple_score_dict = None
-        # best_state.evaluation_head2rel_tuple_score_dict = None
-        # best_state.evaluation_tail2rel_tuple_score_dict = None
+        # best_state.evaluation_query_keys = None
+        # best_state.evaluation_triple_scores = None
+        # best_state.evaluation_tuple_scores = None
 
         state = {
             "trained_embedding_spaces": deepcopy(self.trained_embedding_spaces),
             "next_universe_id": self.next_universe_id,
             "entity_id_mappings": deepcopy(self.entity_id_mappings),
             "relation_id_mappings": deepcopy(self.relation_id_mappings),
-
-            "entity_universes": deepcopy(self.entity_universes),
-            "relation_universes": deepcopy(self.relation_universes),
         }
         return state
 
@@ -302,8 +364,6 @@ class Parallel_Universe_Config(Tester):
 
             self.entity_id_mappings = self.best_state["entity_id_mappings"]
             self.relation_id_mappings = self.best_state["relation_id_mappings"]
-            self.entity_universes = self.best_state["entity_universes"]
-            self.relation_universes = self.best_state["relation_universes"]
 
             print(
                 "Trained {} universes but switch to best state with {} trained universes.".format(self.next_universe_id,
@@ -313,68 +373,202 @@ class Parallel_Universe_Config(Tester):
 
         return self
 
-    def train_parallel_universes(self, num_of_embedding_spaces):
-        # To measure time for training procedure (in seconds)
-        training_duration = 0
-
-        for universe_id in range(num_of_embedding_spaces):
-            time_measured = False
-            start_time = time.time()
-
+    def train_universe_group(self, num_of_embedding_spaces):
+        if num_of_embedding_spaces > 1:
+            self.train_fused_embedding_spaces(num_of_embedding_spaces)
+        else:
             self.set_random_seed(self.initial_random_seed + self.next_universe_id)
             self.compile_train_datset()
             embedding_space = self.train_embedding_space()
             self.add_embedding_space(embedding_space)
             self.next_universe_id += 1
 
-            if (universe_id + 1) % self.valid_steps == 0:
-                end_time = time.time()
-                training_duration = training_duration + (end_time - start_time)
-                time_measured = True
-
-                print("Universe %d has finished, validating..." % (self.next_universe_id - 1))
-                self.eval_universes(eval_mode='valid')
-                hit10 = self.valid()
-                print("Current hit@10: {}".format(hit10))
-                if hit10 > self.best_hit10:
-                    self.best_hit10 = hit10
-                    print("Best model | hit@10 of valid set is %f" % self.best_hit10)
+    def train_universes_for_coordinator(self, first_universe_id, num_of_embedding_spaces):
+        # Runs in a worker process of train_parallel_universes. The universes only depend on their
+        # seeds, so the worker trains exactly the embedding spaces the coordinator would have trained.
+        # A forked process cannot use CUDA once the coordinator initialised it, hence the worker trains on
+        # the CPU and add_trained_universe moves the embedding spaces to the GPU.
+        self.use_gpu = False
+        self.next_universe_id = first_universe_id
+        self.train_universe_group(num_of_embedding_spaces)
+        universes = [(universe_id,
+                      self.trained_embedding_spaces.pop(universe_id),
+                      self.entity_id_mappings.get_global_ids(universe_id).copy(),
+                      self.relation_id_mappings.get_global_ids(universe_id).copy())
+                     for universe_id in range(first_universe_id, first_universe_id + num_of_embedding_spaces)]
+        self.entity_id_mappings.truncate(first_universe_id)
+        self.relation_id_mappings.truncate(first_universe_id)
+        return universes
+
+    def add_trained_universe(self, universe_id, embedding_space, entity_global_ids, relation_global_ids):
+        if self.use_gpu:
+            embedding_space.cuda()
+        self.entity_id_mappings.add_universe(universe_id, entity_global_ids)
+        self.relation_id_mappings.add_universe(universe_id, relation_global_ids)
+        self.add_embedding_space(embedding_space, universe_id=universe_id)
+
+    def train_universe_groups(self, num_of_embedding_spaces, fused_universes, workers):
+        # Yields (universe_id, group_size) once the universes of a group have been added, where
+        # universe_id counts the universes of this call.
+        groups = [(universe_id, min(fused_universes, num_of_embedding_spaces - universe_id))
+                  for universe_id in range(0, num_of_embedding_spaces, fused_universes)]
+        if workers <= 1:
+            for universe_id, group_size in groups:
+                self.train_universe_group(group_size)
+                yield universe_id, group_size
+            return
+
+        # The forked workers inherit the loaded training graph of the library copy-on-write. The sampler
+        # threads are not forked along, so the pool is closed first and recreated by every worker.
+        global worker_config
+        worker_config = self
+        self.train_dataloader.close()
+        tasks = [(self.next_universe_id + universe_id, group_size) for universe_id, group_size in groups]
+        added_groups = 0
+        try:
+            with multiprocessing.get_context("fork").Pool(workers, initializer=init_universe_worker,
+                                                          initargs=(workers,)) as pool:
+                for (universe_id, group_size), universes in zip(groups, pool.imap(train_universes_in_worker, tasks)):
+                    for universe in universes:
+                        self.add_trained_universe(*universe)
+                    self.next_universe_id += group_size
+                    added_groups += 1
+                    yield universe_id, group_size
+        finally:
+            # Reached when the consumer closes the generator early as well. Leaving the with block has
+            # terminated the pool, so universes trained ahead by the workers are discarded.
+            worker_config = None
+            if added_groups < len(groups):
+                print("Stopped the workers, {} of {} universes have not been added.".format(
+                    num_of_embedding_spaces - sum(group_size for _, group_size in groups[:added_groups]),
+                    num_of_embedding_spaces))
+
+    def train_parallel_universes(self, num_of_embedding_spaces, fused_universes=1, workers=1):
+        # With fused_universes > 1, groups of that many universes are trained at once by
+        # train_fused_embedding_spaces. With workers > 1, the groups are trained by a pool of forked
+        # processes and added in order of their universe ids. Validation and saving happen after the
+        # group that reaches a multiple of valid_steps or save_steps.
+        # To measure time for training procedure (in seconds)
+        training_duration = 0
+
+        start_time = time.time()
+        # closing() shuts the workers down as soon as training stops, not when the generator is collected
+        with closing(self.train_universe_groups(num_of_embedding_spaces, fused_universes, workers)) as groups:
+            for universe_id, group_size in groups:
+                time_measured = False
+
+                if (universe_id + group_size) // self.valid_steps > universe_id // self.valid_steps:
+                    end_time = time.time()
+                    training_duration = training_duration + (end_time - start_time)
+                    time_measured = True
+
+                    print("Universe %d has finished, validating..." % (self.next_universe_id - 1))
+                    self.eval_universes(eval_mode='valid')
+                    hit10 = self.valid()
+                    print("Current hit@10: {}".format(hit10))
+                    if hit10 > self.best_hit10:
+                        self.best_hit10 = hit10
+                        print("Best model | hit@10 of valid set is %f" % self.best_hit10)
+                        print('Save model at universe %d.' % self.next_universe_id)
+                        self.save_model("Best_model_Pu{}_{}.ckpt".format(self.embedding_model.__name__,
+                                                                         self.training_identifier))
+                        self.bad_counts = 0
+                        # self.save_best_state()
+                    else:
+                        print(
+                            "Hit@10 of valid set is %f | bad count is %d"
+                            % (hit10, self.bad_counts)
+                        )
+                        self.bad_counts += 1
+                    if self.bad_counts == self.early_stopping_patience:
+                        print("Early stopping at universe {}".format(self.next_universe_id - 1))
+                        self.get_best_state()
+                        break
+
+                if not time_measured:
+                    end_time = time.time()
+                    training_duration = training_duration + (end_time - start_time)
+                    time_measured = True
+
+                if self.save_steps and self.checkpoint_dir and \
+                        (universe_id + group_size) // self.save_steps > universe_id // self.save_steps:
                     print('Save model at universe %d.' % self.next_universe_id)
-                    self.save_model("Best_model_Pu{}_{}.ckpt".format(self.embedding_model.__name__,
-                                                                     self.training_identifier))
-                    self.bad_counts = 0
-                    # self.save_best_state()
-                else:
-                    print(
-                        "Hit@10 of valid set is %f | bad count is %d"
-                        % (hit10, self.bad_counts)
-                    )
-                    self.bad_counts += 1
-                if self.bad_counts == self.early_stopping_patience:
-                    print("Early stopping at universe {}".format(self.next_universe_id - 1))
-                    self.get_best_state()
-                    break
-
-            if not time_measured:
-                end_time = time.time()
-                training_duration = training_duration + (end_time - start_time)
-                time_measured = True
-
-            if self.save_steps and self.checkpoint_dir and (universe_id + 1) % self.save_steps == 0:
-                print('Save model at universe %d.' % self.next_universe_id)
-                self.save_model()
+                    self.save_model()
+
+                start_time = time.time()
 
         print('Time took for creation of embedding spaces: {:5.3f}s'.format(training_duration), end='\n')
 
     def gather_embedding_spaces(self, entity_1, rel, entity_2=None):
-        entity_occurences = self.entity_universes[entity_1]
-        relation_occurences = self.relation_universes[rel]
-        embedding_space_ids = entity_occurences.intersection(relation_occurences)
+        embedding_space_ids = self.gather_embedding_space_ids(entity_1, rel, entity_2)
+        return set(embedding_space_ids.tolist())
+
+    def gather_embedding_space_ids(self, entity_1, rel, entity_2=None):
+        # ascending ids of the universes which contain the entities and the relation
+        embedding_space_ids = np.intersect1d(self.entity_id_mappings.get_universes(entity_1),
+                                             self.relation_id_mappings.get_universes(rel), assume_unique=True)
         if entity_2 != None:
-            entity2_occurences = self.entity_universes[entity_2]
-            embedding_space_ids = embedding_space_ids.intersection(entity2_occurences)
+            embedding_space_ids = np.intersect1d(embedding_space_ids, self.entity_id_mappings.get_universes(entity_2),
+                                                 assume_unique=True)
         return embedding_space_ids
 
+    def gather_embedding_spaces_batch(self, entities_1, rels, entities_2=None):
+        # (query index, universe id) pairs of the universes which contain the entities and the relation of
+        # every query, ordered by query index
+        num_universes = max(len(self.entity_id_mappings), len(self.relation_id_mappings), 1)
+        expanded_universes = [self.entity_id_mappings.expand_universes(entities_1),
+                              self.relation_id_mappings.expand_universes(rels)]
+        if entities_2 is not None:
+            expanded_universes.append(self.entity_id_mappings.expand_universes(entities_2))
+        return intersect_universes(num_universes, *expanded_universes)
+
+    def group_queries_by_universe(self, queries, universe_ids):
+        # Yields universe_id, query indexes for the (query index, universe id) pairs of
+        # gather_embedding_spaces_batch. Spaces deprecated by incremental training are skipped.
+        deprecate = self.training_setting == "incremental" and self.incremental_strategy == "deprecate"
+        order = np.argsort(universe_ids, kind='stable')
+        universe_ids, queries = universe_ids[order], queries[order]
+        unique_universe_ids, begins = np.unique(universe_ids, return_index=True)
+        ends = np.append(begins[1:], len(universe_ids))
+        for universe_id, begin, end in zip(unique_universe_ids.tolist(), begins.tolist(), ends.tolist()):
+            if deprecate and universe_id in self.deprecated_embeddingspaces:
+                continue
+            yield universe_id, queries[begin:end]
+
+    def predict_triples(self, batch_h, batch_r, batch_t):
+        # Global energies of the triples, i.e. the minimal energy of every triple over the embedding spaces
+        # which hold it, inf if there is none
+        scores = np.full(len(batch_h), np.inf, dtype=np.float32)
+        queries, universe_ids = self.gather_embedding_spaces_batch(batch_h, batch_r, batch_t)
+        for universe_id, universe_queries in self.group_queries_by_universe(queries, universe_ids):
+            embedding_space = self.trained_embedding_spaces[universe_id]
+            local_h = self.entity_id_mappings.get_local_ids(universe_id, batch_h[universe_queries])
+            local_t = self.entity_id_mappings.get_local_ids(universe_id, batch_t[universe_queries])
+            local_r = self.relation_id_mappings.get_local_ids(universe_id, batch_r[universe_queries])
+            for begin in range(0, len(universe_queries), self.eval_batch_size):
+                end = begin + self.eval_batch_size
+                energy_scores = embedding_space.predict({
+                    "batch_h": to_tensor(local_h[begin:end], use_gpu=self.use_gpu),
+                    "batch_t": to_tensor(local_t[begin:end], use_gpu=self.use_gpu),
+                    "batch_r": to_tensor(local_r[begin:end], use_gpu=self.use_gpu),
+                    "mode": "normal"
+                }).reshape(-1)
+                chunk_queries = universe_queries[begin:end]
+                scores[chunk_queries] = np.minimum(scores[chunk_queries], energy_scores)
+        return scores
+
+    def predict_tuples(self, entities, rels, mode):
+        # Batched predict_tuple: f(h,r) if mode == "tail_batch" else f(r,t) of every (entity, relation) pair
+        scores = np.full(len(entities), np.inf, dtype=np.float32)
+        queries, universe_ids = self.gather_embedding_spaces_batch(entities, rels)
+        for universe_id, universe_queries in self.group_queries_by_universe(queries, universe_ids):
+            embedding_space = self.trained_embedding_spaces[universe_id]
+            local_entities = self.entity_id_mappings.get_local_ids(universe_id, entities[universe_queries])
+            local_relations = self.relation_id_mappings.get_local_ids(universe_id, rels[universe_queries])
+            tuple_scores = self.calc_universe_tuple_scores(embedding_space, local_entities, local_relations, mode)
+            scores[universe_queries] = np.minimum(scores[universe_queries], tuple_scores)
+        return scores
+
     def calc_tuple_score(self, local_ent_id, local_rel_id, mode, embedding_space):
         rel_embedding = embedding_space.rel_embeddings(to_tensor(local_rel_id, use_gpu=self.use_gpu))
         ent = embedding_space.ent_embeddings(to_tensor(local_ent_id, use_gpu=self.use_gpu))
@@ -389,174 +583,163 @@ class Parallel_Universe_Config(Tester):
 
     def predict_tuple(self, ent_id, rel_id, mode):
         # Calculate f(h,r) if mode == "tail_batch" else Calculate f(r,t)
-        embedding_space_ids = self.gather_embedding_spaces(ent_id, rel_id)
-
-        # If incremental is to deprecate spaces of deleted triplpes then exclude them from global energy estimation
-        if self.training_setting == "incremental" and self.incremental_strategy == "deprecate":
-            embedding_space_ids = embedding_space_ids - self.deprecated_embeddingspaces
-
-        tuple_score = float("inf")
-        for embedding_space_id in embedding_space_ids:
-            embedding_space = self.trained_embedding_spaces[embedding_space_id]
-
-            local_head_id = self.entity_id_mappings[embedding_space_id][ent_id]
-            local_head_id = to_tensor(local_head_id, self.use_gpu)
-            local_rel_id = self.relation_id_mappings[embedding_space_id][rel_id]
-            local_rel_id = to_tensor(local_rel_id, self.use_gpu)
-
-            embedding_space_tuple_score = self.calc_tuple_score(local_head_id, local_rel_id, mode, embedding_space)
-            if embedding_space_tuple_score < tuple_score:
-                tuple_score = embedding_space_tuple_score
-
-        return tuple_score
-
-    def predict_triple(self, head_id, rel_id, tail_id, mode='normal'):
-        # Gather embedding spaces in which the triple is hold
-        embedding_space_ids = self.gather_embedding_spaces(head_id, rel_id, tail_id)
-
-        # If incremental is to deprecate spaces of deleted triplpes then exclude them from global energy estimation
-        if self.training_setting == "incremental" and self.incremental_strategy == "deprecate":
-            embedding_space_ids = embedding_space_ids - self.deprecated_embeddingspaces
-
-        # Iterate through spaces and get collect the max energy score
-        min_energy_score = float("inf")
-        for embedding_space_id in embedding_space_ids:
-            embedding_space = self.trained_embedding_spaces[embedding_space_id]
-
-            local_head_id = self.entity_id_mappings[embedding_space_id][head_id]
-            local_head_id = to_tensor(local_head_id, self.use_gpu)
-            local_tail_id = self.entity_id_mappings[embedding_space_id][tail_id]
-            local_tail_id = to_tensor(local_tail_id, self.use_gpu)
-            local_rel_id = self.relation_id_mappings[embedding_space_id][rel_id]
-            local_rel_id = to_tensor(local_rel_id, self.use_gpu)
-
-            energy_score = embedding_space.predict(
-                {"batch_h": to_tensor(local_head_id, use_gpu=self.use_gpu),
-                 "batch_t": to_tensor(local_tail_id, use_gpu=self.use_gpu),
-                 "batch_r": to_tensor(local_rel_id, use_gpu=self.use_gpu),
-                 "mode": mode
-                 }
-            )
-
-            if energy_score < min_energy_score:
-                min_energy_score = energy_score
-
-        return min_energy_score
-
-    def transmit_max_scores(self, data, embedding_space_mapping, scores):
-        mode = data['mode']
-        eval_rel_id = data['batch_r'][0]
-
-        if mode == 'head_batch':
-            eval_entity_id = data['batch_t'][0] if mode == 'head_batch' else data['batch_h'][0]
-            score_dict = self.evaluation_tail2head_triple_score_dict
-
-        elif mode == 'tail_batch':
-            eval_entity_id = data['batch_t'][0] if mode == 'head_batch' else data['batch_h'][0]
-            score_dict = self.evaluation_head2tail_triple_score_dict
-
-        dict_key = get_string_key(eval_entity_id, eval_rel_id)
-        global_energy_scores = score_dict.setdefault(dict_key, self.default_scores.copy())
-
-        for global_entity_id, local_entity_id in embedding_space_mapping.items():
-            entity_score = scores[local_entity_id].item()
-
-            if entity_score < global_energy_scores[global_entity_id]:
-                global_energy_scores[global_entity_id] = entity_score
-
-            # def transmit_max_scores(self, data, embedding_space_mapping, scores):
-            #     mode = data['mode']
-            #     eval_entity_id = data['batch_t'][0] if mode == 'head_batch' else data['batch_h'][0]
-            #     eval_rel_id = data['batch_r'][0]
-            #
-            #     for global_entity_id, local_entity_id in embedding_space_mapping.items():
-            #         if mode == 'head_batch'
-            #             dict_key = (global_entity_id, eval_rel_id)
-            #             entity = eval_entity_id
-            #         elif mode == 'tail_batch':
-            #             dict_key = (eval_entity_id, eval_rel_id)
-            #             entity = global_entity_id
-            #
-            #         triple_scores = self.evaluation_triple_score_dict[dict_key]
-            #         entity_score = scores[local_entity_id]
-            #         # get_string_key(global_entity_id, eval_rel_id, eval_entity_id) if mode == 'head_batch' \
-            #         # else get_string_key(eval_entity_id, eval_rel_id, global_entity_id)
-            #
-            #         if not triple_scores:
-            #             triple_scores.append(entity, entity_score)
-            #
-            #         if not triple_scores:
-            #             pairs[key].append(c + ':' + freq if freq != '1' else c)
-            #
-            #         elif entity_score.item() < BinSearch(triple_scores, entity):
-            #             self.evaluation_triple_score_dict[min_dict_key] = entity_score.item()
-
-    def transmit_tuple_max_score(self, data, universe_id):
-        mode = data["mode"]
-        eval_rel_id = data['batch_r'][0]
-
-        if mode == 'head_batch':
-            eval_entity_id = data['batch_t'][0] if mode == 'head_batch' else data['batch_h'][0]
-            score_dict = self.evaluation_tail2rel_tuple_score_dict
-
-        elif mode == 'tail_batch':
-            eval_entity_id = data['batch_t'][0] if mode == 'head_batch' else data['batch_h'][0]
-            score_dict = self.evaluation_head2rel_tuple_score_dict
-
-        dict_key = get_string_key(eval_entity_id, eval_rel_id)
-
+        return float(self.predict_tuples(np.array([ent_id], dtype=np.int64), np.array([rel_id], dtype=np.int64),
+                                         mode)[0])
+
+    def predict_triple(self, head_id, rel_id, tail_id):
+        # Minimal energy of the triple over the embedding spaces which hold it
+        return float(self.predict_triples(np.array([head_id], dtype=np.int64), np.array([rel_id], dtype=np.int64),
+                                          np.array([tail_id], dtype=np.int64))[0])
+
+    def reserve_evaluation_queries(self, num_queries):
+        # Grows the evaluation scores to num_queries rows, new rows hold the default energy
+        num_rows = len(self.evaluation_tuple_scores)
+        if num_rows >= num_queries:
+            return
+        triple_scores = np.full((num_queries, self.ent_tot), float_default(), dtype=np.float32)
+        triple_scores[:num_rows] = self.evaluation_triple_scores
+        tuple_scores = np.full(num_queries, float_default(), dtype=np.float32)
+        tuple_scores[:num_rows] = self.evaluation_tuple_scores
+        self.evaluation_triple_scores = triple_scores
+        self.evaluation_tuple_scores = tuple_scores
+
+    def get_evaluation_query_keys(self, mode, entities, relations):
+        mode_index = 0 if mode == 'tail_batch' else 1
+        entities = np.asarray(entities, dtype=np.int64)
+        relations = np.asarray(relations, dtype=np.int64)
+        return (mode_index * self.ent_tot + entities) * self.rel_tot + relations
+
+    def get_evaluation_query_ids(self, mode, entities, relations, add_queries=False):
+        # Rows of the queries in the evaluation scores, -1 for unknown queries. With add_queries unknown
+        # queries get the next rows, which the caller has to reserve.
+        keys = self.get_evaluation_query_keys(mode, entities, relations)
+        positions = np.searchsorted(self.evaluation_query_keys, keys)
+        known = positions < len(self.evaluation_query_keys)
+        known[known] = self.evaluation_query_keys[positions[known]] == keys[known]
+        query_ids = np.full(len(keys), -1, dtype=np.int64)
+        query_ids[known] = self.evaluation_query_rows[positions[known]]
+
+        if add_queries and not known.all():
+            num_queries = len(self.evaluation_query_keys)
+            new_keys, new_key_indexes = np.unique(keys[~known], return_inverse=True)
+            new_rows = np.arange(num_queries, num_queries + len(new_keys), dtype=np.int64)
+            query_ids[~known] = new_rows[new_key_indexes.reshape(-1)]
+
+            query_keys = np.concatenate([self.evaluation_query_keys, new_keys])
+            order = np.argsort(query_keys, kind='stable')
+            self.evaluation_query_keys = query_keys[order]
+            self.evaluation_query_rows = np.concatenate([self.evaluation_query_rows, new_rows])[order]
+        return query_ids
+
+    def get_evaluation_query_id(self, query):
+        # Row of the (mode, entity, relation) query in the evaluation scores, None if it is unknown
+        mode, entity, relation = query
+        query_id = self.get_evaluation_query_ids(mode, [entity], [relation])[0]
+        return None if query_id < 0 else int(query_id)
+
+    def index_universe_queries(self, eval_embeddingspaces, triple_h, triple_t, triple_r):
+        # Inverted index universe_id -> mode -> (query ids, entities, relations) of the distinct queries of the
+        # evaluated triples whose entity and relation are both embedded in the universe
+        eval_embeddingspaces = np.unique(np.fromiter(eval_embeddingspaces, dtype=np.int64))
+        universe_queries = defaultdict(lambda: {'head_batch': np.empty((3, 0), dtype=np.int64),
+                                                'tail_batch': np.empty((3, 0), dtype=np.int64)})
+        for mode, triple_entities in (('tail_batch', triple_h), ('head_batch', triple_t)):
+            tuples = np.unique(np.stack([triple_entities, triple_r], axis=1).astype(np.int64), axis=0)
+            entities, relations = np.ascontiguousarray(tuples[:, 0]), np.ascontiguousarray(tuples[:, 1])
+
+            queries, universe_ids = self.gather_embedding_spaces_batch(entities, relations)
+            evaluated = np.isin(universe_ids, eval_embeddingspaces)
+            queries, universe_ids = queries[evaluated], universe_ids[evaluated]
+
+            # only queries with an evaluated universe get a row
+            query_ids = np.full(len(tuples), -1, dtype=np.int64)
+            indexed = np.unique(queries)
+            query_ids[indexed] = self.get_evaluation_query_ids(mode, entities[indexed], relations[indexed],
+                                                               add_queries=True)
+
+            for universe_id, universe_query_indexes in self.group_queries_by_universe(queries, universe_ids):
+                universe_queries[universe_id][mode] = np.stack([query_ids[universe_query_indexes],
+                                                                entities[universe_query_indexes],
+                                                                relations[universe_query_indexes]])
+        # rows for the new queries only, the rows of queries indexed by earlier evaluations are kept
+        self.reserve_evaluation_queries(len(self.evaluation_query_keys))
+        return universe_queries
+
+    def predict_universe_queries(self, embedding_space, local_entities, local_relations, candidates, mode):
+        # (queries x candidates) scores of the queries of an embedding space, in chunks of at most
+        # eval_batch_size (query, candidate) pairs if the model scores grids of candidates and queries
+        if not getattr(embedding_space, 'batch_prediction', False):
+            scores = np.empty((len(local_entities), len(candidates)), dtype=np.float32)
+            for index in range(len(local_entities)):
+                entity = local_entities[index:index + 1].reshape(1, -1)
+                relation = local_relations[index:index + 1].reshape(1, -1)
+                scores[index] = embedding_space.predict({
+                    "batch_h": self.to_var(candidates.reshape(1, -1) if mode == "head_batch" else entity, self.use_gpu),
+                    "batch_t": self.to_var(entity if mode == "head_batch" else candidates.reshape(1, -1), self.use_gpu),
+                    "batch_r": self.to_var(relation, self.use_gpu),
+                    "mode": mode
+                }).reshape(-1)
+            return scores
+
+        chunk_size = max(1, self.eval_batch_size // len(candidates))
+        scores = []
+        for begin in range(0, len(local_entities), chunk_size):
+            entities = local_entities[begin:begin + chunk_size].reshape(1, -1)
+            relations = local_relations[begin:begin + chunk_size].reshape(1, -1)
+            grid_scores = embedding_space.predict({
+                "batch_h": self.to_var(candidates.reshape(-1, 1) if mode == "head_batch" else entities, self.use_gpu),
+                "batch_t": self.to_var(entities if mode == "head_batch" else candidates.reshape(-1, 1), self.use_gpu),
+                "batch_r": self.to_var(relations, self.use_gpu),
+                "mode": mode
+            })
+            scores.append(grid_scores.reshape(len(candidates), -1).T)
+        return np.concatenate(scores)
+
+    def calc_universe_tuple_scores(self, embedding_space, local_entities, local_relations, mode):
+        if not getattr(embedding_space, 'batch_prediction', False):
+            return np.array([self.calc_tuple_score(local_entity, local_relation, mode, embedding_space).item()
+                             for local_entity, local_relation in zip(local_entities.tolist(),
+                                                                     local_relations.tolist())], dtype=np.float32)
+        tuple_scores = self.calc_tuple_score(local_entities.tolist(), local_relations.tolist(), mode, embedding_space)
+        return tuple_scores.detach().cpu().numpy().reshape(-1)
+
+    def obtain_embedding_space_scores(self, universe_id, mode, query_ids, entities, relations):
+        # Scores the queries against all entities of the universe and merges the scores into the global
+        # energies of the queries
         embedding_space = self.trained_embedding_spaces[universe_id]
-        local_entity_id = self.entity_id_mappings[universe_id][eval_entity_id]
-        local_relation_id = self.relation_id_mappings[universe_id][eval_rel_id]
 
-        local_tuple_score = self.calc_tuple_score(local_entity_id, local_relation_id, mode, embedding_space)
-        if local_tuple_score < score_dict.get(dict_key, float_default()):
-            score_dict[dict_key] = local_tuple_score
+        global_entity_ids = self.entity_id_mappings.get_global_ids(universe_id)
+        candidates = np.arange(len(global_entity_ids), dtype=np.int64)
+        local_entities = self.entity_id_mappings.get_local_ids(universe_id, entities)
+        local_relations = self.relation_id_mappings.get_local_ids(universe_id, relations)
 
-    def obtain_embedding_space_score(self, data, universe_id):
-        batch_h = data['batch_h']
-        batch_t = data['batch_t']
-        batch_r = data['batch_r']
-        mode = data['mode']
+        scores = self.predict_universe_queries(embedding_space, local_entities, local_relations, candidates, mode)
+        self.transmit_max_scores(query_ids, global_entity_ids, scores)
 
-        embedding_space_mapping = self.entity_id_mappings[universe_id]
-        embedding_space = self.trained_embedding_spaces[universe_id]
+        tuple_scores = self.calc_universe_tuple_scores(embedding_space, local_entities, local_relations, mode)
+        self.evaluation_tuple_scores[query_ids] = np.minimum(self.evaluation_tuple_scores[query_ids], tuple_scores)
 
-        local_batch_h = embedding_space_mapping.keys() if mode == "head_batch" else batch_h
-        local_batch_h = [self.entity_id_mappings[universe_id][global_entity_id] for global_entity_id in
-                         local_batch_h]
-        local_batch_t = batch_t if mode == "head_batch" else embedding_space_mapping.keys()
-        local_batch_t = [self.entity_id_mappings[universe_id][global_entity_id] for global_entity_id in
-                         local_batch_t]
-        local_batch_r = [self.relation_id_mappings[universe_id][global_relation_id] for global_relation_id in
-                         batch_r]
-
-        embedding_space_scores = embedding_space.predict(
-            {"batch_h": to_tensor(local_batch_h, use_gpu=self.use_gpu),
-             "batch_t": to_tensor(local_batch_t, use_gpu=self.use_gpu),
-             "batch_r": to_tensor(local_batch_r, use_gpu=self.use_gpu),
-             "mode": mode
-             }
-        )
-        # iterate through dict and score tensor (index of both is equal) and transmit scores with comparison to energy_scores
-        self.transmit_max_scores(data, embedding_space_mapping, embedding_space_scores)
-        self.transmit_tuple_max_score(data, universe_id)
+    def transmit_max_scores(self, query_ids, global_entity_ids, scores):
+        # scatter-min of the (queries x entities) scores of a universe into the global energies. A query is
+        # scored once per universe and an entity occurs once in it, so the indices do not repeat.
+        rows_and_columns = np.ix_(query_ids, global_entity_ids)
+        self.evaluation_triple_scores[rows_and_columns] = np.minimum(self.evaluation_triple_scores[rows_and_columns],
+                                                                     scores)
 
     def reset_evaluation_helpers(self):
         self.current_validated_universes = 0
         self.current_tested_universes = 0
 
-        self.evaluation_head2tail_triple_score_dict.clear()
-        self.evaluation_tail2head_triple_score_dict.clear()
-        self.evaluation_head2rel_tuple_score_dict.clear()
-        self.evaluation_tail2rel_tuple_score_dict.clear()
+        self.evaluation_query_keys = np.empty(0, dtype=np.int64)
+        self.evaluation_query_rows = np.empty(0, dtype=np.int64)
+        self.evaluation_triple_scores = np.empty((0, self.ent_tot), dtype=np.float32)
+        self.evaluation_tuple_scores = np.empty(0, dtype=np.float32)
 
         self.incremental_strategy = "normal"
 
     def eval_universes(self, eval_mode):
         # Dependent on mode load validation or test data
         eval_dataloader = self.data_loader if eval_mode == 'test' else self.valid_dataloader
-        evaluation_range = tqdm(eval_dataloader)
 
         # Set range to obtain local energy scores from
         current_evaluated_universes = self.current_tested_universes if eval_mode == 'test' else self.current_validated_universes
@@ -583,17 +766,14 @@ class Parallel_Universe_Config(Tester):
         if eval_embeddingspaces:
             print("- Universe range to obtain local energies: ({} -> {})".format(min(eval_embeddingspaces),
                                                                                  max(eval_embeddingspaces)))
-            for index, [data_head, data_tail] in enumerate(evaluation_range):
-                head = data_tail['batch_h'][0]
-                rel = data_head['batch_r'][0]
-                tail = data_head['batch_t'][0]
+            triple_h, triple_t, triple_r = eval_dataloader.get_triples()
+            universe_queries = self.index_universe_queries(eval_embeddingspaces, triple_h, triple_t, triple_r)
 
-                for universe_id in eval_embeddingspaces:
-                    if (universe_id in self.entity_universes[head]) and (universe_id in self.relation_universes[rel]):
-                        self.obtain_embedding_space_score(data_tail, universe_id)
-
-                    if (universe_id in self.entity_universes[tail]) and (universe_id in self.relation_universes[rel]):
-                        self.obtain_embedding_space_score(data_head, universe_id)
+            for universe_id in tqdm([universe_id for universe_id in eval_embeddingspaces
+                                     if universe_id in universe_queries]):
+                for mode, (query_ids, entities, relations) in universe_queries[universe_id].items():
+                    if len(query_ids):
+                        self.obtain_embedding_space_scores(universe_id, mode, query_ids, entities, relations)
 
             if eval_mode == 'test':
                 self.current_tested_universes = self.next_universe_id
@@ -603,41 +783,21 @@ class Parallel_Universe_Config(Tester):
             print("- No universes to be evaluated.")
 
     def global_energy_estimation(self, data):
-        batch_h = data['batch_h']
-        batch_t = data['batch_t']
-        batch_r = data['batch_r']
-        eval_rel_id = batch_r[0]
         mode = data['mode']
+        evaluation_entities = data['batch_h'] if mode == 'head_batch' else data['batch_t']
+        eval_entity_id = data['batch_t'][0] if mode == 'head_batch' else data['batch_h'][0]
+        query_id = self.get_evaluation_query_id((mode, int(eval_entity_id), int(data['batch_r'][0])))
 
-        if mode == 'head_batch':
-            eval_entity_id = batch_t[0]
-            evaluation_entities = batch_h
-            num_of_evaluation_entitites = len(batch_h)
-            score_dict = self.evaluation_tail2head_triple_score_dict
-
-        elif mode == 'tail_batch':
-            eval_entity_id = batch_h[0]
-            evaluation_entities = batch_t
-            num_of_evaluation_entitites = len(batch_t)  # For incremental Setting num of currently contained entities
-            score_dict = self.evaluation_head2tail_triple_score_dict
-
-        batch_scores = np.zeros(shape=num_of_evaluation_entitites, dtype=np.float32)
-        dict_key = get_string_key(eval_entity_id, eval_rel_id)
-        score_dict = score_dict.get(dict_key, [])
-
-        if not score_dict:
-            batch_scores[:] = float_default()
+        if query_id is None:
+            batch_scores = np.full(len(evaluation_entities), float_default(), dtype=np.float32)
         else:
-            for idx, entity in enumerate(evaluation_entities):
-                batch_scores[idx] = score_dict[entity]
+            batch_scores = self.evaluation_triple_scores[query_id][evaluation_entities]
 
-        if self.missing_embedding_handling == 'null_vector':
-            tuple_score_dict = self.evaluation_tail2rel_tuple_score_dict if mode == 'head_batch' \
-                else self.evaluation_head2rel_tuple_score_dict
-            missing_value_replacement = tuple_score_dict.get(dict_key, float_default())
+        if self.missing_embedding_handling == 'null_vector' and query_id is not None:
+            missing_value_replacement = self.evaluation_tuple_scores[query_id]
 
             if missing_value_replacement != float_default():
-                batch_scores[batch_scores == float_default()] = missing_value_replacement.item()
+                batch_scores[batch_scores == float_default()] = missing_value_replacement
 
         return batch_scores
 
@@ -712,23 +872,17 @@ class Parallel_Universe_Config(Tester):
             score = self.global_energy_estimation(data)
 
         elif mode == 'normal':
-            num_of_scores = batch_h.size
-            score = np.zeros(shape=num_of_scores, dtype=np.float32)
-            for index in range(num_of_scores):
-                head, tail, rel = batch_h[index], batch_r[index], batch_t[index]
-                global_energy_score = self.predict_triple(head, rel, tail, mode)
-                # In case no embedding space could be found for the triple we calculate two tuple scores,
-                # i.e. (h,r) and (r,t) and use the higher score of them to discriminate missing values
-                if global_energy_score == float("inf") and self.missing_embedding_handling == "null_vector":
-                    tuple_score_head_rel = self.predict_tuple(head, rel, mode="tail_batch")
-                    tuple_score_rel_tail = self.predict_tuple(tail, rel, mode="head_batch")
-
-                    if tuple_score_head_rel < tuple_score_rel_tail:
-                        global_energy_score = tuple_score_head_rel
-                    else:
-                        global_energy_score = tuple_score_rel_tail
-
-                score[index] = global_energy_score
+            batch_h = np.asarray(batch_h, dtype=np.int64).reshape(-1)
+            batch_t = np.asarray(batch_t, dtype=np.int64).reshape(-1)
+            batch_r = np.asarray(batch_r, dtype=np.int64).reshape(-1)
+            score = self.predict_triples(batch_h, batch_r, batch_t)
+            # In case no embedding space could be found for a triple we calculate two tuple scores,
+            # i.e. (h,r) and (r,t) and use the lower score of them to discriminate missing values
+            missing = np.flatnonzero(score == np.inf)
+            if len(missing) > 0 and self.missing_embedding_handling == "null_vector":
+                tuple_score_head_rel = self.predict_tuples(batch_h[missing], batch_r[missing], mode="tail_batch")
+                tuple_score_rel_tail = self.predict_tuples(batch_t[missing], batch_r[missing], mode="head_batch")
+                score[missing] = np.minimum(tuple_score_head_rel, tuple_score_rel_tail)
 
         return score
 
@@ -815,12 +969,49 @@ class Parallel_Universe_Config(Tester):
         self.run_classification_of_deleted_triples(snapshot, threshlod)
 
     def determine_deprecated_embedding_spaces(self):
-        if self.deprecated_embeddingspaces:
-            self.deprecated_embeddingspaces.clear()
-        for triple in self.train_dataloader.deleted_triple_set:
-            head, tail, rel = triple
-            embedding_space_ids_set = self.gather_embedding_spaces(int(head), int(rel), int(tail))
-            self.deprecated_embeddingspaces.update(embedding_space_ids_set)
+        # Deprecated are the universes which hold a deleted training triple. Only the triples deleted or
+        # inserted again since the last call are resolved, and only the universes trained since then are
+        # checked for the triples which are still deleted. Without changes the set of the last call is kept.
+        deleted_triples = self.train_dataloader.deleted_triples
+        id_mappings = (self.entity_id_mappings, self.relation_id_mappings)
+        if self.deprecation_id_mappings is None or self.deprecation_id_mappings[0] is not id_mappings[0] or \
+                self.deprecation_id_mappings[1] is not id_mappings[1] or \
+                self.next_universe_id < self.deprecation_universe_total:
+            self.deprecation_counts = np.zeros(0, dtype=np.int64)
+            self.deprecation_resolved_triples = np.empty(0, dtype=np.int64)
+            self.deprecation_universe_total = 0
+            self.deprecation_id_mappings = id_mappings
+        elif self.next_universe_id == self.deprecation_universe_total and \
+                np.array_equal(deleted_triples, self.deprecation_resolved_triples):
+            return
+
+        resolved_universe_total = self.deprecation_universe_total
+        counts = np.zeros(self.next_universe_id, dtype=np.int64)
+        counts[:len(self.deprecation_counts)] = self.deprecation_counts
+
+        inserted_triples = np.setdiff1d(self.deprecation_resolved_triples, deleted_triples, assume_unique=True)
+        new_triples = np.setdiff1d(deleted_triples, self.deprecation_resolved_triples, assume_unique=True)
+        for triples, change, universe_total in ((inserted_triples, -1, resolved_universe_total),
+                                                (new_triples, 1, self.next_universe_id)):
+            if len(triples):
+                heads, tails, rels = self.train_dataloader.unpack_triples(triples)
+                _, universe_ids = self.gather_embedding_spaces_batch(heads, rels, tails)
+                universe_ids = universe_ids[universe_ids < universe_total]
+                counts += change * np.bincount(universe_ids, minlength=self.next_universe_id)
+
+        still_deleted_triples = np.intersect1d(deleted_triples, self.deprecation_resolved_triples, assume_unique=True)
+        if len(still_deleted_triples) and self.next_universe_id > resolved_universe_total:
+            heads, tails, rels = self.train_dataloader.unpack_triples(still_deleted_triples)
+            for universe_id in range(resolved_universe_total, self.next_universe_id):
+                contained = (self.entity_id_mappings.get_local_ids(universe_id, heads) >= 0) & \
+                            (self.entity_id_mappings.get_local_ids(universe_id, tails) >= 0) & \
+                            (self.relation_id_mappings.get_local_ids(universe_id, rels) >= 0)
+                counts[universe_id] += np.count_nonzero(contained)
+
+        self.deprecation_counts = counts
+        self.deprecation_resolved_triples = deleted_triples
+        self.deprecation_universe_total = self.next_universe_id
+        self.deprecated_embeddingspaces = set(np.flatnonzero(counts).tolist())
 
     def extend_parallel_universe(self, ParallelUniverse_inst):
         # shift indexes of trained embedding spaces in parameter instance to add them to this instance
@@ -829,23 +1020,9 @@ class Parallel_Universe_Config(Tester):
                 universe_id + self.next_universe_id] = ParallelUniverse_inst.trained_embedding_spaces.pop(universe_id)
         self.trained_embedding_spaces.update(ParallelUniverse_inst.trained_embedding_spaces)
 
-        for entity in range(ParallelUniverse_inst.ent_tot):
-            self.entity_universes[entity].update(
-                ParallelUniverse_inst.entity_universes[entity])  # entity_id -> universe_id
-
-        for relation in range(ParallelUniverse_inst.rel_tot):
-            self.relation_universes[relation].update(
-                ParallelUniverse_inst.relation_universes[relation])  # relation_id -> universe_id
-
-        for instance_next_universe_id in range(ParallelUniverse_inst.next_universe_id):
-            for entity_key in list(ParallelUniverse_inst.entity_id_mappings[instance_next_universe_id].keys()):
-                self.entity_id_mappings[self.next_universe_id + instance_next_universe_id][entity_key] = \
-                    ParallelUniverse_inst.entity_id_mappings[instance_next_universe_id][entity_key]
-
-            for relation_key in list(ParallelUniverse_inst.relation_id_mappings[instance_next_universe_id].keys()):
-                self.relation_id_mappings[self.next_universe_id + instance_next_universe_id][relation_key] = \
-                    ParallelUniverse_inst.relation_id_mappings[instance_next_universe_id][relation_key]
-                # universe_id -> global entity_id -> universe entity_id
+        # universe_id -> global entity_id -> universe entity_id
+        self.entity_id_mappings.extend(ParallelUniverse_inst.entity_id_mappings, self.next_universe_id)
+        self.relation_id_mappings.extend(ParallelUniverse_inst.relation_id_mappings, self.next_universe_id)
 
         self.next_universe_id += ParallelUniverse_inst.next_universe_id
 
@@ -855,8 +1032,6 @@ class Parallel_Universe_Config(Tester):
                       'trained_embedding_spaces': self.trained_embedding_spaces,
                       'entity_id_mappings': self.entity_id_mappings,
                       'relation_id_mappings': self.relation_id_mappings,
-                      'entity_universes': self.entity_universes,
-                      'relation_universes': self.relation_universes,
                       'min_margin': self.min_margin,
                       'max_margin': self.max_margin,
                       'min_lr': self.min_lr,
@@ -879,10 +1054,11 @@ class Parallel_Universe_Config(Tester):
         if self.training_setting == "static":
             eval_universes_dict = {'current_tested_universes': self.current_tested_universes,
                                    'current_validated_universes': self.current_validated_universes,
-                                   'evaluation_head2tail_triple_score_dict': self.evaluation_head2tail_triple_score_dict,
-                                   'evaluation_tail2head_triple_score_dict': self.evaluation_tail2head_triple_score_dict,
-                                   'evaluation_head2rel_tuple_score_dict': self.evaluation_head2rel_tuple_score_dict,
-                                   'evaluation_tail2rel_tuple_score_dict': self.evaluation_tail2rel_tuple_score_dict}
+                                   'evaluation_query_keys': self.evaluation_query_keys,
+                                   'evaluation_query_rows': self.evaluation_query_rows,
+                                   'evaluation_triple_scores':
+                                       self.evaluation_triple_scores[:len(self.evaluation_query_keys)],
+                                   'evaluation_tuple_scores': self.evaluation_tuple_scores[:len(self.evaluation_query_keys)]}
             state_dict.update(eval_universes_dict)
 
         return state_dict
@@ -893,8 +1069,10 @@ class Parallel_Universe_Config(Tester):
         self.trained_embedding_spaces = state_dict['trained_embedding_spaces']
         self.entity_id_mappings = state_dict['entity_id_mappings']
         self.relation_id_mappings = state_dict['relation_id_mappings']
-        self.entity_universes = state_dict['entity_universes']
-        self.relation_universes = state_dict['relation_universes']
+        if isinstance(self.entity_id_mappings, dict):
+            # checkpoints written before the CSR mappings
+            self.entity_id_mappings = UniverseIdMapping.from_dicts(self.entity_id_mappings, self.ent_tot)
+            self.relation_id_mappings = UniverseIdMapping.from_dicts(self.relation_id_mappings, self.rel_tot)
         self.min_margin = state_dict['min_margin']
         self.max_margin = state_dict['max_margin']
         self.min_lr = state_dict['min_lr']
@@ -921,10 +1099,10 @@ class Parallel_Universe_Config(Tester):
         if '' in state_dict:
             self.current_tested_universes = state_dict['current_tested_universes']
             self.current_validated_universes = state_dict['current_validated_universes']
-            self.evaluation_head2tail_triple_score_dict = state_dict['evaluation_head2tail_triple_score_dict']
-            self.evaluation_tail2head_triple_score_dict = state_dict['evaluation_tail2head_triple_score_dict']
-            self.evaluation_head2rel_tuple_score_dict = state_dict['evaluation_head2rel_tuple_score_dict']
-            self.evaluation_tail2rel_tuple_score_dict = state_dict['evaluation_tail2rel_tuple_score_dict']
+            self.evaluation_query_keys = state_dict['evaluation_query_keys']
+            self.evaluation_query_rows = state_dict['evaluation_query_rows']
+            self.evaluation_triple_scores = state_dict['evaluation_triple_scores']
+            self.evaluation_tuple_scores = state_dict['evaluation_tuple_scores']
 
     def save_parameters(self, path):
         state_dict = self.extend_state_dict()
@@ -935,12 +1113,8 @@ class Parallel_Universe_Config(Tester):
         self.process_state_dict(state_dict)
 
     def calculate_unembedded_ratio(self, mode='examine_entities'):
-        num_unembedded = 0
-        mapping_dict = self.entity_universes if mode == 'examine_entities' else self.relation_universes
+        mapping = self.entity_id_mappings if mode == 'examine_entities' else self.relation_id_mappings
         num_total = self.train_dataloader.entTotal if mode == 'examine_entities' else self.train_dataloader.relTotal
-
-        for i in range(num_total):
-            if len(mapping_dict[i]) == 0:
-                num_unembedded += 1
+        num_unembedded = np.count_nonzero(mapping.get_universe_counts()[:num_total] == 0)
 
         return num_unembedded / num_total
@@ -1,7 +1,6 @@
 # coding:utf-8
 import torch
 import torch.nn as nn
-from torch.autograd import Variable
 import torch.optim as optim
 import os
 import time
@@ -21,7 +20,10 @@ class Tester(object):
         self.lib = ctypes.cdll.LoadLibrary(base_file)
         self.lib.testHead.argtypes = [ctypes.c_void_p, ctypes.c_int64, ctypes.c_int64]
         self.lib.testTail.argtypes = [ctypes.c_void_p, ctypes.c_int64, ctypes.c_int64]
+        self.lib.testHeadBatch.argtypes = [ctypes.c_void_p, ctypes.c_int64, ctypes.c_int64, ctypes.c_int64]
+        self.lib.testTailBatch.argtypes = [ctypes.c_void_p, ctypes.c_int64, ctypes.c_int64, ctypes.c_int64]
         self.lib.test_link_prediction.argtypes = [ctypes.c_int64]
+        self.lib.getTestLinkRanks.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_int64, ctypes.c_int64, ctypes.c_int64]
 
         self.lib.getTestLinkMRR.argtypes = [ctypes.c_int64]
         self.lib.getTestLinkMR.argtypes = [ctypes.c_int64]
@@ -54,10 +56,12 @@ class Tester(object):
             self.model.cuda()
 
     def to_var(self, x, use_gpu):
+        if not torch.is_tensor(x):
+            x = torch.from_numpy(x)
         if use_gpu:
-            return Variable(torch.from_numpy(x).cuda())
+            return x.cuda(non_blocking = True)
         else:
-            return Variable(torch.from_numpy(x))
+            return x
 
     def test_one_step(self, data):
         return self.model.predict({
@@ -67,19 +71,36 @@ class Tester(object):
             'mode': data['mode']
         })
 
-    def run_link_prediction(self, type_constrain = False):
+    def test_batch_step(self, data):
+        # the model scores a (candidates x test triples) grid, the ranking expects one row of
+        # candidate scores per test triple
+        batch_size = data['batch_r'].shape[-1]
+        score = self.test_one_step(data).reshape(-1, batch_size)
+        return np.ascontiguousarray(score.T, dtype = np.float32)
+
+    def run_link_prediction(self, type_constrain = False, batch_size = None):
         self.lib.initTest()
         self.data_loader.set_sampling_mode('link')
         if type_constrain:
             type_constrain = 1
         else:
             type_constrain = 0
-        training_range = tqdm(self.data_loader)
-        for index, [data_head, data_tail] in enumerate(training_range):
-            score = self.test_one_step(data_head)
-            self.lib.testHead(score.__array_interface__["data"][0], index, type_constrain)
-            score = self.test_one_step(data_tail)
-            self.lib.testTail(score.__array_interface__["data"][0], index, type_constrain)
+        if batch_size is not None and getattr(self.model, 'batch_prediction', False):
+            test_total = self.data_loader.get_triple_tot()
+            training_range = tqdm(range(0, test_total, batch_size))
+            for begin in training_range:
+                data_head, data_tail = self.data_loader.sampling_lp_batch(begin, batch_size)
+                score = self.test_batch_step(data_head)
+                self.lib.testHeadBatch(score.__array_interface__["data"][0], begin, score.shape[0], type_constrain)
+                score = self.test_batch_step(data_tail)
+                self.lib.testTailBatch(score.__array_interface__["data"][0], begin, score.shape[0], type_constrain)
+        else:
+            training_range = tqdm(self.data_loader)
+            for index, [data_head, data_tail] in enumerate(training_range):
+                score = self.test_one_step(data_head)
+                self.lib.testHead(score.__array_interface__["data"][0], index, type_constrain)
+                score = self.test_one_step(data_tail)
+                self.lib.testTail(score.__array_interface__["data"][0], index, type_constrain)
         self.lib.test_link_prediction(type_constrain)
 
         mrr = self.lib.getTestLinkMRR(type_constrain)
@@ -92,6 +113,21 @@ class Tester(object):
         # Scores from filtered setting
         return mrr, mr, hit10, hit3, hit1
 
+    def get_link_prediction_ranks(self, filter = True, type_constrain = False):
+        # ranks (1 for the best) of the head and tail prediction of every test triple from the last
+        # run_link_prediction, 0 for test triples that have not been ranked
+        test_total = self.data_loader.get_triple_tot()
+        head_ranks = np.zeros(test_total, dtype = np.int64)
+        tail_ranks = np.zeros(test_total, dtype = np.int64)
+        self.lib.getTestLinkRanks(
+            head_ranks.__array_interface__["data"][0],
+            tail_ranks.__array_interface__["data"][0],
+            test_total,
+            1 if filter else 0,
+            1 if type_constrain else 0
+        )
+        return head_ranks, tail_ranks
+
     def determine_classification_cross_table_values(self, res, threshold):
         true_positive = 0
         true_negative = 0
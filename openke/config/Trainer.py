@@ -1,7 +1,6 @@
 # coding:utf-8
 import torch
 import torch.nn as nn
-from torch.autograd import Variable
 import torch.optim as optim
 import os
 import time
@@ -88,6 +87,10 @@ class Trainer(object):
 			)
 		print("Finish initializing...")
 
+		if getattr(self.data_loader, "prefetch_depth", 0) > 0:
+			# one prefetch thread for all epochs, so the first batches of an epoch are not waited for
+			self.data_loader.set_prefetch_epochs(self.train_times)
+
 		training_range = tqdm(range(self.train_times))
 		for epoch in training_range:
 			res = 0.0
@@ -97,7 +100,10 @@ class Trainer(object):
 				# print("--------------------\n")
 				loss = self.train_one_step(data)
 				res += loss
-			training_range.set_description("Epoch %d | loss: %f" % (epoch, loss))
+			if getattr(self.data_loader, "prefetch_depth", 0) > 0:
+				training_range.set_description("Epoch %d | loss: %f | sampler stalls: %d" % (epoch, loss, self.data_loader.get_prefetch_stalls()))
+			else:
+				training_range.set_description("Epoch %d | loss: %f" % (epoch, loss))
 			
 			if self.save_steps and self.checkpoint_dir and (epoch + 1) % self.save_steps == 0:
 				print("Epoch %d has finished, saving..." % (epoch))
@@ -107,10 +113,13 @@ class Trainer(object):
 		self.model = model
 
 	def to_var(self, x, use_gpu):
+		# loaders with pin_memory already hand out (page-locked) tensors
+		if not torch.is_tensor(x):
+			x = torch.from_numpy(x)
 		if use_gpu:
-			return Variable(torch.from_numpy(x).cuda())
+			return x.cuda(non_blocking = True)
 		else:
-			return Variable(torch.from_numpy(x))
+			return x
 
 	def set_use_gpu(self, use_gpu):
 		self.use_gpu = use_gpu
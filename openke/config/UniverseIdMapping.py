@@ -0,0 +1,244 @@
+'''
+MIT License
+
+Copyright (c) 2020 Rashid Lafraie
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+'''
+
+import numpy as np
+
+
+class UniverseIdMapping(object):
+    # Global <-> local ids of the entities (or relations) of all universes in CSR form. Universe u owns the
+    # entries offsets[u]:offsets[u + 1] of
+    #   global_ids         the global id of every local id, in local id order
+    #   sorted_global_ids  the same global ids in ascending order, and
+    #   sorted_local_ids   their local ids,
+    # so a local id is found by binary search. The inverse index global id -> ascending universe ids
+    # (universe_offsets, universe_ids) is CSR as well. Added universes are kept aside and merged into the
+    # arrays on the next lookup, hence adding universe after universe costs no more than one merge.
+
+    def __init__(self, total):
+        self.total = total
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.global_ids = np.empty(0, dtype=np.int32)
+        self.sorted_global_ids = np.empty(0, dtype=np.int32)
+        self.sorted_local_ids = np.empty(0, dtype=np.int32)
+        self.pending_universes = []
+        self.universe_offsets = None
+        self.universe_ids = None
+
+    @classmethod
+    def from_dicts(cls, id_mappings, total):
+        # from universe_id -> global id -> local id dicts (checkpoints written before the CSR mappings)
+        mapping = cls(total)
+        for universe_id in sorted(id_mappings):
+            local_to_global = sorted(id_mappings[universe_id].items(), key=lambda item: item[1])
+            mapping.add_universe(universe_id, [global_id for global_id, _ in local_to_global])
+        return mapping
+
+    def __len__(self):
+        # number of universe ids, including universes without ids
+        return max(len(self.offsets) - 1, self.pending_universes[-1][0] + 1 if self.pending_universes else 0)
+
+    def __getitem__(self, universe_id):
+        return UniverseIdView(self, universe_id)
+
+    def __contains__(self, universe_id):
+        return universe_id < len(self) and self.get_num_ids(universe_id) > 0
+
+    def add_universe(self, universe_id, global_ids):
+        # global_ids[local_id] is the global id of local_id. Universes have to be added in ascending order.
+        if universe_id < len(self):
+            raise ValueError("Universe %d has already been added." % universe_id)
+        self.pending_universes.append((universe_id, np.asarray(global_ids, dtype=np.int32)))
+        self.universe_offsets = None
+        self.universe_ids = None
+
+    def merge_pending_universes(self):
+        if not self.pending_universes:
+            return
+        num_universes = len(self)
+        counts = np.zeros(num_universes, dtype=np.int64)
+        counts[:len(self.offsets) - 1] = np.diff(self.offsets)
+        global_ids, sorted_global_ids, sorted_local_ids = [self.global_ids], [self.sorted_global_ids], \
+                                                          [self.sorted_local_ids]
+        for universe_id, universe_global_ids in self.pending_universes:
+            order = np.argsort(universe_global_ids, kind='stable').astype(np.int32)
+            counts[universe_id] = len(universe_global_ids)
+            global_ids.append(universe_global_ids)
+            sorted_global_ids.append(universe_global_ids[order])
+            sorted_local_ids.append(order)
+
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self.global_ids = np.concatenate(global_ids)
+        self.sorted_global_ids = np.concatenate(sorted_global_ids)
+        self.sorted_local_ids = np.concatenate(sorted_local_ids)
+        self.pending_universes = []
+
+    def truncate(self, num_universes):
+        # drops the universes from universe id num_universes on
+        self.merge_pending_universes()
+        if num_universes >= len(self.offsets) - 1:
+            return
+        end = self.offsets[num_universes]
+        self.offsets = self.offsets[:num_universes + 1].copy()
+        self.global_ids = self.global_ids[:end].copy()
+        self.sorted_global_ids = self.sorted_global_ids[:end].copy()
+        self.sorted_local_ids = self.sorted_local_ids[:end].copy()
+        self.universe_offsets = None
+        self.universe_ids = None
+
+    def extend(self, other, first_universe_id):
+        # adds the universes of other with their ids shifted by first_universe_id
+        other.merge_pending_universes()
+        for universe_id in range(len(other.offsets) - 1):
+            if other.get_num_ids(universe_id) > 0:
+                self.add_universe(first_universe_id + universe_id, other.get_global_ids(universe_id))
+
+    def get_num_ids(self, universe_id):
+        self.merge_pending_universes()
+        if universe_id >= len(self.offsets) - 1:
+            return 0
+        return int(self.offsets[universe_id + 1] - self.offsets[universe_id])
+
+    def get_global_ids(self, universe_id):
+        # global ids of the universe in local id order
+        self.merge_pending_universes()
+        if universe_id >= len(self.offsets) - 1:
+            return self.global_ids[:0]
+        return self.global_ids[self.offsets[universe_id]:self.offsets[universe_id + 1]]
+
+    def get_local_ids(self, universe_id, global_ids):
+        # local ids of global ids which occur in the universe, -1 for the others
+        self.merge_pending_universes()
+        global_ids = np.asarray(global_ids)
+        if universe_id >= len(self.offsets) - 1:
+            return np.full(global_ids.shape, -1, dtype=np.int64)
+        begin, end = self.offsets[universe_id], self.offsets[universe_id + 1]
+        local_ids = np.full(global_ids.shape, -1, dtype=np.int64)
+        if end == begin:
+            return local_ids
+        sorted_global_ids = self.sorted_global_ids[begin:end]
+        positions = np.minimum(np.searchsorted(sorted_global_ids, global_ids), end - begin - 1)
+        found = sorted_global_ids[positions] == global_ids
+        local_ids[found] = self.sorted_local_ids[begin:end][positions[found]]
+        return local_ids
+
+    def build_universe_index(self):
+        self.merge_pending_universes()
+        if self.universe_offsets is not None:
+            return
+        universe_of_entry = np.repeat(np.arange(len(self.offsets) - 1, dtype=np.int32), np.diff(self.offsets))
+        order = np.argsort(self.global_ids, kind='stable')
+        self.universe_ids = universe_of_entry[order]
+        self.universe_offsets = np.concatenate([[0], np.cumsum(np.bincount(self.global_ids,
+                                                                           minlength=self.total))]).astype(np.int64)
+
+    def get_universes(self, global_id):
+        # ascending ids of the universes which contain the global id
+        self.build_universe_index()
+        if global_id >= len(self.universe_offsets) - 1:
+            return self.universe_ids[:0]
+        return self.universe_ids[self.universe_offsets[global_id]:self.universe_offsets[global_id + 1]]
+
+    def expand_universes(self, global_ids):
+        # (query index, universe id) pairs of the universes of every global id, ordered by query index and
+        # universe id
+        self.build_universe_index()
+        global_ids = np.asarray(global_ids, dtype=np.int64).reshape(-1)
+        begins = self.universe_offsets[global_ids]
+        counts = self.universe_offsets[global_ids + 1] - begins
+        queries = np.repeat(np.arange(len(global_ids), dtype=np.int64), counts)
+        positions = np.arange(len(queries), dtype=np.int64) + np.repeat(begins - (np.cumsum(counts) - counts), counts)
+        return queries, self.universe_ids[positions]
+
+    def get_universe_counts(self):
+        # number of universes of every global id
+        self.build_universe_index()
+        return np.diff(self.universe_offsets)
+
+    def universe_sets(self):
+        return UniverseSets(self)
+
+    def __getstate__(self):
+        self.merge_pending_universes()
+        state = self.__dict__.copy()
+        state['universe_offsets'] = None
+        state['universe_ids'] = None
+        return state
+
+
+def intersect_universes(num_universes, *expanded_universes):
+    # Intersects the universes of every query given as (query index, universe id) pairs of expand_universes.
+    # The pairs are encoded as query index * num_universes + universe id, so all queries are intersected
+    # by one sorted merge per operand.
+    keys = None
+    for queries, universe_ids in expanded_universes:
+        operand_keys = queries * num_universes + universe_ids
+        keys = operand_keys if keys is None else np.intersect1d(keys, operand_keys, assume_unique=True)
+    return keys // num_universes, keys % num_universes
+
+
+class UniverseIdView(object):
+    # Read-only dict view global id -> local id of one universe, for callers of the former
+    # universe_id -> global id -> local id dicts
+
+    def __init__(self, mapping, universe_id):
+        self.mapping = mapping
+        self.universe_id = universe_id
+
+    def __getitem__(self, global_id):
+        local_id = int(self.mapping.get_local_ids(self.universe_id, global_id))
+        if local_id < 0:
+            raise KeyError(global_id)
+        return local_id
+
+    def __contains__(self, global_id):
+        return int(self.mapping.get_local_ids(self.universe_id, global_id)) >= 0
+
+    def __len__(self):
+        return self.mapping.get_num_ids(self.universe_id)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        return self.mapping.get_global_ids(self.universe_id).tolist()
+
+    def values(self):
+        return list(range(len(self)))
+
+    def items(self):
+        return zip(self.keys(), self.values())
+
+
+class UniverseSets(object):
+    # Read-only view global id -> set of universe ids, for callers of the former
+    # entity_universes/relation_universes dicts of sets
+
+    def __init__(self, mapping):
+        self.mapping = mapping
+
+    def __getitem__(self, global_id):
+        return set(self.mapping.get_universes(global_id).tolist())
+
+    def __len__(self):
+        return self.mapping.total
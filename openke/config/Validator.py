@@ -1,7 +1,6 @@
 # coding:utf-8
 import torch
 import torch.nn as nn
-from torch.autograd import Variable
 import torch.optim as optim
 import os
 import time
@@ -3,12 +3,14 @@ from __future__ import division
 from __future__ import print_function
 
 from .Trainer import Trainer
+from .FusedUniverseTrainer import FusedUniverseTrainer
 from .Tester import Tester
 from .Validator import Validator
 from .Parallel_Universe_Config import Parallel_Universe_Config
 
 __all__ = [
 	'Trainer',
+	'FusedUniverseTrainer',
 	'Tester',
 	'Parallel_Universe_Config',
 	'Validator'
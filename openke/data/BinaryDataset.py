@@ -0,0 +1,20 @@
+# coding:utf-8
+import os
+import sys
+import ctypes
+
+
+def convert_dataset(in_path):
+    # Converts the text files in in_path (train2id.txt, test2id.txt, valid2id.txt and, if present,
+    # triple2id.txt) to in_path/dataset.bin. Load it with TrainDataLoader(binary_dataset=True) and
+    # TestDataLoader(binary_dataset=True).
+    base_file = os.path.abspath(os.path.join(os.path.dirname(__file__), "../release/Base.so"))
+    lib = ctypes.cdll.LoadLibrary(base_file)
+    lib.setInPath(ctypes.create_string_buffer(in_path.encode(), len(in_path) * 2))
+    lib.convertToBinaryDataset()
+    return os.path.join(in_path, "dataset.bin")
+
+
+if __name__ == "__main__":
+    for path in sys.argv[1:]:
+        convert_dataset(path)
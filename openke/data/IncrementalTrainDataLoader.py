@@ -24,6 +24,7 @@ SOFTWARE.
 
 from openke.data import TrainDataLoader
 from pathlib import Path
+import numpy as np
 import ctypes
 
 class IncrementalTrainDataLoader(TrainDataLoader):
@@ -43,7 +44,8 @@ class IncrementalTrainDataLoader(TrainDataLoader):
 
         self.num_snapshots = num_snapshots
         self.initialize_incremental_loading()
-        self.deleted_triple_set = set()
+        # sorted keys (see pack_triples) of the training triples deleted so far and not inserted again
+        self.deleted_triples = np.empty(0, dtype=np.int64)
 
     def initialize_incremental_loading(self):
         # Constant variables along all snapshots
@@ -66,16 +68,28 @@ class IncrementalTrainDataLoader(TrainDataLoader):
 
         self.track_deleted_triples(snapshot_idx)
 
+    def pack_triples(self, heads, tails, rels):
+        # (head, tail, relation) -> int64 key, keys are ordered by head, relation and tail
+        heads, tails, rels = np.asarray(heads, dtype=np.int64), np.asarray(tails, dtype=np.int64), \
+                             np.asarray(rels, dtype=np.int64)
+        return (heads * self.relTotal + rels) * self.entTotal + tails
+
+    def unpack_triples(self, keys):
+        heads_rels, tails = np.divmod(keys, self.entTotal)
+        heads, rels = np.divmod(heads_rels, self.relTotal)
+        return heads, tails, rels
+
     def track_deleted_triples(self, snapshot_idx):
         triple_operations_file = Path(self.in_path) / "incremental" / str(snapshot_idx) / "train-op2id.txt"
 
+        # "head tail rel op" lines, parsed as integers with op "+" -> 1 and "-" -> 0
         with open(triple_operations_file, mode="rt", encoding="utf-8") as f:
-            for line in f:
-                head, tail, rel, op_type = line.split()
-                triple = (head, tail, rel)
-                if op_type == "-":
-                    self.deleted_triple_set.add(triple)
-                elif op_type == "+":
-                    if triple in self.deleted_triple_set:
-                        self.deleted_triple_set.remove(triple)
+            operations = f.read().translate(str.maketrans({"+": "1", "-": "0"}))
+        operations = np.fromstring(operations, dtype=np.int64, sep=" ").reshape(-1, 4)
+        keys = self.pack_triples(operations[:, 0], operations[:, 1], operations[:, 2])
 
+        # The last operation on a triple decides whether it is deleted after the snapshot
+        last_keys, last_positions = np.unique(keys[::-1], return_index=True)
+        last_deleted = operations[::-1, 3][last_positions] == 0
+        deleted_triples = np.setdiff1d(self.deleted_triples, last_keys[~last_deleted], assume_unique=True)
+        self.deleted_triples = np.union1d(deleted_triples, last_keys[last_deleted])
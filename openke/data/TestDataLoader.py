@@ -26,13 +26,14 @@ class TestDataSampler(object):
 
 class TestDataLoader(object):
 
-    def __init__(self, in_path="./", sampling_mode='link', random_seed=4, mode='test', setting="static", load_all_triples = False):
+    def __init__(self, in_path="./", sampling_mode='link', random_seed=4, mode='test', setting="static", load_all_triples = False, binary_dataset=False):
         base_file = os.path.abspath(os.path.join(os.path.dirname(__file__), "../release/Base.so"))
         self.lib = ctypes.cdll.LoadLibrary(base_file)
         # print("Random_seed for TestDataLoader: {}".format(self.lib.getRandomSeed()))
         self.setting = setting
         self.mode = mode
         self.load_all_triples = load_all_triples
+        self.binary_dataset = binary_dataset
         if self.mode == 'test':
             """for link prediction"""
             self.lib.getHeadBatch.argtypes = [
@@ -45,6 +46,13 @@ class TestDataLoader(object):
                 ctypes.c_void_p,
                 ctypes.c_void_p,
             ]
+            self.lib.getTestTriples.argtypes = [
+                ctypes.c_void_p,
+                ctypes.c_void_p,
+                ctypes.c_void_p,
+                ctypes.c_int64,
+                ctypes.c_int64,
+            ]
             """for triple classification"""
             self.lib.getTestBatch.argtypes = [
                 ctypes.c_void_p,
@@ -67,6 +75,14 @@ class TestDataLoader(object):
                 ctypes.c_void_p,
             ]
 
+            self.lib.getValidTriples.argtypes = [
+                ctypes.c_void_p,
+                ctypes.c_void_p,
+                ctypes.c_void_p,
+                ctypes.c_int64,
+                ctypes.c_int64,
+            ]
+
             self.lib.validHead.argtypes = [ctypes.c_void_p]
             self.lib.validTail.argtypes = [ctypes.c_void_p]
 
@@ -91,11 +107,14 @@ class TestDataLoader(object):
         if self.setting == "static":
             # delegated importTrainFiles execution to python because corruption process in sampling for triple classification
             # accesses training data structures in order to filter negative examples that did not occurred in train data
-            self.lib.importTrainFiles() # Only necessary if we evaluate without creating a TrainDataLoader object before
-
             if self.load_all_triples:
                 self.lib.activateLoadOfAllTriples(1)
-            self.lib.importTestFiles()
+            if self.binary_dataset:
+                self.lib.importBinaryTrainFiles()
+                self.lib.importBinaryTestFiles()
+            else:
+                self.lib.importTrainFiles() # Only necessary if we evaluate without creating a TrainDataLoader object before
+                self.lib.importTestFiles()
             self.relTotal = self.lib.getRelationTotal()
             self.entTotal = self.lib.getEntityTotal()
 
@@ -180,6 +199,52 @@ class TestDataLoader(object):
 
         return res
 
+    def sampling_lp_batch(self, begin, batch_size):
+        # head and tail prediction for the test triples [begin, begin + batch_size). The candidates
+        # are a column and the test triples a row, so the model scores the whole grid in one call.
+        total = min(batch_size, self.testTotal - begin)
+        batch_h = np.zeros(total, dtype=np.int64)
+        batch_t = np.zeros(total, dtype=np.int64)
+        batch_r = np.zeros(total, dtype=np.int64)
+        self.lib.getTestTriples(
+            batch_h.__array_interface__["data"][0],
+            batch_t.__array_interface__["data"][0],
+            batch_r.__array_interface__["data"][0],
+            begin,
+            total,
+        )
+        candidates = np.arange(self.entTotal, dtype=np.int64).reshape(-1, 1)
+        return [
+            {
+                "batch_h": candidates,
+                "batch_t": batch_t.reshape(1, -1),
+                "batch_r": batch_r.reshape(1, -1),
+                "mode": "head_batch"
+            },
+            {
+                "batch_h": batch_h.reshape(1, -1),
+                "batch_t": candidates,
+                "batch_r": batch_r.reshape(1, -1),
+                "mode": "tail_batch"
+            }
+        ]
+
+    def get_triples(self):
+        # heads, tails and relations of all test (or valid) triples in the order of sampling_lp
+        total = len(self)
+        triple_h = np.zeros(total, dtype=np.int64)
+        triple_t = np.zeros(total, dtype=np.int64)
+        triple_r = np.zeros(total, dtype=np.int64)
+        get_triples = self.lib.getTestTriples if self.mode == 'test' else self.lib.getValidTriples
+        get_triples(
+            triple_h.__array_interface__["data"][0],
+            triple_t.__array_interface__["data"][0],
+            triple_r.__array_interface__["data"][0],
+            0,
+            total,
+        )
+        return triple_h, triple_t, triple_r
+
     def sampling_tc(self):
         self.lib.getTestBatch(
             self.test_pos_h_addr,
@@ -1,6 +1,9 @@
 # coding:utf-8
 import os
 import ctypes
+import queue
+import threading
+import time
 import numpy as np
 
 
@@ -24,9 +27,128 @@ class TrainDataSampler(object):
         return self.nbatches
 
 
+class PrefetchTrainDataSampler(object):
+    # Samples the next batches on a background thread into the loader's ring buffers while the
+    # current batch is trained on. ctypes releases the GIL during sampling(), so the C++ sampler
+    # runs concurrently with the train step. A buffer is handed back to the producer once the
+    # consumer requests the following batch. The thread samples the batches of all epochs, and
+    # start_epoch() returns the sampler as the iterator of the next nbatches of them, so the first
+    # batches of an epoch are sampled while the previous epoch is finished.
+
+    def __init__(self, nbatches, datasampler, buffers, loader, epochs=1):
+        self.nbatches = nbatches
+        self.datasampler = datasampler
+        self.loader = loader
+        self.total_batches = nbatches * epochs
+        self.batch = 0
+        self.epoch_end = 0
+        self.consumed_buffer = None
+
+        self.free_buffers = queue.Queue()
+        for buffer in buffers:
+            self.free_buffers.put(buffer)
+        self.ready_batches = queue.Queue()
+
+        self.stopped = False
+        self.thread = threading.Thread(target=self.produce, daemon=True)
+        self.thread.start()
+
+    def produce(self):
+        for _ in range(self.total_batches):
+            buffer = self.free_buffers.get()
+            if buffer is None or self.stopped:
+                return
+            try:
+                data = self.datasampler(buffer)
+            except Exception as e:
+                self.ready_batches.put((None, e))
+                return
+            self.ready_batches.put((buffer, data))
+
+    def has_next_epoch(self):
+        return self.batch < self.total_batches and not self.stopped
+
+    def start_epoch(self):
+        self.epoch_end = min(self.batch + self.nbatches, self.total_batches)
+        return self
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.consumed_buffer is not None:
+            self.free_buffers.put(self.consumed_buffer)
+            self.consumed_buffer = None
+
+        if self.batch >= self.epoch_end:
+            if self.batch >= self.total_batches:
+                self.close()
+            raise StopIteration()
+        self.batch += 1
+
+        if self.ready_batches.empty():
+            self.loader.prefetch_stalls += 1
+            start_time = time.time()
+            buffer, data = self.ready_batches.get()
+            self.loader.prefetch_stall_time += time.time() - start_time
+        else:
+            buffer, data = self.ready_batches.get()
+        self.loader.prefetch_requests += 1
+
+        if buffer is None:
+            self.close()
+            raise data
+        self.consumed_buffer = buffer
+        return data
+
+    def close(self):
+        if self.thread.is_alive():
+            self.stopped = True
+            self.free_buffers.put(None)
+            self.thread.join()
+
+    def __len__(self):
+        return self.nbatches
+
+
+class BatchBuffer(object):
+    # With pin_memory the arrays are torch tensors in page-locked memory (if CUDA is available).
+    # The sampler writes into them directly, so the trainer can use them without a copy and move
+    # them to the GPU with a non-blocking transfer.
+
+    def __init__(self, batch_seq_size, pin_memory=False):
+        if pin_memory:
+            import torch
+            self.batch_h = self.pinned_zeros(torch, batch_seq_size, torch.int64)
+            self.batch_t = self.pinned_zeros(torch, batch_seq_size, torch.int64)
+            self.batch_r = self.pinned_zeros(torch, batch_seq_size, torch.int64)
+            self.batch_y = self.pinned_zeros(torch, batch_seq_size, torch.float32)
+
+            self.batch_h_addr = self.batch_h.data_ptr()
+            self.batch_t_addr = self.batch_t.data_ptr()
+            self.batch_r_addr = self.batch_r.data_ptr()
+            self.batch_y_addr = self.batch_y.data_ptr()
+        else:
+            self.batch_h = np.zeros(batch_seq_size, dtype=np.int64)
+            self.batch_t = np.zeros(batch_seq_size, dtype=np.int64)
+            self.batch_r = np.zeros(batch_seq_size, dtype=np.int64)
+            self.batch_y = np.zeros(batch_seq_size, dtype=np.float32)
+
+            self.batch_h_addr = self.batch_h.__array_interface__["data"][0]
+            self.batch_t_addr = self.batch_t.__array_interface__["data"][0]
+            self.batch_r_addr = self.batch_r.__array_interface__["data"][0]
+            self.batch_y_addr = self.batch_y.__array_interface__["data"][0]
+
+    @staticmethod
+    def pinned_zeros(torch, size, dtype):
+        tensor = torch.zeros(size, dtype=dtype)
+        return tensor.pin_memory() if torch.cuda.is_available() else tensor
+
+
 class TrainDataLoader(object):
     def __init__(self, in_path="./", batch_size=None, nbatches=None, threads=8, sampling_mode="normal", bern_flag=0,
-                 filter_flag=1, neg_ent=1, neg_rel=0, random_seed=2, incremental_setting=False):
+                 filter_flag=1, neg_ent=1, neg_rel=0, random_seed=2, incremental_setting=False, prefetch_depth=0,
+                 epoch_sampling=False, binary_dataset=False, pin_memory=False, sampler_context=False):
         base_file = os.path.abspath(os.path.join(os.path.dirname(__file__), "../release/Base.so"))
         self.lib = ctypes.cdll.LoadLibrary(base_file)
         """argtypes"""
@@ -44,6 +166,21 @@ class TrainDataLoader(object):
             ctypes.c_int64
         ]
 
+        self.lib.samplingEpoch.argtypes = [
+            ctypes.c_void_p,
+            ctypes.c_void_p,
+            ctypes.c_void_p,
+            ctypes.c_void_p,
+            ctypes.c_int64,
+            ctypes.c_int64,
+            ctypes.c_int64,
+            ctypes.c_int64,
+            ctypes.c_int64,
+            ctypes.c_int64,
+            ctypes.c_int64,
+            ctypes.c_int64
+        ]
+
         self.lib.getParallelUniverse.argtypes = [
             ctypes.c_int64,
             ctypes.c_float
@@ -100,6 +237,52 @@ class TrainDataLoader(object):
             ctypes.c_int64
         ]
 
+        self.lib.createSamplerContext.argtypes = [ctypes.c_char_p]
+        self.lib.createSamplerContext.restype = ctypes.c_void_p
+        self.lib.destroySamplerContext.argtypes = [ctypes.c_void_p]
+        self.lib.setContextBern.argtypes = [ctypes.c_void_p, ctypes.c_int64]
+        self.lib.setContextRandomSeed.argtypes = [ctypes.c_void_p, ctypes.c_int64]
+        self.lib.setContextCorruptIndex.argtypes = [ctypes.c_void_p, ctypes.c_bool]
+        for getter in [self.lib.getContextEntityTotal, self.lib.getContextRelationTotal, self.lib.getContextTrainTotal]:
+            getter.argtypes = [ctypes.c_void_p]
+            getter.restype = ctypes.c_int64
+
+        self.lib.contextSampling.argtypes = [
+            ctypes.c_void_p,
+            ctypes.c_void_p,
+            ctypes.c_void_p,
+            ctypes.c_void_p,
+            ctypes.c_void_p,
+            ctypes.c_int64,
+            ctypes.c_int64,
+            ctypes.c_int64,
+            ctypes.c_int64,
+            ctypes.c_bool
+        ]
+
+        self.lib.contextSamplingEpoch.argtypes = [
+            ctypes.c_void_p,
+            ctypes.c_void_p,
+            ctypes.c_void_p,
+            ctypes.c_void_p,
+            ctypes.c_void_p,
+            ctypes.c_int64,
+            ctypes.c_int64,
+            ctypes.c_int64,
+            ctypes.c_int64,
+            ctypes.c_int64,
+            ctypes.c_bool,
+            ctypes.c_bool
+        ]
+
+        self.lib.setCorruptIndex.argtypes = [ctypes.c_bool]
+        self.lib.getCorruptIndexMemory.restype = ctypes.c_int64
+
+        self.lib.setWorkThreads.argtypes = [ctypes.c_int64]
+        self.lib.getSamplerPoolSize.restype = ctypes.c_int64
+        self.lib.getSamplerPoolJobs.restype = ctypes.c_int64
+        self.lib.getSamplerPoolUtilization.restype = ctypes.c_float
+
         """set essential parameters"""
         self.in_path = in_path
         self.work_threads = threads
@@ -113,6 +296,28 @@ class TrainDataLoader(object):
         self.cross_sampling_flag = 0
         self.random_seed = random_seed
         self.incremental_setting = incremental_setting
+        self.binary_dataset = binary_dataset  # load in_path/dataset.bin written by BinaryDataset.convert_dataset
+
+        """prefetching"""
+        self.prefetch_depth = prefetch_depth  # number of batches sampled ahead, 0 disables prefetching
+        self.prefetch_sampler = None
+        self.prefetch_epochs = 1  # epochs sampled by the next prefetch thread, see set_prefetch_epochs
+        self.prefetch_stalls = 0
+        self.prefetch_requests = 0
+        self.prefetch_stall_time = 0.0
+
+        """epoch sampling"""
+        self.epoch_sampling = epoch_sampling  # sample a whole epoch with one call into the library
+        self.epoch_buffer = None
+
+        """batch buffers"""
+        self.pin_memory = pin_memory  # sample into page-locked torch tensors instead of numpy arrays
+
+        """sampler context"""
+        # load the training triples into a context of their own instead of the process-global training
+        # data, so several loaders of a process do not overwrite each other (no universe support)
+        self.sampler_context = sampler_context
+        self.context = None
         self.read()
 
     def read(self):
@@ -122,8 +327,29 @@ class TrainDataLoader(object):
         self.lib.setRandomSeed(self.random_seed)
         self.lib.randReset()
 
-        if not self.incremental_setting:
-            self.lib.importTrainFiles()
+        if self.sampler_context and self.incremental_setting:
+            # the context is built from train2id.txt, the snapshots are evolved in the global training data
+            raise ValueError("sampler_context cannot be combined with incremental_setting.")
+
+        if self.sampler_context:
+            self.close_sampler_context()
+            self.context = self.lib.createSamplerContext(self.in_path.encode())
+            self.lib.setContextBern(self.context, self.bern)
+            self.lib.setContextRandomSeed(self.context, self.random_seed)
+            self.relTotal = self.lib.getContextRelationTotal(self.context)
+            self.entTotal = self.lib.getContextEntityTotal(self.context)
+            self.tripleTotal = self.lib.getContextTrainTotal(self.context)
+
+            if self.batch_size == None:
+                self.batch_size = self.tripleTotal // self.nbatches
+            if self.nbatches == None:
+                self.nbatches = self.tripleTotal // self.batch_size
+            self.update_batch_arrays()
+        elif not self.incremental_setting:
+            if self.binary_dataset:
+                self.lib.importBinaryTrainFiles()
+            else:
+                self.lib.importTrainFiles()
             self.relTotal = self.lib.getRelationTotal()
             self.entTotal = self.lib.getEntityTotal()
             self.tripleTotal = self.lib.getTrainTotal()
@@ -135,21 +361,40 @@ class TrainDataLoader(object):
                 self.nbatches = self.tripleTotal // self.batch_size
             self.update_batch_arrays()
 
+        # filter_flag 2 filters negatives with the precomputed (h,r) / (r,t) corrupt index
+        self.set_corrupt_index()
+
+    def set_corrupt_index(self):
+        if self.context is not None:
+            self.lib.setContextCorruptIndex(self.context, self.filter == 2)
+        else:
+            self.lib.setCorruptIndex(self.filter == 2)
+
+    def close_sampler_context(self):
+        if self.context is not None:
+            self.lib.destroySamplerContext(self.context)
+            self.context = None
+
     def update_batch_arrays(self):
         self.batch_seq_size = self.batch_size * (1 + self.negative_ent + self.negative_rel)
 
-        self.batch_h = np.zeros(self.batch_seq_size, dtype=np.int64)
-        self.batch_t = np.zeros(self.batch_seq_size, dtype=np.int64)
-        self.batch_r = np.zeros(self.batch_seq_size, dtype=np.int64)
-        self.batch_y = np.zeros(self.batch_seq_size, dtype=np.float32)
+        self.close_prefetch_sampler()
+
+        # One buffer is consumed by the trainer while up to prefetch_depth buffers are filled ahead
+        self.batch_buffers = [BatchBuffer(self.batch_seq_size, self.pin_memory) for _ in range(self.prefetch_depth + 1)]
 
-        self.batch_h_addr = self.batch_h.__array_interface__["data"][0]
-        self.batch_t_addr = self.batch_t.__array_interface__["data"][0]
-        self.batch_r_addr = self.batch_r.__array_interface__["data"][0]
-        self.batch_y_addr = self.batch_y.__array_interface__["data"][0]
+        self.batch_h = self.batch_buffers[0].batch_h
+        self.batch_t = self.batch_buffers[0].batch_t
+        self.batch_r = self.batch_buffers[0].batch_r
+        self.batch_y = self.batch_buffers[0].batch_y
 
+        self.batch_h_addr = self.batch_buffers[0].batch_h_addr
+        self.batch_t_addr = self.batch_buffers[0].batch_t_addr
+        self.batch_r_addr = self.batch_buffers[0].batch_r_addr
+        self.batch_y_addr = self.batch_buffers[0].batch_y_addr
 
     def swap_helpers(self):
+        self.close_prefetch_sampler()
         self.lib.swapHelpers()
 
     def reset_universe(self):
@@ -174,79 +419,169 @@ class TrainDataLoader(object):
         self.lib.getParallelUniverse(triple_constraint, balance_param)
         self.set_nbatches(self.lib.getTrainTotalUniverse(), self.nbatches)
 
-    def sampling(self):
-        self.lib.sampling(
-            self.batch_h_addr,
-            self.batch_t_addr,
-            self.batch_r_addr,
-            self.batch_y_addr,
-            self.batch_size,
-            self.negative_ent,
-            self.negative_rel,
-            0,
-            self.filter,
-            0,
-            0
-        )
+    def sample_batch(self, buffer, mode):
+        if self.context is not None:
+            self.lib.contextSampling(
+                self.context,
+                buffer.batch_h_addr,
+                buffer.batch_t_addr,
+                buffer.batch_r_addr,
+                buffer.batch_y_addr,
+                self.batch_size,
+                self.negative_ent,
+                self.negative_rel,
+                mode,
+                self.filter != 0
+            )
+        else:
+            self.lib.sampling(
+                buffer.batch_h_addr,
+                buffer.batch_t_addr,
+                buffer.batch_r_addr,
+                buffer.batch_y_addr,
+                self.batch_size,
+                self.negative_ent,
+                self.negative_rel,
+                mode,
+                self.filter,
+                0,
+                0
+            )
+
+    def sampling(self, buffer=None):
+        buffer = buffer if buffer is not None else self.batch_buffers[0]
+        self.sample_batch(buffer, 0)
         return {
-            "batch_h": self.batch_h,
-            "batch_t": self.batch_t,
-            "batch_r": self.batch_r,
-            "batch_y": self.batch_y,
+            "batch_h": buffer.batch_h,
+            "batch_t": buffer.batch_t,
+            "batch_r": buffer.batch_r,
+            "batch_y": buffer.batch_y,
             "mode": "normal"
         }
 
-    def sampling_head(self):
-        self.lib.sampling(
-            self.batch_h_addr,
-            self.batch_t_addr,
-            self.batch_r_addr,
-            self.batch_y_addr,
-            self.batch_size,
-            self.negative_ent,
-            self.negative_rel,
-            -1,
-            self.filter,
-            0,
-            0
-        )
+    def sampling_head(self, buffer=None):
+        buffer = buffer if buffer is not None else self.batch_buffers[0]
+        self.sample_batch(buffer, -1)
         return {
-            "batch_h": self.batch_h,
-            "batch_t": self.batch_t[:self.batch_size],
-            "batch_r": self.batch_r[:self.batch_size],
-            "batch_y": self.batch_y,
+            "batch_h": buffer.batch_h,
+            "batch_t": buffer.batch_t[:self.batch_size],
+            "batch_r": buffer.batch_r[:self.batch_size],
+            "batch_y": buffer.batch_y,
             "mode": "head_batch"
         }
 
-    def sampling_tail(self):
-        self.lib.sampling(
-            self.batch_h_addr,
-            self.batch_t_addr,
-            self.batch_r_addr,
-            self.batch_y_addr,
-            self.batch_size,
-            self.negative_ent,
-            self.negative_rel,
-            1,
-            self.filter,
-            0,
-            0
-        )
+    def sampling_tail(self, buffer=None):
+        buffer = buffer if buffer is not None else self.batch_buffers[0]
+        self.sample_batch(buffer, 1)
         return {
-            "batch_h": self.batch_h[:self.batch_size],
-            "batch_t": self.batch_t,
-            "batch_r": self.batch_r[:self.batch_size],
-            "batch_y": self.batch_y,
+            "batch_h": buffer.batch_h[:self.batch_size],
+            "batch_t": buffer.batch_t,
+            "batch_r": buffer.batch_r[:self.batch_size],
+            "batch_y": buffer.batch_y,
             "mode": "tail_batch"
         }
 
-    def cross_sampling(self):
+    def cross_sampling(self, buffer=None):
         self.cross_sampling_flag = 1 - self.cross_sampling_flag
         # self.cross_sampling_flag = 0 #haha
         if self.cross_sampling_flag == 0:
-            return self.sampling_head()
+            return self.sampling_head(buffer)
         else:
-            return self.sampling_tail()
+            return self.sampling_tail(buffer)
+
+    def sample_epoch(self):
+        # Fills the batches of a whole epoch with one call into the library and yields views on
+        # the epoch buffer. A view is overwritten by the next call of sample_epoch.
+        if self.epoch_buffer is None or self.epoch_buffer.batch_h.shape[0] != self.nbatches * self.batch_seq_size:
+            self.epoch_buffer = BatchBuffer(self.nbatches * self.batch_seq_size, self.pin_memory)
+        buffer = self.epoch_buffer
+
+        if self.sampling_mode == "normal":
+            mode = 0
+        else:
+            # Mirrors consecutive calls of cross_sampling: the first batch flips cross_sampling_flag
+            mode = -1 if self.cross_sampling_flag == 1 else 1
+            if self.nbatches % 2 == 1:
+                self.cross_sampling_flag = 1 - self.cross_sampling_flag
+
+        if self.context is not None:
+            self.lib.contextSamplingEpoch(
+                self.context,
+                buffer.batch_h_addr,
+                buffer.batch_t_addr,
+                buffer.batch_r_addr,
+                buffer.batch_y_addr,
+                self.batch_size,
+                self.nbatches,
+                self.negative_ent,
+                self.negative_rel,
+                mode,
+                self.sampling_mode != "normal",
+                self.filter != 0
+            )
+        else:
+            self.lib.samplingEpoch(
+                buffer.batch_h_addr,
+                buffer.batch_t_addr,
+                buffer.batch_r_addr,
+                buffer.batch_y_addr,
+                self.batch_size,
+                self.nbatches,
+                self.negative_ent,
+                self.negative_rel,
+                mode,
+                self.sampling_mode != "normal",
+                self.filter,
+                0
+            )
+
+        batch_h = buffer.batch_h.reshape(self.nbatches, self.batch_seq_size)
+        batch_t = buffer.batch_t.reshape(self.nbatches, self.batch_seq_size)
+        batch_r = buffer.batch_r.reshape(self.nbatches, self.batch_seq_size)
+        batch_y = buffer.batch_y.reshape(self.nbatches, self.batch_seq_size)
+        for batch in range(self.nbatches):
+            if mode == 0:
+                yield {
+                    "batch_h": batch_h[batch],
+                    "batch_t": batch_t[batch],
+                    "batch_r": batch_r[batch],
+                    "batch_y": batch_y[batch],
+                    "mode": "normal"
+                }
+            elif (mode == -1) == (batch % 2 == 0):
+                yield {
+                    "batch_h": batch_h[batch],
+                    "batch_t": batch_t[batch, :self.batch_size],
+                    "batch_r": batch_r[batch, :self.batch_size],
+                    "batch_y": batch_y[batch],
+                    "mode": "head_batch"
+                }
+            else:
+                yield {
+                    "batch_h": batch_h[batch, :self.batch_size],
+                    "batch_t": batch_t[batch],
+                    "batch_r": batch_r[batch, :self.batch_size],
+                    "batch_y": batch_y[batch],
+                    "mode": "tail_batch"
+                }
+
+    def sample_epochs(self, train_times):
+        # Samples the batches of train_times epochs up front into arrays of shape
+        # (train_times, nbatches, batch_seq_size), e.g. to train several universes at once.
+        # head_batch / tail_batch batches are expanded to the layout of the normal mode.
+        shape = (train_times, self.nbatches, self.batch_seq_size)
+        epochs = {
+            "batch_h": np.zeros(shape, dtype=np.int64),
+            "batch_t": np.zeros(shape, dtype=np.int64),
+            "batch_r": np.zeros(shape, dtype=np.int64),
+            "batch_y": np.zeros(shape, dtype=np.float32)
+        }
+        for epoch in range(train_times):
+            for batch, data in enumerate(self):
+                for key in epochs:
+                    epochs[key][epoch, batch] = np.resize(np.asarray(data[key]), self.batch_seq_size)
+        epochs["batch_size"] = self.batch_size
+        return epochs
 
     def get_positive_entities(self, entity, relation, entity_is_head):
         num_of_pos = self.lib.getNumOfPositives(entity, relation, entity_is_head)
@@ -275,6 +610,59 @@ class TrainDataLoader(object):
 
         return batch_entity_relations
 
+    def get_corrupt_index_memory(self):
+        # Bytes used by the corrupt index (filter_flag=2) of the current training triples
+        return self.lib.getCorruptIndexMemory()
+
+    """sampler worker pool"""
+
+    def get_sampler_pool_size(self):
+        return self.lib.getSamplerPoolSize()
+
+    def get_sampler_pool_jobs(self):
+        return self.lib.getSamplerPoolJobs()
+
+    def get_sampler_pool_utilization(self):
+        # Fraction of the time spent in sampling() during which the pool workers were busy
+        return self.lib.getSamplerPoolUtilization()
+
+    def reset_sampler_pool_stats(self):
+        self.lib.resetSamplerPoolStats()
+
+    def close(self):
+        # Joins the sampler worker threads; the pool is recreated on the next sampling call
+        self.close_prefetch_sampler()
+        self.lib.destroySamplerPool()
+
+    """prefetching"""
+
+    def close_prefetch_sampler(self):
+        if self.prefetch_sampler is not None:
+            self.prefetch_sampler.close()
+            self.prefetch_sampler = None
+
+    def set_prefetch_epochs(self, epochs):
+        # The next epochs iterations over the loader share one prefetch thread, which samples the first
+        # batches of an epoch during the previous one. Only set it if all of these epochs are trained, the
+        # thread draws their batches from the sampler ahead of time.
+        self.prefetch_epochs = epochs
+        self.close_prefetch_sampler()
+
+    def get_prefetch_stalls(self):
+        # Number of batches the trainer had to wait for because the sampler was not done yet
+        return self.prefetch_stalls
+
+    def get_prefetch_stall_ratio(self):
+        return self.prefetch_stalls / self.prefetch_requests if self.prefetch_requests else 0.0
+
+    def get_prefetch_stall_time(self):
+        return self.prefetch_stall_time
+
+    def reset_prefetch_stats(self):
+        self.prefetch_stalls = 0
+        self.prefetch_requests = 0
+        self.prefetch_stall_time = 0.0
+
     """interfaces to set essential parameters"""
 
     def set_work_threads(self, work_threads):
@@ -304,6 +692,7 @@ class TrainDataLoader(object):
 
     def set_filter_flag(self, filter):
         self.filter = filter
+        self.set_corrupt_index()
 
     """interfaces to get essential parameters"""
 
@@ -319,11 +708,30 @@ class TrainDataLoader(object):
     def get_triple_tot(self):
         return self.tripleTotal
 
+    def set_prefetch_depth(self, prefetch_depth):
+        self.prefetch_depth = prefetch_depth
+        self.update_batch_arrays()
+
+    def set_epoch_sampling(self, epoch_sampling):
+        self.epoch_sampling = epoch_sampling
+
+    def set_pin_memory(self, pin_memory):
+        self.pin_memory = pin_memory
+        self.epoch_buffer = None
+        self.update_batch_arrays()
+
     def __iter__(self):
-        if self.sampling_mode == "normal":
-            return TrainDataSampler(self.nbatches, self.sampling)
-        else:
-            return TrainDataSampler(self.nbatches, self.cross_sampling)
+        if self.epoch_sampling:
+            return self.sample_epoch()
+        datasampler = self.sampling if self.sampling_mode == "normal" else self.cross_sampling
+        if self.prefetch_depth > 0:
+            if self.prefetch_sampler is None or not self.prefetch_sampler.has_next_epoch():
+                self.close_prefetch_sampler()
+                self.prefetch_sampler = PrefetchTrainDataSampler(self.nbatches, datasampler, self.batch_buffers,
+                                                                 self, self.prefetch_epochs)
+                self.prefetch_epochs = 1
+            return self.prefetch_sampler.start_epoch()
+        return TrainDataSampler(self.nbatches, datasampler)
 
     def __len__(self):
         return self.nbatches
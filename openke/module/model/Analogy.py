@@ -5,6 +5,8 @@ from .Model import Model
 
 class Analogy(Model):
 
+	batch_prediction = True
+
 	def __init__(self, ent_tot, rel_tot, dim = 100):
 		super(Analogy, self).__init__(ent_tot, rel_tot)
 
@@ -3,6 +3,9 @@ import torch.nn as nn
 from .Model import Model
 
 class ComplEx(Model):
+
+    batch_prediction = True
+
     def __init__(self, ent_tot, rel_tot, dim = 100):
         super(ComplEx, self).__init__(ent_tot, rel_tot)
 
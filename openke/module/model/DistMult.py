@@ -4,6 +4,8 @@ from .Model import Model
 
 class DistMult(Model):
 
+	batch_prediction = True
+
 	def __init__(self, ent_tot, rel_tot, dim = 100, margin = None, epsilon = None):
 		super(DistMult, self).__init__(ent_tot, rel_tot)
 
@@ -32,7 +34,8 @@ class DistMult(Model):
 			)
 
 	def _calc(self, h, t, r, mode):
-		if mode != 'normal':
+		# batched link prediction passes candidates and queries already shaped for broadcasting
+		if mode != 'normal' and r.dim() == 2:
 			h = h.view(-1, r.shape[0], h.shape[-1])
 			t = t.view(-1, r.shape[0], t.shape[-1])
 			r = r.view(-1, r.shape[0], r.shape[-1])
@@ -5,6 +5,10 @@ from ..BaseModule import BaseModule
 
 class Model(BaseModule):
 
+	# whether predict broadcasts a (num_candidates, 1) against a (1, batch) index array, see
+	# Tester.run_link_prediction
+	batch_prediction = False
+
 	def __init__(self, ent_tot, rel_tot):
 		super(Model, self).__init__()
 		self.ent_tot = ent_tot
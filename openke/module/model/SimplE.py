@@ -4,6 +4,8 @@ from .Model import Model
 
 class SimplE(Model):
 
+    batch_prediction = True
+
     def __init__(self, ent_tot, rel_tot, dim = 100):
         super(SimplE, self).__init__(ent_tot, rel_tot)
 
@@ -5,6 +5,8 @@ from .Model import Model
 
 class TransE(Model):
 
+	batch_prediction = True
+
 	def __init__(self, ent_tot, rel_tot, dim = 100, p_norm = 1, norm_flag = True, margin = None, epsilon = None):
 		super(TransE, self).__init__(ent_tot, rel_tot)
 		
@@ -48,7 +50,8 @@ class TransE(Model):
 			h = F.normalize(h, 2, -1)
 			r = F.normalize(r, 2, -1)
 			t = F.normalize(t, 2, -1)
-		if mode != 'normal':
+		# batched link prediction passes candidates and queries already shaped for broadcasting
+		if mode != 'normal' and r.dim() == 2:
 			h = h.view(-1, r.shape[0], h.shape[-1])
 			t = t.view(-1, r.shape[0], t.shape[-1])
 			r = r.view(-1, r.shape[0], r.shape[-1])
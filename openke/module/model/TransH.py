@@ -5,6 +5,8 @@ from .Model import Model
 
 class TransH(Model):
 
+	batch_prediction = True
+
 	def __init__(self, ent_tot, rel_tot, dim = 100, p_norm = 1, norm_flag = True, margin = None, epsilon = None):
 		super(TransH, self).__init__(ent_tot, rel_tot)
 		
@@ -54,7 +56,8 @@ class TransH(Model):
 			h = F.normalize(h, 2, -1)
 			r = F.normalize(r, 2, -1)
 			t = F.normalize(t, 2, -1)
-		if mode != 'normal':
+		# batched link prediction passes candidates and queries already shaped for broadcasting
+		if mode != 'normal' and r.dim() == 2:
 			h = h.view(-1, r.shape[0], h.shape[-1])
 			t = t.view(-1, r.shape[0], t.shape[-1])
 			r = r.view(-1, r.shape[0], r.shape[-1])
@@ -67,7 +70,7 @@ class TransH(Model):
 
 	def _transfer(self, e, norm):
 		norm = F.normalize(norm, p = 2, dim = -1)
-		if e.shape[0] != norm.shape[0]:
+		if e.dim() == 2 and e.shape[0] != norm.shape[0]:
 			e = e.view(-1, norm.shape[0], e.shape[-1])
 			norm = norm.view(-1, norm.shape[0], norm.shape[-1])
 			e = e - torch.sum(e * norm, -1, True) * norm